@@ -59,6 +59,39 @@ interface ChartData {
   }[];
 }
 
+// Same origin by default, set REACT_APP_API_URL when the API lives elsewhere
+const API_URL = process.env.REACT_APP_API_URL || '';
+
+const CATEGORY_COLORS = [
+  'rgb(54, 162, 235)',
+  'rgb(255, 99, 132)',
+  'rgb(255, 206, 86)',
+  'rgb(75, 192, 192)',
+  'rgb(153, 102, 255)',
+  'rgb(255, 159, 64)',
+];
+
+interface BalanceHistoryResponse {
+  history: {
+    month: string;
+    inflow: number;
+    outflow: number;
+    balance: number;
+  }[];
+}
+
+interface SpendingResponse {
+  categories: {
+    category: string;
+    amount: number;
+    share: number;
+  }[];
+}
+
+// '2024-03' -> 'Mar'
+const formatMonth = (month: string): string =>
+  new Date(`${month}-01T00:00:00`).toLocaleString('en', { month: 'short' });
+
 conost Dashboard: React.FC = () => {
   const [isLoading, setIsLoading] = useState<boolean>(true);
   const [balanceHistory, setBalanceHistory] = useState<ChartData>({
@@ -71,19 +104,36 @@ conost Dashboard: React.FC = () => {
   });
 
   const user = useSelector((state: RootState) => state.auth.user);
+  const token = useSelector((state: RootState) => state.auth.token);
 
   useEffect(() => {
     const fetchDashboardData = async () => {
+      if (!user || !token) {
+        setIsLoading(false);
+        return;
+      }
       try {
-        // Simulate API call
-        await new Promise((resolve) => setTimeout(resolve, 1000));
+        // Both charts come from pre-aggregated monthly rollups on the API
+        // The responses carry an ETag, so reloading an unchanged
+        // dashboard is revalidated by the browser and answered with a 304
+        // The API only serves a customer's data to their own token
+        const headers = { Authorization: `Bearer ${token}` };
+        const [balanceResponse, spendingResponse] = await Promise.all([
+          fetch(`${API_URL}/customers/${user.id}/dashboard/balance_history?months=6`, { headers }),
+          fetch(`${API_URL}/customers/${user.id}/dashboard/spending?months=6`, { headers }),
+        ]);
+        if (!balanceResponse.ok || !spendingResponse.ok) {
+          throw new Error('Dashboard data request failed');
+        }
+        const balance: BalanceHistoryResponse = await balanceResponse.json();
+        const spending: SpendingResponse = await spendingResponse.json();
 
         setBalanceHistory({
-          labels: ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+          labels: balance.history.map((point) => formatMonth(point.month)),
           datasets: [
             {
               label: 'Account Balance',
-              data: [1000, 1500, 1300, 1700, 2000, 2500],
+              data: balance.history.map((point) => point.balance),
               borderColor: 'rgb(75, 192, 192)',
               tension: 0.1,
             },
@@ -91,16 +141,13 @@ conost Dashboard: React.FC = () => {
         });
 
         setSpendingBreakdown({
-          labels: ['Savings', 'Bills', 'Shopping', 'Investment'],
+          labels: spending.categories.map((item) => item.category),
           datasets: [
             {
-              data: [30, 25, 20, 25],
-              backgroundColor: [
-                'rgb(54, 162, 235)',
-                'rgb(255, 99, 132)',
-                'rgb(255, 206, 86)',
-                'rgb(75, 192, 192)',
-              ],
+              data: spending.categories.map((item) => Math.round(item.share * 100)),
+              backgroundColor: spending.categories.map(
+                (_, index) => CATEGORY_COLORS[index % CATEGORY_COLORS.length]
+              ),
             },
           ],
         });
@@ -113,7 +160,7 @@ conost Dashboard: React.FC = () => {
     };
 
     fetchDashboardData();
-  }, []);
+  }, [user, token]);
 
   const metrics: MetricData[] = [
     {
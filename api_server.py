@@ -1,16 +1,38 @@
+import os
 from flask import Flask, request, jsonify
-from credit_scoring import MshiyaneCreditScoring
+from model_registry import registry
+from config import settings
+from rate_limit import build_rate_limiter, build_route_costs, check_request, rate_limit_headers
+from scoring_api import SCORING_MODEL_NAME, get_scoring_system
 
 # TODO: Add proper error handling
 # TODO: Implement request validation
-# TODO: Add rate limiting
 # TODO: Add proper logging
-# TODO: Consider adding caching
 
 app = Flask(__name__)
-# Had to initialize this way to avoid multiple model loads
-# Consider implementing singleton pattern
-scoring_system = MshiyaneCreditScoring()
+# Models come from the shared registry (loaded from MODELS_PATH, with the
+# score cache attached - see scoring_api.py) instead of a module-global
+# MshiyaneCreditScoring() that never had any models loaded
+# In production run it under gunicorn (gunicorn_conf.py): the master loads
+# the models once and every forked worker shares them copy-on-write
+
+# Same limits as the FastAPI app (rate_limit.py), from the same settings
+# Under gunicorn each worker has its own token buckets - set
+# RATE_LIMIT_REDIS_URL to share them
+_rate_limit = None
+
+def _rate_limiter():
+    global _rate_limit
+    if _rate_limit is None:
+        _rate_limit = (build_rate_limiter(settings), build_route_costs(settings))
+    return _rate_limit
+
+@app.before_request
+def check_rate_limit():
+    rate_limiter, route_costs = _rate_limiter()
+    decision = check_request(rate_limiter, route_costs, request.path, request.headers, request.remote_addr)
+    if decision is not None and not decision.allowed:
+        return jsonify({'detail': 'Rate limit exceeded'}), 429, rate_limit_headers(decision)
 
 @app.route('/api/credit-score', methods=['POST'])
 def credit_score():
@@ -19,16 +41,35 @@ def credit_score():
     TODO: Add input validation
     TODO: Add error handling
     TODO: Add request logging
-    TODO: Consider adding response caching
     """
     user_data = request.json
-    # You need to implement calculate_credit_score in your class
-    score = scoring_system.calculate_credit_score(user_data)
+    score = get_scoring_system().calculate_credit_score(user_data)
     return jsonify({'credit_score': score})
 
+@app.route('/health', methods=['GET'])
+def health_check():
+    """
+    Health check for the load balancer
+    Not healthy until the models are loaded, so a worker never gets
+    traffic it would have to load models for
+    """
+    if not registry.is_loaded(SCORING_MODEL_NAME):
+        return jsonify({'status': 'loading', 'pid': os.getpid()}), 503
+    return jsonify({
+        'status': 'healthy',
+        'model_version': get_scoring_system().model_version,
+        'pid': os.getpid()
+    })
+
+def load_models():
+    """
+    Load the models up front (gunicorn calls this in the master)
+    """
+    return get_scoring_system()
+
 if __name__ == '__main__':
+    # Flask's dev server - one process, for local development only
     # TODO: Add proper configuration management
     # TODO: Implement proper logging
-    # TODO: Add health checks
-    # TODO: Consider adding monitoring
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    load_models()
+    app.run(port=int(os.getenv('PORT', 5000)), debug=os.getenv('FLASK_DEBUG', 'false').lower() == 'true')
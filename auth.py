@@ -0,0 +1,63 @@
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+from config import get_settings
+
+# JWT bearer auth (the bearerAuth scheme in the OpenAPI docs)
+# Tokens are signed with SECRET_KEY / ALGORITHM. "sub" is the customer id
+# the token was issued to, staff tokens carry "role": "admin"
+
+ADMIN_ROLE = "admin"
+
+# auto_error=False so a missing token is a 401 (HTTPBearer's own is a 403)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def decode_token(token: str) -> Optional[Dict]:
+    """
+    Verified claims, or None if the token is invalid, expired or has no subject
+    """
+    settings = get_settings()
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if claims.get("sub") is None:
+        return None
+    return claims
+
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(status_code=401, detail="Not authenticated",
+                         headers={"WWW-Authenticate": "Bearer"})
+
+
+def get_current_claims(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> Dict:
+    if credentials is None:
+        raise _unauthorized()
+    claims = decode_token(credentials.credentials)
+    if claims is None:
+        raise _unauthorized()
+    return claims
+
+
+def require_customer(customer_id: int, claims: Dict = Depends(get_current_claims)) -> Dict:
+    """
+    Dependency for /customers/{customer_id}/... - the token has to belong
+    to that customer
+    """
+    if str(claims["sub"]) != str(customer_id):
+        raise HTTPException(status_code=403, detail="Not allowed to access this customer")
+    return claims
+
+
+def require_admin(claims: Dict = Depends(get_current_claims)) -> Dict:
+    """
+    Dependency for operational endpoints (model rollout, experiments)
+    """
+    if claims.get("role") != ADMIN_ROLE:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return claims
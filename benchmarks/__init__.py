@@ -0,0 +1,8 @@
+# Benchmarks for the scoring paths
+# - synthetic.py   applicants / transactions / businesses + model training
+# - scoring.py     in-process latency, batch throughput and peak memory
+# - http_load.py   load against a running FastAPI or Flask server
+# - results.py     JSON output and the baseline comparison CI runs
+#
+# Run from the repo root, e.g.
+#   python -m benchmarks.scoring --output bench.json --baseline baseline.json
@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+from benchmarks.results import check_baseline, write_results
+from benchmarks.synthetic import generate_applicants, generate_businesses, generate_transactions
+
+# HTTP load against a running server
+# Closed loop: --concurrency clients each send the next request as soon as
+# the previous one comes back, for --duration seconds per endpoint
+# Start the server first with rate limiting off (RATE_LIMIT_PER_MINUTE=0) -
+# a handful of clients from one IP go over the default 60/minute straight
+# away, and the run would measure the limiter's 429s. A run that gets any
+# 429 fails, e.g.
+#   RATE_LIMIT_PER_MINUTE=0 uvicorn main:app --port 8000
+#   python -m benchmarks.http_load --target fastapi --url http://localhost:8000
+#   RATE_LIMIT_PER_MINUTE=0 python api_server.py
+#   python -m benchmarks.http_load --target flask --url http://localhost:5000
+
+# Endpoint -> which synthetic payloads it takes
+TARGETS = {
+    'fastapi': {
+        '/predict_credit_score': 'applicants',
+        '/detect_fraud': 'transactions',
+        '/evaluate_business_risk': 'businesses',
+        '/enhanced_credit_score': 'applicants'
+    },
+    'flask': {
+        '/api/credit-score': 'applicants'
+    }
+}
+
+
+def build_payloads(n: int, seed: int) -> Dict[str, List[Dict]]:
+    return {
+        'applicants': generate_applicants(n, seed),
+        # Raw transactions - the server's feature store fills in the rest
+        'transactions': generate_transactions(n, seed),
+        'businesses': generate_businesses(n, seed)
+    }
+
+
+async def _client(session: aiohttp.ClientSession, url: str, payloads, deadline: float,
+                  timings: List[float], statuses: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        payload = next(payloads)
+        started = time.perf_counter()
+        try:
+            async with session.post(url, json=payload) as response:
+                await response.read()
+                status = str(response.status)
+        except aiohttp.ClientError as e:
+            status = type(e).__name__
+        except asyncio.TimeoutError:
+            status = 'timeout'
+        timings.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def load_endpoint(base_url: str, path: str, payloads: List[Dict], concurrency: int,
+                        duration: float, timeout: float = 10.0) -> Dict:
+    """
+    Hammer one endpoint and summarize latency, throughput and errors
+    """
+    url = base_url.rstrip('/') + path
+    cycle = itertools.cycle(payloads)
+    timings: List[float] = []
+    statuses: Dict[str, int] = {}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        # Short warmup so connection setup and lazy model loading aren't counted
+        await asyncio.gather(*(_client(session, url, cycle, time.perf_counter() + 0.5, [], {})
+                               for _ in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(_client(session, url, cycle, started + duration, timings, statuses)
+                               for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    timings_ms = np.array(timings) * 1000 if timings else np.zeros(1)
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    return {
+        'requests': len(timings),
+        'requests_per_second': len(timings) / elapsed,
+        'mean_ms': float(timings_ms.mean()),
+        'p50_ms': float(np.percentile(timings_ms, 50)),
+        'p95_ms': float(np.percentile(timings_ms, 95)),
+        'p99_ms': float(np.percentile(timings_ms, 99)),
+        'error_rate': errors / len(timings) if timings else 1.0,
+        'statuses': statuses
+    }
+
+
+async def run(target: str, base_url: str, concurrency: int, duration: float, n_payloads: int,
+              seed: int, only: Optional[List[str]] = None) -> List[Dict]:
+    payloads = build_payloads(n_payloads, seed)
+    results = []
+    for path, kind in TARGETS[target].items():
+        if only and path not in only:
+            continue
+        result = await load_endpoint(base_url, path, payloads[kind], concurrency, duration)
+        results.append({'name': f"{target}{path}.c{concurrency}", 'concurrency': concurrency, **result})
+        print(f"{path:>26} {result['requests_per_second']:9.1f} req/s  p50 {result['p50_ms']:8.2f}ms  "
+              f"p99 {result['p99_ms']:8.2f}ms  errors {result['error_rate']:.1%}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP load test for the scoring APIs")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="fastapi")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint and concurrency")
+    parser.add_argument("--payloads", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", default=None, help="Only these paths")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    parser.add_argument("--baseline", default=None, help="Fail on regressions against this JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"concurrency {concurrency}")
+        results.extend(asyncio.run(run(args.target, args.url, concurrency, args.duration,
+                                       args.payloads, args.seed, args.only)))
+
+    report = write_results(f'http_{args.target}', results, args.output, config={
+        'url': args.url,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'seed': args.seed
+    })
+    rate_limited = sum(result['statuses'].get('429', 0) for result in results)
+    if rate_limited:
+        print(f"{rate_limited} requests got 429 - restart the server with RATE_LIMIT_PER_MINUTE=0")
+    passed = check_baseline(report, args.baseline, args.tolerance)
+    sys.exit(0 if passed and not rate_limited else 1)
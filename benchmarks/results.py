@@ -0,0 +1,96 @@
+import json
+import os
+import platform
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Results are one JSON document per run:
+#   {"suite": ..., "environment": {...}, "results": [{"name": ..., <metrics>}]}
+# compare() checks a run against a baseline run of the same suite
+
+# Which way is better for every metric the benchmarks report
+LOWER_IS_BETTER = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'peak_memory_mb', 'error_rate')
+HIGHER_IS_BETTER = ('rows_per_second', 'requests_per_second')
+
+
+def environment() -> Dict:
+    """
+    What the numbers were measured on - only compare like with like
+    """
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+    for package in ('numpy', 'sklearn', 'xgboost', 'pandas'):
+        try:
+            module = __import__(package)
+            info[package] = getattr(module, '__version__', 'unknown')
+        except ImportError:
+            info[package] = None
+    return info
+
+
+def write_results(suite: str, results: List[Dict], path: Optional[str], config: Optional[Dict] = None) -> Dict:
+    report = {
+        'suite': suite,
+        'created_at': datetime.now().isoformat(),
+        'environment': environment(),
+        'config': config or {},
+        'results': results
+    }
+    if path:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Dict]:
+    """
+    Metrics that got worse than the baseline by more than tolerance
+    (0.2 = 20%). Benchmarks missing from either side are skipped
+    """
+    baseline_results = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        previous = baseline_results.get(result['name'])
+        if previous is None:
+            continue
+        for metric, value in result.items():
+            old = previous.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            if metric in LOWER_IS_BETTER:
+                change = value / old - 1
+            elif metric in HIGHER_IS_BETTER:
+                change = old / value - 1 if value > 0 else float('inf')
+            else:
+                continue
+            if change > tolerance:
+                regressions.append({
+                    'name': result['name'],
+                    'metric': metric,
+                    'baseline': old,
+                    'current': value,
+                    'change': change
+                })
+    return regressions
+
+
+def check_baseline(report: Dict, baseline_path: Optional[str], tolerance: float) -> bool:
+    """
+    Print regressions against a baseline file, False if there were any
+    """
+    if not baseline_path:
+        return True
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression['name']} {regression['metric']}: "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g} "
+              f"({regression['change']:+.0%} worse)")
+    if not regressions:
+        print(f"No regressions over {tolerance:.0%} against {baseline_path}")
+    return not regressions
@@ -0,0 +1,188 @@
+import argparse
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.results import check_baseline, write_results
+from benchmarks.synthetic import generate_applicants, generate_businesses, generate_transactions, train_models
+
+# In-process benchmarks for every scoring path
+# For each path:
+# - single: latency of one call, the way one API request pays for it
+# - batch:  throughput of the batch method at a few batch sizes
+# - memory: peak Python/NumPy allocation of one batch (tracemalloc)
+# Caches are off unless --with-cache, so the model work is what's measured
+#
+#   python -m benchmarks.scoring --quick --output bench.json
+#   python -m benchmarks.scoring --models-dir models --baseline baseline.json
+
+DEFAULT_BATCH_SIZES = (64, 1024)
+
+
+def _percentiles(timings: List[float]) -> Dict:
+    timings_ms = np.array(timings) * 1000
+    return {
+        'calls': len(timings_ms),
+        'mean_ms': float(timings_ms.mean()),
+        'p50_ms': float(np.percentile(timings_ms, 50)),
+        'p95_ms': float(np.percentile(timings_ms, 95)),
+        'p99_ms': float(np.percentile(timings_ms, 99))
+    }
+
+
+def measure_single(fn: Callable, payloads: List, warmup: int = 20) -> Dict:
+    """
+    Latency of fn(payload), one payload per call
+    """
+    for payload in payloads[:warmup]:
+        fn(payload)
+    timings = []
+    for payload in payloads:
+        started = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - started)
+    return _percentiles(timings)
+
+
+def measure_batch(fn: Callable, payloads: List, batch_size: int, min_seconds: float = 1.0) -> Dict:
+    """
+    Rows per second for fn(batch), repeating until min_seconds have passed
+    """
+    batches = [payloads[i:i + batch_size] for i in range(0, len(payloads) - batch_size + 1, batch_size)]
+    if not batches:
+        batches = [payloads]
+    fn(batches[0])  # warm up
+
+    rows = 0
+    timings = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds or not timings:
+        for batch in batches:
+            call_started = time.perf_counter()
+            fn(batch)
+            timings.append(time.perf_counter() - call_started)
+            rows += len(batch)
+    elapsed = time.perf_counter() - started
+    return {'batch_size': len(batches[0]), 'rows_per_second': rows / elapsed, **_percentiles(timings)}
+
+
+def measure_memory(fn: Callable, batch: List) -> Dict:
+    """
+    Peak traced allocation while scoring one batch
+    NumPy reports its buffers to tracemalloc, so arrays are included
+    """
+    fn(batch)  # lazy imports / first-call allocations aren't what we want to see
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(batch)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'batch_size': len(batch), 'peak_memory_mb': peak / (1024 * 1024)}
+
+
+def _load_systems(models_dir: Optional[str], workdir: str, seed: int, with_cache: bool):
+    from credit_scoring import MshiyaneCreditScoring
+    from enhanced_credit_scoring import MshiyaneCreditScoringSystem
+    from score_cache import ScoreCache
+
+    if models_dir:
+        paths = {'basic': models_dir, 'enhanced': models_dir}
+    else:
+        print("Training models on synthetic data...", file=sys.stderr)
+        paths = train_models(workdir, seed)
+
+    basic = MshiyaneCreditScoring()
+    basic.load_models(paths['basic'])
+    enhanced = MshiyaneCreditScoringSystem()
+    enhanced.load_model(paths['enhanced'])
+    if with_cache:
+        basic.score_cache = ScoreCache()
+        enhanced.score_cache = ScoreCache()
+    return basic, enhanced
+
+
+def build_cases(basic, enhanced, n: int, seed: int) -> List[Dict]:
+    """
+    (name, single-call fn, batch fn, payloads) for every scoring path
+    """
+    applicants = generate_applicants(n, seed)
+    transactions = generate_transactions(n, seed, precomputed=True)
+    businesses = generate_businesses(n, seed)
+    return [
+        {'name': 'credit_score', 'single': basic.calculate_credit_score,
+         'batch': basic.score_batch, 'payloads': applicants},
+        {'name': 'fraud', 'single': basic.detect_fraud,
+         'batch': basic.detect_fraud_batch, 'payloads': transactions},
+        {'name': 'business_risk', 'single': basic.evaluate_business_risk,
+         'batch': basic.evaluate_business_risk_batch,
+         'payloads': businesses},
+        {'name': 'enhanced_credit_score', 'single': enhanced.calculate_credit_score,
+         'batch': enhanced.score_batch, 'payloads': applicants}
+    ]
+
+
+def run(cases: List[Dict], single_calls: int, batch_sizes, min_seconds: float,
+        only: Optional[List[str]] = None) -> List[Dict]:
+    results = []
+    for case in cases:
+        if only and case['name'] not in only:
+            continue
+        payloads = case['payloads']
+
+        result = measure_single(case['single'], payloads[:single_calls])
+        results.append({'name': f"{case['name']}.single", **result})
+        print(f"{case['name']:>22} single      p50 {result['p50_ms']:8.3f}ms  p99 {result['p99_ms']:8.3f}ms")
+
+        for batch_size in batch_sizes:
+            result = measure_batch(case['batch'], payloads, batch_size, min_seconds)
+            results.append({'name': f"{case['name']}.batch_{batch_size}", **result})
+            print(f"{case['name']:>22} batch {batch_size:<5} {result['rows_per_second']:12.0f} rows/s")
+
+        result = measure_memory(case['batch'], payloads[:max(batch_sizes)])
+        results.append({'name': f"{case['name']}.memory", **result})
+        print(f"{case['name']:>22} memory      {result['peak_memory_mb']:8.2f}MB peak for "
+              f"{result['batch_size']} rows")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scoring paths")
+    parser.add_argument("--models-dir", default=None,
+                        help="Trained models to load (default: train on synthetic data)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows", type=int, default=4096, help="Synthetic payloads per path")
+    parser.add_argument("--single-calls", type=int, default=500)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Time spent per batch size")
+    parser.add_argument("--only", nargs="+", default=None, help="Only these paths")
+    parser.add_argument("--with-cache", action="store_true", help="Score with a ScoreCache attached")
+    parser.add_argument("--quick", action="store_true", help="Small run for smoke testing")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    parser.add_argument("--baseline", default=None, help="Fail on regressions against this JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.quick:
+        args.rows, args.single_calls, args.min_seconds = 512, 100, 0.2
+
+    with tempfile.TemporaryDirectory() as workdir:
+        basic, enhanced = _load_systems(args.models_dir, workdir, args.seed, args.with_cache)
+        cases = build_cases(basic, enhanced, args.rows, args.seed)
+        results = run(cases, args.single_calls, args.batch_sizes, args.min_seconds, args.only)
+
+    report = write_results('scoring', results, args.output, config={
+        'seed': args.seed,
+        'rows': args.rows,
+        'single_calls': args.single_calls,
+        'batch_sizes': args.batch_sizes,
+        'with_cache': args.with_cache,
+        'models_dir': args.models_dir
+    })
+    sys.exit(0 if check_baseline(report, args.baseline, args.tolerance) else 1)
@@ -0,0 +1,166 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+
+# Synthetic inputs for the benchmarks
+# Sizes follow what production traffic looks like rather than uniform
+# noise: incomes are log-normal, most applicants have a short transaction
+# history but a few have hundreds, and a handful of busy accounts produce
+# most of the transactions. Everything is seeded, so the same seed gives
+# the same payloads (and the same trained models) on every run
+
+INDUSTRIES = ['technology', 'healthcare', 'education', 'retail', 'manufacturing',
+              'services', 'restaurant', 'entertainment', 'construction', 'agriculture']
+# Rough share of loan applications per industry
+INDUSTRY_WEIGHTS = [0.12, 0.08, 0.05, 0.2, 0.1, 0.15, 0.12, 0.05, 0.08, 0.05]
+
+# Johannesburg - transactions are scattered around it
+BASE_LOCATION = (-26.2041, 28.0473)
+
+
+def _history_lengths(rng: np.random.Generator, n: int, mean: float, cap: int) -> np.ndarray:
+    """
+    Heavy-tailed list lengths (negative binomial), capped
+    """
+    return np.minimum(rng.negative_binomial(1, 1 / (1 + mean), n), cap)
+
+
+def generate_applicants(n: int, seed: int = 0) -> List[Dict]:
+    """
+    Applicants with every field the basic and the enhanced scorer read
+    """
+    rng = np.random.default_rng(seed)
+    income = np.round(rng.lognormal(np.log(250000), 0.7, n), 2)
+    age = np.clip(rng.normal(38, 11, n), 18, 85).round()
+    years_of_history = np.clip(age - 18 - rng.exponential(4, n), 0, None).round(1)
+    n_transactions = _history_lengths(rng, n, 40, 1000)
+    n_income = rng.integers(0, 25, n)
+    n_jobs = _history_lengths(rng, n, 1.5, 12)
+    total_credit = np.round(income * rng.uniform(0.1, 0.6, n), 2)
+
+    applicants = []
+    for i in range(n):
+        payments = int(rng.integers(1, 120))
+        late = int(rng.binomial(payments, 0.08))
+        applicants.append({
+            'applicant_id': f'bench-{seed}-{i}',
+            'annual_income': float(income[i]),
+            'years_of_credit_history': float(years_of_history[i]),
+            'num_accounts': int(rng.poisson(3)),
+            'payment_history_score': float(np.clip(rng.normal(80, 15), 0, 100)),
+            'debt_to_income_ratio': float(np.clip(rng.beta(2, 5), 0, 1)),
+            'num_recent_inquiries': int(rng.poisson(1)),
+            'age': float(age[i]),
+            'credit_utilization': float(np.clip(rng.beta(2, 3) * 100, 0, 100)),
+            'income_history': np.round(rng.lognormal(np.log(income[i] / 12), 0.2, n_income[i]), 2).tolist(),
+            'transaction_history': [{'amount': float(amount)} for amount in
+                                    np.round(rng.lognormal(5, 1.2, n_transactions[i]), 2)],
+            'savings_amount': float(np.round(rng.lognormal(np.log(20000), 1.2), 2)),
+            'employment_history': [{'duration_years': float(years)} for years in
+                                   np.round(rng.exponential(3, n_jobs[i]), 1)],
+            'on_time_payment_ratio': float(rng.beta(8, 1)),
+            'savings_frequency': float(rng.uniform()),
+            'overdraft_frequency': float(rng.beta(1, 8)),
+            'mobile_app_usage_score': float(rng.uniform()),
+            'payment_history': {'on_time': payments - late, 'total': payments, 'late': late},
+            'total_credit': float(total_credit[i]),
+            'used_credit': float(np.round(total_credit[i] * rng.beta(2, 3), 2))
+        })
+    return applicants
+
+
+def generate_transactions(n: int, seed: int = 0, n_accounts: int = 1000,
+                          precomputed: bool = False) -> List[Dict]:
+    """
+    Card transactions in time order
+    Raw by default (account_id, amount, timestamp, location) like the API
+    gets them; precomputed=True also fills in the fraud features so the
+    model can be called without a feature store
+    """
+    rng = np.random.default_rng(seed)
+    # Zipf-ish: a few accounts are very busy
+    account_weights = 1 / np.arange(1, n_accounts + 1) ** 1.1
+    accounts = rng.choice(n_accounts, n, p=account_weights / account_weights.sum())
+    timestamps = 1_700_000_000 + np.cumsum(rng.exponential(86400 * n_accounts / max(n, 1) / 10, n))
+    amounts = np.round(rng.lognormal(5, 1.3, n), 2)
+    latitudes = BASE_LOCATION[0] + rng.normal(0, 0.3, n)
+    longitudes = BASE_LOCATION[1] + rng.normal(0, 0.3, n)
+
+    transactions = []
+    for i in range(n):
+        transaction = {
+            'transaction_id': f'bench-{seed}-{i}',
+            'account_id': f'acct-{accounts[i]}',
+            'amount': float(amounts[i]),
+            'timestamp': float(timestamps[i]),
+            'latitude': float(latitudes[i]),
+            'longitude': float(longitudes[i])
+        }
+        if precomputed:
+            transaction.update({
+                'time_of_day': float((timestamps[i] % 86400) / 3600),
+                'distance_from_last_transaction': float(rng.exponential(5)),
+                'frequency_last_24h': float(rng.poisson(3)),
+                'average_transaction_amount': float(np.round(rng.lognormal(5, 0.8), 2))
+            })
+        transactions.append(transaction)
+    return transactions
+
+
+def generate_businesses(n: int, seed: int = 0) -> List[Dict]:
+    """
+    Business loan applications
+    """
+    rng = np.random.default_rng(seed)
+    industries = rng.choice(INDUSTRIES, n, p=INDUSTRY_WEIGHTS)
+    return [
+        {
+            'business_id': f'bench-{seed}-{i}',
+            'annual_revenue': float(np.round(rng.lognormal(np.log(600000), 1.0), 2)),
+            'years_in_operation': float(np.round(rng.exponential(6), 1)),
+            'industry': str(industries[i])
+        }
+        for i in range(n)
+    ]
+
+
+def train_models(directory: str, seed: int = 0, n_rows: int = 5000) -> Dict[str, str]:
+    """
+    Fit both scoring systems on synthetic data, with their production
+    hyperparameters (model size is what drives scoring cost), and save
+    them the same way the real training does
+    Returns {'basic': path, 'enhanced': path}
+    """
+    import pandas as pd
+
+    from credit_scoring import CREDIT_FEATURES, FRAUD_FEATURES, MshiyaneCreditScoring
+    from enhanced_credit_scoring import MshiyaneCreditScoringSystem
+
+    rng = np.random.default_rng(seed)
+    applicants = generate_applicants(n_rows, seed)
+    transactions = generate_transactions(n_rows, seed, precomputed=True)
+
+    basic_path = os.path.join(directory, 'basic')
+    os.makedirs(basic_path, exist_ok=True)
+    basic = MshiyaneCreditScoring()
+    X = basic.preprocess_features_batch(pd.DataFrame(applicants))
+    y = (300 + 5 * X[:, CREDIT_FEATURES.index('payment_history_score')]
+         - 100 * X[:, CREDIT_FEATURES.index('debt_to_income_ratio')] + rng.normal(0, 20, len(X)))
+    basic.scaler.fit(X)
+    basic.credit_model.fit(basic.scaler.transform(X), y)
+    X_fraud = np.array([[t[name] for name in FRAUD_FEATURES] for t in transactions])
+    y_fraud = (X_fraud[:, 0] > np.quantile(X_fraud[:, 0], 0.97)) | (rng.uniform(size=len(X_fraud)) < 0.01)
+    basic.fraud_model.fit(X_fraud, y_fraud.astype(int))
+    basic.save_models(basic_path)
+
+    enhanced_path = os.path.join(directory, 'enhanced')
+    os.makedirs(enhanced_path, exist_ok=True)
+    enhanced = MshiyaneCreditScoringSystem()
+    X = enhanced.preprocess_features_batch(applicants)
+    y = 300 + 550 * rng.beta(5, 2, len(X))
+    enhanced.scaler.fit(X)
+    enhanced.model.fit(enhanced.scaler.transform(X), y)
+    enhanced.save_model(enhanced_path)
+
+    return {'basic': basic_path, 'enhanced': enhanced_path}
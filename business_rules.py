@@ -0,0 +1,258 @@
+import bisect
+import hashlib
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Business loan risk rules as data instead of an if/elif chain
+# The table below is the default. Credit ops can override any top-level
+# section ("bands", "industry", "levels") with a JSON file of the same
+# shape (BUSINESS_RULES_PATH) - read when the scoring system is created,
+# so a rule change is a config change plus a restart, not a deploy
+#
+# - bands: a numeric field is cut at the thresholds (value > threshold
+#   moves up a band), each band adds points and maybe a factor
+# - industry: tiers of industries (matched case-insensitively) plus the
+#   tier for anything that isn't listed
+# - levels: total points >= threshold moves up a level
+#
+# BusinessRules compiles the table into NumPy arrays: a whole portfolio
+# is banded with np.digitize, industries are looked up once per distinct
+# name and the results are built once per distinct outcome
+
+BUSINESS_RULES_PATH = os.getenv("BUSINESS_RULES_PATH")
+
+DEFAULT_BUSINESS_RULES = {
+    "bands": [
+        {
+            "field": "annual_revenue",
+            "thresholds": [500000, 1000000],
+            "points": [0, 20, 30],
+            "factors": [None, "Moderate annual revenue", "Strong annual revenue"]
+        },
+        {
+            "field": "years_in_operation",
+            "thresholds": [2, 5],
+            "points": [0, 15, 25],
+            "factors": [None, "Growing business", "Established business"]
+        }
+    ],
+    "industry": {
+        "field": "industry",
+        "tiers": [
+            {"industries": ["technology", "healthcare", "education"],
+             "points": 25, "factor": "Low-risk industry"},
+            {"industries": ["retail", "manufacturing", "services"],
+             "points": 15, "factor": "Medium-risk industry"},
+            {"industries": ["restaurant", "entertainment", "construction"],
+             "points": 5, "factor": "High-risk industry"}
+        ],
+        # Unknown industries are treated as high risk
+        "default": {"points": 5, "factor": "High-risk industry"}
+    },
+    "levels": {
+        "thresholds": [40, 70],
+        "labels": ["HIGH_RISK", "MEDIUM_RISK", "LOW_RISK"]
+    }
+}
+
+
+def _number(value) -> float:
+    # Missing, null and NaN all count as 0 (the old .get(field, 0))
+    if value is None:
+        return 0.0
+    value = float(value)
+    return 0.0 if math.isnan(value) else value
+
+
+def _is_sorted(values: List[float]) -> bool:
+    return all(a < b for a, b in zip(values, values[1:]))
+
+
+class _Band:
+    def __init__(self, rule: Dict):
+        self.field = rule["field"]
+        self.thresholds = [float(threshold) for threshold in rule["thresholds"]]
+        self.points = list(rule["points"])
+        self.factors = list(rule.get("factors") or [None] * len(self.points))
+
+        if not _is_sorted(self.thresholds):
+            raise ValueError(f"Thresholds for {self.field} must be increasing")
+        if len(self.points) != len(self.thresholds) + 1 or len(self.factors) != len(self.points):
+            raise ValueError(f"{self.field} needs one points/factors entry per band "
+                             f"({len(self.thresholds) + 1})")
+
+        self.threshold_array = np.array(self.thresholds)
+
+
+class BusinessRules:
+    """
+    Compiled business risk rule table
+    evaluate_one for a single business, evaluate_batch / evaluate_frame
+    for many at once - all three give the same answers
+    """
+
+    def __init__(self, rules: Dict):
+        self.rules = rules
+        # Part of the score cache key, so changed rules never serve old results
+        self.version = hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:16]
+
+        self.bands = [_Band(rule) for rule in rules.get("bands", [])]
+
+        industry = rules["industry"]
+        self.industry_field = industry.get("field", "industry")
+        tiers = list(industry.get("tiers", [])) + [industry["default"]]
+        self.industry_tiers = {}
+        for index, tier in enumerate(tiers[:-1]):
+            for name in tier["industries"]:
+                # First tier wins if an industry is listed twice
+                self.industry_tiers.setdefault(str(name).lower(), index)
+        self.default_tier = len(tiers) - 1
+        self.industry_points = [tier["points"] for tier in tiers]
+        self.industry_factors = [tier.get("factor") for tier in tiers]
+
+        levels = rules["levels"]
+        self.level_thresholds = [float(threshold) for threshold in levels["thresholds"]]
+        self.level_labels = list(levels["labels"])
+        if not _is_sorted(self.level_thresholds):
+            raise ValueError("Level thresholds must be increasing")
+        if len(self.level_labels) != len(self.level_thresholds) + 1:
+            raise ValueError(f"Need {len(self.level_thresholds) + 1} level labels")
+
+        # A business's outcome depends only on its band in each rule and
+        # its industry tier, so batches encode those as one mixed-radix code
+        self._radixes = [len(band.points) for band in self.bands] + [len(tiers)]
+
+    @property
+    def numeric_fields(self) -> List[str]:
+        return [band.field for band in self.bands]
+
+    def _industry_tier(self, industry) -> int:
+        return self.industry_tiers.get(str(industry if industry is not None else "").lower(),
+                                       self.default_tier)
+
+    def _outcome(self, bands: List[int], tier: int) -> Dict:
+        """
+        Score, level and factors for a business in these bands and tier
+        """
+        risk_score = sum(band.points[index] for band, index in zip(self.bands, bands))
+        risk_score += self.industry_points[tier]
+        factors = [band.factors[index] for band, index in zip(self.bands, bands)]
+        factors.append(self.industry_factors[tier])
+        return {
+            'risk_score': risk_score,
+            'risk_level': self.level_labels[bisect.bisect_right(self.level_thresholds, risk_score)],
+            'factors': [factor for factor in factors if factor]
+        }
+
+    def evaluate_one(self, business: Dict) -> Dict:
+        """
+        One business, in plain Python (bisect on the same thresholds that
+        np.digitize uses for batches - NumPy costs more than it saves here)
+        """
+        # bisect_left == np.digitize(right=True): above a threshold moves up
+        bands = [bisect.bisect_left(band.thresholds, _number(business.get(band.field)))
+                 for band in self.bands]
+        return self._outcome(bands, self._industry_tier(business.get(self.industry_field)))
+
+    def _columns(self, businesses) -> Tuple[int, Any]:
+        """
+        (row count, columns) for a list of dicts, a DataFrame or a dict of columns
+        """
+        if isinstance(businesses, list):
+            fields = self.numeric_fields + [self.industry_field]
+            return len(businesses), {field: [business.get(field) for business in businesses]
+                                     for field in fields}
+        if hasattr(businesses, "index"):
+            return len(businesses.index), businesses
+        lengths = {len(values) for values in businesses.values()}
+        if len(lengths) > 1:
+            raise ValueError("Columns must all be the same length")
+        return (lengths.pop() if lengths else 0), businesses
+
+    def _codes(self, columns, rows: int) -> np.ndarray:
+        """
+        Band every row in every rule, as one mixed-radix code per row
+        """
+        codes = np.zeros(rows, dtype=np.int64)
+        for band, radix in zip(self.bands, self._radixes):
+            if band.field in columns:
+                values = np.nan_to_num(np.asarray(columns[band.field], dtype=float), nan=0.0)
+                codes = codes * radix + np.digitize(values, band.threshold_array, right=True)
+            else:
+                codes = codes * radix
+
+        if self.industry_field in columns:
+            # Lowercase/look up each distinct name once, then fan back out
+            names, inverse = np.unique(np.asarray(columns[self.industry_field], dtype=str),
+                                       return_inverse=True)
+            tiers = np.array([self._industry_tier(name) for name in names.tolist()],
+                             dtype=np.int64)[inverse.reshape(-1)]
+        else:
+            tiers = np.full(rows, self.default_tier, dtype=np.int64)
+        return codes * self._radixes[-1] + tiers
+
+    def _outcomes(self, codes: np.ndarray) -> Tuple[List[Dict], np.ndarray]:
+        """
+        The outcome for each distinct code, plus each row's index into them
+        A rule table only has a few dozen possible outcomes, so the scores,
+        levels and factor lists are built once each, not once per row
+        """
+        distinct, inverse = np.unique(codes, return_inverse=True)
+        outcomes = []
+        for code in distinct.tolist():
+            indexes = []
+            for radix in reversed(self._radixes):
+                code, index = divmod(code, radix)
+                indexes.append(index)
+            indexes.reverse()
+            outcomes.append(self._outcome(indexes[:-1], indexes[-1]))
+        return outcomes, inverse.reshape(-1)
+
+    def evaluate_batch(self, businesses) -> List[Dict]:
+        """
+        Many businesses at once (list of dicts, DataFrame or dict of
+        columns) - one result dict per business, like evaluate_one
+        """
+        rows, columns = self._columns(businesses)
+        if rows == 0:
+            return []
+        outcomes, index = self._outcomes(self._codes(columns, rows))
+        outcomes = [(outcome['risk_score'], outcome['risk_level'], outcome['factors'])
+                    for outcome in outcomes]
+        return [{'risk_score': risk_score, 'risk_level': risk_level, 'factors': list(factors)}
+                for risk_score, risk_level, factors in map(outcomes.__getitem__, index.tolist())]
+
+    def evaluate_frame(self, frame):
+        """
+        Portfolio review: the DataFrame with risk_score, risk_level and
+        factors columns added
+        """
+        rows = len(frame.index)
+        if rows == 0:
+            return frame.assign(risk_score=[], risk_level=[], factors=[])
+        outcomes, index = self._outcomes(self._codes(frame, rows))
+        factors = np.empty(len(outcomes), dtype=object)
+        for position, outcome in enumerate(outcomes):
+            factors[position] = outcome['factors']
+        return frame.assign(
+            risk_score=np.array([outcome['risk_score'] for outcome in outcomes])[index],
+            risk_level=np.array([outcome['risk_level'] for outcome in outcomes], dtype=object)[index],
+            factors=factors[index]
+        )
+
+
+def load_business_rules(path: Optional[str] = None) -> BusinessRules:
+    """
+    The default rules, with any sections from the JSON file at path
+    (BUSINESS_RULES_PATH if not given) replacing the defaults
+    """
+    path = path or BUSINESS_RULES_PATH
+    rules = dict(DEFAULT_BUSINESS_RULES)
+    if path:
+        with open(path) as f:
+            rules.update(json.load(f))
+    return BusinessRules(rules)
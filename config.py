@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from functools import lru_cache
 from typing import Optional
 import os
 from dotenv import load_dotenv
@@ -29,6 +30,18 @@ class Settings(BaseSettings):
     # Started with SQLite, moved to PostgreSQL
     DATABASE_URL: str
     DATABASE_ENCRYPTION_KEY: str  # For encrypting sensitive data
+    # Async driver URL, derived from DATABASE_URL when not set
+    # (postgresql -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    
+    # Connection pooling
+    # These used to be hardcoded in database.py (5 + 10 overflow)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Connections were dying after 30 mins
+    DB_CONNECT_RETRIES: int = 5
+    DB_RETRY_BACKOFF_SECONDS: float = 0.5  # Doubled after every failed attempt
     
     # SSL/TLS
     # Had to learn about SSL certificates the hard way
@@ -37,7 +50,10 @@ class Settings(BaseSettings):
     
     # Rate Limiting
     # Added after getting DDoS'd during testing
-    RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_PER_MINUTE: int = 60  # 0 turns it off
+    RATE_LIMIT_BURST: Optional[int] = None  # Defaults to a minute's worth
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # Shared limits across workers
+    RATE_LIMIT_ROUTE_COSTS: dict = {}  # Extra/overridden per-path costs, JSON in .env
     
     # Logging
     # Added after debugging became impossible
@@ -54,12 +70,28 @@ class Settings(BaseSettings):
         env_file = ".env"
         case_sensitive = True
 
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
+
+class _LazySettings:
+    """
+    Builds the Settings the first time an attribute is read
+    Importing config used to read and validate the environment, which every
+    tool and worker that imported anything from the app paid for
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
 # Create settings instance
 # This is used throughout the app
-settings = Settings()
+settings = _LazySettings()
 
 # Validate required settings
 # Added this after deployment failed due to missing env vars
+# Called from the app's startup now instead of on import, so a bad config
+# still stops the app before it serves anything
 def validate_settings():
     required_settings = [
         "SECRET_KEY",
@@ -75,8 +107,4 @@ def validate_settings():
     if missing_settings:
         raise ValueError(
             f"Missing required settings: {', '.join(missing_settings)}"
-        )
-
-# Validate settings on import
-# This prevents the app from starting with invalid config
-validate_settings() 
\ No newline at end of file
+        )
\ No newline at end of file
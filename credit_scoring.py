@@ -2,17 +2,53 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
+import hashlib
 from typing import Dict, List, Optional
 import pandas as pd
+import os
 from fastapi import FastAPI
+from business_rules import load_business_rules
+from feature_scaling import PrecomputedScaler
+from metrics import time_stage
+from config import settings
+from rate_limit import RateLimitMiddleware
+from score_cache import make_cache_key, make_cache_keys
+from tree_compiler import check_parity, compile_ensemble, use_compiled
 
 # TODO: Add proper error handling
 # TODO: Implement request validation
-# TODO: Add rate limiting
 # TODO: Add proper logging
-# TODO: Consider adding caching
 
 app = FastAPI()
+app.add_middleware(RateLimitMiddleware, settings=settings)
+
+# Feature order expected by the models - training and serving must agree
+CREDIT_FEATURES = [
+    'annual_income',
+    'years_of_credit_history',
+    'num_accounts',
+    'payment_history_score',
+    'debt_to_income_ratio',
+    'num_recent_inquiries',
+    'age'
+]
+
+FRAUD_FEATURES = [
+    'amount',
+    'time_of_day',
+    'distance_from_last_transaction',
+    'frequency_last_24h',
+    'average_transaction_amount'
+]
+
+def _require_finite(values: np.ndarray, what: str):
+    """
+    Reject null/NaN/inf inputs before they reach a model
+    The compiled trees and the estimators treat NaN differently, so the
+    same row could otherwise score differently depending on batch size
+    """
+    if not np.isfinite(values).all():
+        raise ValueError(f"{what} must be finite numbers (got null, NaN or inf)")
 
 @app.get("/")
 def read_root():
@@ -24,6 +60,7 @@ class MshiyaneCreditScoring:
         # GradientBoosting performed better for credit scoring
         # RandomForest worked well for fraud detection
         self.scaler = StandardScaler()
+        self.fast_scaler = None  # Set from the fitted scaler when models are loaded
         self.credit_model = GradientBoostingRegressor(
             n_estimators=100,  # Tuned based on performance
             learning_rate=0.1,  # Found this to be optimal
@@ -35,6 +72,16 @@ class MshiyaneCreditScoring:
             max_depth=10,  # Allows for complex patterns
             random_state=42
         )
+        # NumPy versions of the trained models (see tree_compiler.py)
+        self.compiled_credit_model = None
+        self.compiled_fraud_model = None
+        # Content hash of the loaded model files, part of every cache key
+        self.model_version = "untrained"
+        self.score_cache = None  # Optional ScoreCache/RedisScoreCache
+        # Optional StreamingFraudFeatureStore for raw transactions
+        self.feature_store = None
+        # Business risk rule table (business_rules.py, BUSINESS_RULES_PATH)
+        self.business_rules = load_business_rules()
 
     def preprocess_features(self, user_data: Dict) -> np.ndarray:
         """
@@ -44,17 +91,25 @@ class MshiyaneCreditScoring:
         TODO: Add data cleaning
         TODO: Consider adding more advanced preprocessing
         """
-        features = [
-            float(user_data.get('annual_income', 0)),
-            float(user_data.get('years_of_credit_history', 0)),
-            float(user_data.get('num_accounts', 0)),
-            float(user_data.get('payment_history_score', 0)),
-            float(user_data.get('debt_to_income_ratio', 0)),
-            float(user_data.get('num_recent_inquiries', 0)),
-            float(user_data.get('age', 0))
-        ]
+        features = [float(user_data.get(name, 0)) for name in CREDIT_FEATURES]
         return np.array(features).reshape(1, -1)
 
+    def preprocess_features_batch(self, users) -> np.ndarray:
+        """
+        Build the feature matrix for many applicants in one pass
+        Accepts a list of user dicts or a DataFrame with one column per feature
+        """
+        if isinstance(users, pd.DataFrame):
+            # Column-wise - no per-row Python at all
+            frame = users.reindex(columns=CREDIT_FEATURES, fill_value=0)
+            return frame.fillna(0).to_numpy(dtype=float)
+
+        features = np.array(
+            [[user.get(name, 0) for name in CREDIT_FEATURES] for user in users],
+            dtype=float
+        )
+        return features.reshape(-1, len(CREDIT_FEATURES))
+
     def calculate_credit_score(self, user_data: Dict) -> float:
         """
         Calculate credit score based on user data
@@ -63,70 +118,162 @@ class MshiyaneCreditScoring:
         TODO: Add bias detection
         TODO: Consider adding more sophisticated scoring
         """
-        features = self.preprocess_features(user_data)
-        scaled_features = self.scaler.fit_transform(features)
-        
-        # Base score prediction
-        base_score = self.credit_model.predict(scaled_features)[0]
-        
-        # Adjust score based on additional factors
-        adjustments = self._calculate_adjustments(user_data)
-        
-        # Final score between 300 and 850
-        final_score = max(300, min(850, base_score + adjustments))
-        return round(final_score, 2)
-
-    def _calculate_adjustments(self, user_data: Dict) -> float:
-        """
-        Calculate score adjustments based on additional factors
-        """
-        adjustments = 0
-        
-        # Payment history impact
-        if user_data.get('payment_history_score', 0) > 90:
-            adjustments += 50
-        
-        # Length of credit history
-        years_of_history = user_data.get('years_of_credit_history', 0)
-        if years_of_history > 5:
-            adjustments += 30
-        
-        # Credit utilization
-        utilization = user_data.get('credit_utilization', 0)
-        if utilization < 30:
-            adjustments += 40
-        
+        # This used to call scaler.fit_transform on the single row, which
+        # refit the scaler per request and zeroed every feature
+        return self.score_batch([user_data])[0]
+
+    def _scale(self, features: np.ndarray) -> np.ndarray:
+        """
+        Apply the persisted scaler, using the precomputed arrays when available
+        """
+        if self.fast_scaler is not None:
+            return self.fast_scaler.transform(features)
+        return self.scaler.transform(features)
+
+    def _calculate_adjustments_batch(self, features: np.ndarray, utilization: np.ndarray) -> np.ndarray:
+        """
+        Score adjustments for a whole feature matrix
+        +50 for payment history over 90, +30 for more than 5 years of
+        credit history, +40 for credit utilization under 30
+        """
+        payment_history = features[:, CREDIT_FEATURES.index('payment_history_score')]
+        years_of_history = features[:, CREDIT_FEATURES.index('years_of_credit_history')]
+
+        adjustments = np.zeros(len(features))
+        adjustments += np.where(payment_history > 90, 50, 0)
+        adjustments += np.where(years_of_history > 5, 30, 0)
+        adjustments += np.where(utilization < 30, 40, 0)
         return adjustments
 
+    def score_batch(self, users) -> List[float]:
+        """
+        Calculate credit scores for many applicants with a single predict call
+        Accepts a list of user dicts or a DataFrame
+        """
+        with time_stage('credit_score', 'features'):
+            features = self.preprocess_features_batch(users)
+            if len(features) == 0:
+                return []
+
+            if isinstance(users, pd.DataFrame):
+                utilization = users.get('credit_utilization', pd.Series(0, index=users.index))
+                utilization = utilization.fillna(0).to_numpy(dtype=float)
+            else:
+                utilization = np.array([user.get('credit_utilization', 0) for user in users], dtype=float)
+
+        return self.score_features(features, utilization)
+
+    def score_features(self, features: np.ndarray, utilization: np.ndarray) -> List[float]:
+        """
+        Credit scores for a ready-made feature matrix (columns in
+        CREDIT_FEATURES order) plus credit utilization per row
+        Used directly for columnar (Arrow) requests
+        """
+        if len(features) == 0:
+            return []
+        _require_finite(features, 'credit features')
+        _require_finite(utilization, 'credit_utilization')
+        if self.score_cache is None:
+            return self._score_matrix(features, utilization).tolist()
+
+        # Everything the score depends on: model features + utilization
+        with time_stage('credit_score', 'cache_lookup'):
+            keys = make_cache_keys('credit_score', self.model_version,
+                                   np.column_stack([features, utilization]))
+            scores = self.score_cache.get_many(keys)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            computed = self._score_matrix(features[missing], utilization[missing]).tolist()
+            for i, score in zip(missing, computed):
+                scores[i] = score
+            self.score_cache.set_many({keys[i]: scores[i] for i in missing})
+        return scores
+
+    def _score_matrix(self, features: np.ndarray, utilization: np.ndarray) -> np.ndarray:
+        """
+        Scores for a feature matrix (no caching)
+        """
+        with time_stage('credit_score', 'scaling'):
+            scaled_features = self._scale(features)
+        with time_stage('credit_score', 'predict'):
+            base_scores = self._predict_credit(scaled_features)
+        with time_stage('credit_score', 'adjustments'):
+            adjustments = self._calculate_adjustments_batch(features, utilization)
+
+            # Final score between 300 and 850
+            final_scores = np.clip(base_scores + adjustments, 300, 850)
+            return np.round(final_scores, 2)
+
+    def _predict_credit(self, scaled_features: np.ndarray) -> np.ndarray:
+        """
+        Base score prediction, through the compiled trees for small batches
+        """
+        if use_compiled(self.compiled_credit_model, len(scaled_features), self.credit_model is not None):
+            return self.compiled_credit_model.predict(scaled_features)
+        return self.credit_model.predict(scaled_features)
+
+    def _predict_fraud_proba(self, features: np.ndarray) -> np.ndarray:
+        """
+        Fraud class probabilities, through the compiled trees for small batches
+        """
+        if use_compiled(self.compiled_fraud_model, len(features), self.fraud_model is not None):
+            return self.compiled_fraud_model.predict_proba(features)
+        return self.fraud_model.predict_proba(features)
+
     def detect_fraud(self, transaction_data: Dict) -> Dict:
         """
         Detect potential fraud in transactions
+        With a feature_store attached this takes the raw transaction
+        (account_id, amount, timestamp, latitude/longitude)
         TODO: Add more fraud patterns
-        TODO: Implement real-time detection
         TODO: Add fraud pattern learning
         TODO: Consider adding more advanced detection methods
         """
-        features = self._extract_fraud_features(transaction_data)
-        fraud_probability = self.fraud_model.predict_proba(features)[0][1]
-        
-        return {
-            'fraud_probability': fraud_probability,
-            'is_suspicious': fraud_probability > 0.7,
-            'risk_level': self._get_risk_level(fraud_probability)
-        }
-
-    def _extract_fraud_features(self, transaction_data: Dict) -> np.ndarray:
-        """
-        Extract features for fraud detection
-        """
-        features = [
-            float(transaction_data.get('amount', 0)),
-            float(transaction_data.get('time_of_day', 0)),
-            float(transaction_data.get('distance_from_last_transaction', 0)),
-            float(transaction_data.get('frequency_last_24h', 0)),
-            float(transaction_data.get('average_transaction_amount', 0))
-        ]
-        return np.array(features).reshape(1, -1)
+        return self.detect_fraud_batch([transaction_data])[0]
+
+    def detect_fraud_batch(self, transactions: List[Dict]) -> List[Dict]:
+        """
+        Detect fraud for many transactions with a single predict_proba call
+        """
+        if not transactions:
+            return []
+
+        admission = None
+        try:
+            with time_stage('fraud', 'features'):
+                if self.feature_store is not None:
+                    transactions, admission = self.feature_store.admit_batch(transactions)
+                features = np.array(
+                    [[t.get(name, 0) for name in FRAUD_FEATURES] for t in transactions],
+                    dtype=float
+                ).reshape(-1, len(FRAUD_FEATURES))
+            return self.detect_fraud_features(features)
+        except Exception:
+            # Unscored transactions don't count towards the history
+            if admission:
+                self.feature_store.rollback(admission)
+            raise
+
+    def detect_fraud_features(self, features: np.ndarray) -> List[Dict]:
+        """
+        Fraud results for a ready-made feature matrix (FRAUD_FEATURES order)
+        """
+        if len(features) == 0:
+            return []
+        _require_finite(features, 'fraud features')
+        with time_stage('fraud', 'predict'):
+            fraud_probabilities = self._predict_fraud_proba(features)[:, 1]
+
+        # Plain Python types so the JSON encoder doesn't choke on numpy scalars
+        with time_stage('fraud', 'risk_levels'):
+            return [
+                {
+                    'fraud_probability': probability,
+                    'is_suspicious': probability > 0.7,
+                    'risk_level': self._get_risk_level(probability)
+                }
+                for probability in fraud_probabilities.tolist()
+            ]
 
     def _get_risk_level(self, probability: float) -> str:
         """
@@ -143,9 +290,28 @@ class MshiyaneCreditScoring:
         """
         Save trained models to disk
         """
+        # Flatten the trees first - a parity failure raises before anything
+        # in the directory has been touched
+        compiled_models = {}
+        for name, model in (('credit_model', self.credit_model), ('fraud_model', self.fraud_model)):
+            compiled = compile_ensemble(model)
+            if compiled is not None:
+                check_parity(compiled, model)
+            compiled_models[name] = compiled
+
+        # A compiled file left over from an earlier save would be served
+        # for small batches next to the new estimators
+        for name, compiled in compiled_models.items():
+            filename = f'{path}/{name}.compiled.joblib'
+            if compiled is None and os.path.exists(filename):
+                os.remove(filename)
+
         joblib.dump(self.credit_model, f'{path}/credit_model.joblib')
         joblib.dump(self.fraud_model, f'{path}/fraud_model.joblib')
         joblib.dump(self.scaler, f'{path}/scaler.joblib')
+        for name, compiled in compiled_models.items():
+            if compiled is not None:
+                joblib.dump(compiled, f'{path}/{name}.compiled.joblib')
 
     def load_models(self, path: str):
         """
@@ -154,116 +320,80 @@ class MshiyaneCreditScoring:
         self.credit_model = joblib.load(f'{path}/credit_model.joblib')
         self.fraud_model = joblib.load(f'{path}/fraud_model.joblib')
         self.scaler = joblib.load(f'{path}/scaler.joblib')
+        self.fast_scaler = PrecomputedScaler.from_scaler(self.scaler)
+        self.compiled_credit_model = self._load_compiled(f'{path}/credit_model.compiled.joblib')
+        self.compiled_fraud_model = self._load_compiled(f'{path}/fraud_model.compiled.joblib')
+        self.model_version = self._artifact_version(path)
 
-    def evaluate_business_risk(self, business_data: Dict) -> Dict:
+        # Cached scores belong to the previous models
+        if self.score_cache is not None:
+            self.score_cache.clear()
+
+    def _artifact_version(self, path: str) -> str:
         """
-        Evaluate risk for business loans
-        TODO: Add more risk factors
-        TODO: Implement industry-specific analysis
-        TODO: Add market condition analysis
-        TODO: Consider adding more sophisticated risk assessment
-        """
-        risk_score = 0
-        factors = []
-
-        # Evaluate annual revenue
-        annual_revenue = float(business_data.get('annual_revenue', 0))
-        if annual_revenue > 1000000:
-            risk_score += 30
-            factors.append('Strong annual revenue')
-        elif annual_revenue > 500000:
-            risk_score += 20
-            factors.append('Moderate annual revenue')
-
-        # Years in operation
-        years = float(business_data.get('years_in_operation', 0))
-        if years > 5:
-            risk_score += 25
-            factors.append('Established business')
-        elif years > 2:
-            risk_score += 15
-            factors.append('Growing business')
-
-        # Industry risk assessment
-        industry_risk = self._assess_industry_risk(business_data.get('industry', ''))
-        risk_score += industry_risk['score']
-        factors.append(industry_risk['factor'])
-
-        return {
-            'risk_score': risk_score,
-            'risk_level': self._get_business_risk_level(risk_score),
-            'factors': factors
-        }
-
-    def _assess_industry_risk(self, industry: str) -> Dict:
-        """
-        Assess risk based on industry type
-        """
-        low_risk_industries = ['technology', 'healthcare', 'education']
-        medium_risk_industries = ['retail', 'manufacturing', 'services']
-        high_risk_industries = ['restaurant', 'entertainment', 'construction']
-
-        industry = industry.lower()
-        if industry in low_risk_industries:
-            return {'score': 25, 'factor': 'Low-risk industry'}
-        elif industry in medium_risk_industries:
-            return {'score': 15, 'factor': 'Medium-risk industry'}
-        else:
-            return {'score': 5, 'factor': 'High-risk industry'}
+        Short content hash of the model files, so every worker that loads
+        the same models agrees on the version (and on cache keys)
+        """
+        digest = hashlib.sha256()
+        for name in ('credit_model', 'fraud_model', 'scaler',
+                     'credit_model.compiled', 'fraud_model.compiled'):
+            filename = f'{path}/{name}.joblib'
+            # The compiled files are optional, but whether they're there
+            # changes what small batches are scored with
+            if not os.path.exists(filename):
+                continue
+            digest.update(name.encode())
+            with open(filename, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()[:12]
 
-    def _get_business_risk_level(self, risk_score: float) -> str:
+    def _load_compiled(self, filename: str):
         """
-        Convert business risk score to risk level
+        Load a compiled model if one was exported (older model dirs won't have it)
         """
-        if risk_score >= 70:
-            return 'LOW_RISK'
-        elif risk_score >= 40:
-            return 'MEDIUM_RISK'
-        else:
-            return 'HIGH_RISK'
+        if not os.path.exists(filename):
+            return None
+        return joblib.load(filename)
 
-@app.post("/predict_credit_score")
-def predict_credit_score(user_data: Dict):
-    """
-    API endpoint to predict credit score
-    """
-    scoring_system = MshiyaneCreditScoring()
-    score = scoring_system.calculate_credit_score(user_data)
-    return {"credit_score": score}
+    def evaluate_business_risk(self, business_data: Dict) -> Dict:
+        """
+        Evaluate risk for business loans
+        The thresholds, industry tiers and factors are data now - see
+        business_rules.py
+        TODO: Add market condition analysis
+        """
+        if self.score_cache is None:
+            return self.business_rules.evaluate_one(business_data)
 
-@app.post("/detect_fraud")
-def detect_fraud(transaction_data: Dict):
-    """
-    API endpoint to detect fraud
-    """
-    scoring_system = MshiyaneCreditScoring()
-    result = scoring_system.detect_fraud(transaction_data)
-    return result
+        rules = self.business_rules
+        key = make_cache_key(
+            'business_risk',
+            self.model_version,
+            np.array([float(business_data.get(field) or 0) for field in rules.numeric_fields]),
+            extra=f"{rules.version}:{str(business_data.get(rules.industry_field, '')).lower()}"
+        )
+        result = self.score_cache.get(key)
+        if result is None:
+            result = rules.evaluate_one(business_data)
+            self.score_cache.set(key, result)
+        return result
 
-@app.post("/evaluate_business_risk")
-def evaluate_business_risk(business_data: Dict):
-    """
-    API endpoint to evaluate business risk
-    """
-    scoring_system = MshiyaneCreditScoring()
-    risk_evaluation = scoring_system.evaluate_business_risk(business_data)
-    return risk_evaluation
+    def evaluate_business_risk_batch(self, businesses) -> List[Dict]:
+        """
+        Business risk for many businesses in one vectorized pass
+        Accepts a list of business dicts, a DataFrame or a dict of columns
+        Not cached - the rules are cheaper than the cache lookups
+        """
+        with time_stage('business_risk', 'rules'):
+            return self.business_rules.evaluate_batch(businesses)
 
-@app.on_event("startup")
-def load_models():
-    """
-    Load models at startup
-    """
-    scoring_system = MshiyaneCreditScoring()
-    scoring_system.load_models("models")
+# The API endpoints live in scoring_api.py so main.py can serve them
+# without importing sklearn/pandas at boot - the models (and this module)
+# are only loaded by the background warmup or the first request
+from scoring_api import router  # noqa: E402
 
-@app.on_event("shutdown")
-def save_models():
-    """
-    Save models at shutdown
-    """
-    scoring_system = MshiyaneCreditScoring()
-    scoring_system.save_models("models")
+app.include_router(router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,244 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, attributes
+
+from models import CategorySpend, DashboardVersion, MonthlyBalance, Transaction
+
+# Dashboard data from rollup tables (models.py)
+# Every flush that adds, changes or deletes transactions turns them into
+# per-month / per-category deltas and applies them with atomic
+# "x = x + delta" upserts in the same DB transaction, so concurrent
+# writers can't lose updates and the rollups commit (or roll back)
+# together with the transactions
+# Bulk query.update()/delete() skip the ORM events - run rebuild_rollups
+# after those (and once to backfill existing transactions)
+
+UNCATEGORIZED = "uncategorized"
+
+# The Transaction columns the rollups are built from
+ROLLUP_COLUMNS = ('customer_id', 'occurred_at', 'amount', 'category')
+
+
+def month_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _deltas() -> Dict:
+    return {
+        'balances': defaultdict(lambda: [0.0, 0.0, 0]),   # (customer, month) -> inflow, outflow, count
+        'categories': defaultdict(lambda: [0.0, 0]),      # (customer, month, category) -> amount, count
+        'customers': set()
+    }
+
+
+def _apply(deltas: Dict, customer_id: int, occurred_at: datetime, amount: float,
+           category: Optional[str], sign: int):
+    """
+    Add (sign=1) or remove (sign=-1) one transaction
+    """
+    month = month_start(occurred_at)
+    balance = deltas['balances'][(customer_id, month)]
+    if amount >= 0:
+        balance[0] += sign * amount
+    else:
+        balance[1] += sign * -amount
+        spend = deltas['categories'][(customer_id, month, category or UNCATEGORIZED)]
+        spend[0] += sign * -amount
+        spend[1] += sign
+    balance[2] += sign
+    deltas['customers'].add(customer_id)
+
+
+def _old_value(obj, name: str):
+    """
+    Value before this flush (attribute history is still there in after_flush)
+    """
+    history = attributes.get_history(obj, name)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, name)
+
+
+def _load_old_value(target, value, old_value, initiator):
+    pass  # Only here for active_history
+
+
+# Plain columns don't load the value they replace, so setting one on a
+# transaction expired by the last commit (the default) would leave no
+# history and the update would net out to nothing. active_history loads it
+for _name in ROLLUP_COLUMNS:
+    event.listen(getattr(Transaction, _name), "set", _load_old_value, active_history=True)
+
+
+def _transaction_values(obj, old: bool) -> Tuple:
+    if old:
+        return tuple(_old_value(obj, name) for name in ROLLUP_COLUMNS)
+    return tuple(getattr(obj, name) for name in ROLLUP_COLUMNS)
+
+
+def _upsert(connection, model, keys: Dict, increments: Dict):
+    """
+    INSERT ... or add the increments to the existing row, atomically
+    """
+    table = model.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_ = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert_(table).values(**keys, **increments)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + statement.excluded[column] for column in increments}
+        )
+        connection.execute(statement)
+        return
+
+    # Anything else: update first, insert if the row isn't there yet
+    matches = and_(*(table.c[column] == value for column, value in keys.items()))
+    result = connection.execute(
+        update(table).where(matches).values({column: table.c[column] + value
+                                             for column, value in increments.items()})
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**keys, **increments))
+
+
+def _write_deltas(connection, deltas: Dict):
+    for (customer_id, month), (inflow, outflow, count) in deltas['balances'].items():
+        if inflow or outflow or count:
+            _upsert(connection, MonthlyBalance, {'customer_id': customer_id, 'month': month},
+                    {'inflow': inflow, 'outflow': outflow, 'transaction_count': count})
+    for (customer_id, month, category), (amount, count) in deltas['categories'].items():
+        if amount or count:
+            _upsert(connection, CategorySpend,
+                    {'customer_id': customer_id, 'month': month, 'category': category},
+                    {'amount': amount, 'transaction_count': count})
+    for customer_id in deltas['customers']:
+        _upsert(connection, DashboardVersion, {'customer_id': customer_id}, {'version': 1})
+
+
+@event.listens_for(Session, "after_flush")
+def _update_rollups(session, flush_context):
+    deltas = _deltas()
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            _apply(deltas, *_transaction_values(obj, old=False), sign=1)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            _apply(deltas, *_transaction_values(obj, old=True), sign=-1)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj, include_collections=False):
+            _apply(deltas, *_transaction_values(obj, old=True), sign=-1)
+            _apply(deltas, *_transaction_values(obj, old=False), sign=1)
+    if deltas['customers']:
+        _write_deltas(session.connection(), deltas)
+
+
+def rebuild_rollups(session: Session, customer_ids: Optional[Iterable[int]] = None):
+    """
+    Recompute the rollups from the transactions table (backfill / repair)
+    Every customer touched gets a new dashboard version, including ones
+    whose transactions are all gone - otherwise their clients would keep
+    getting 304s for the old charts
+    The caller commits
+    """
+    transactions = select(Transaction.customer_id, Transaction.occurred_at,
+                          Transaction.amount, Transaction.category)
+    if customer_ids is not None:
+        customer_ids = list(customer_ids)
+        touched = set(customer_ids)
+        transactions = transactions.where(Transaction.customer_id.in_(customer_ids))
+        for model in (MonthlyBalance, CategorySpend):
+            session.execute(delete(model).where(model.customer_id.in_(customer_ids)))
+    else:
+        touched = set(session.execute(select(MonthlyBalance.customer_id).distinct()).scalars())
+        for model in (MonthlyBalance, CategorySpend):
+            session.execute(delete(model))
+
+    deltas = _deltas()
+    for row in session.execute(transactions.execution_options(yield_per=10000)):
+        _apply(deltas, row.customer_id, row.occurred_at, row.amount, row.category, sign=1)
+    deltas['customers'] |= touched
+    _write_deltas(session.connection(), deltas)
+
+
+# Reads - all take an AsyncSession (the FastAPI handlers) and touch one
+# row per month at most
+
+async def dashboard_version(db, customer_id: int) -> int:
+    version = await db.scalar(
+        select(DashboardVersion.version).where(DashboardVersion.customer_id == customer_id)
+    )
+    return version or 0
+
+
+async def balance_history(db, customer_id: int, months: int, today: Optional[date] = None) -> List[Dict]:
+    """
+    Closing balance for each of the last `months` months, oldest first
+    Months without transactions carry the balance forward
+    """
+    current = month_start(today or datetime.utcnow())
+    first = _add_months(current, -(months - 1))
+
+    # Everything before the window only matters as the opening balance
+    balance = await db.scalar(
+        select(func.coalesce(func.sum(MonthlyBalance.inflow - MonthlyBalance.outflow), 0.0))
+        .where(MonthlyBalance.customer_id == customer_id, MonthlyBalance.month < first)
+    )
+    rows = (await db.execute(
+        select(MonthlyBalance.month, MonthlyBalance.inflow, MonthlyBalance.outflow)
+        .where(MonthlyBalance.customer_id == customer_id,
+               MonthlyBalance.month >= first, MonthlyBalance.month <= current)
+    )).all()
+    by_month = {row.month: row for row in rows}
+
+    history = []
+    for offset in range(months):
+        month = _add_months(first, offset)
+        row = by_month.get(month)
+        inflow, outflow = (row.inflow, row.outflow) if row is not None else (0.0, 0.0)
+        balance += inflow - outflow
+        history.append({
+            'month': month.strftime('%Y-%m'),
+            'inflow': round(inflow, 2),
+            'outflow': round(outflow, 2),
+            'balance': round(balance, 2)
+        })
+    return history
+
+
+async def spending_breakdown(db, customer_id: int, months: int, today: Optional[date] = None) -> List[Dict]:
+    """
+    Money out per category over the last `months` months, largest first
+    """
+    current = month_start(today or datetime.utcnow())
+    first = _add_months(current, -(months - 1))
+
+    total_amount = func.sum(CategorySpend.amount)
+    rows = (await db.execute(
+        select(CategorySpend.category, total_amount.label('amount'))
+        .where(CategorySpend.customer_id == customer_id,
+               CategorySpend.month >= first, CategorySpend.month <= current)
+        .group_by(CategorySpend.category)
+        .order_by(total_amount.desc())
+    )).all()
+
+    total = sum(row.amount for row in rows if row.amount > 0)
+    return [
+        {
+            'category': row.category,
+            'amount': round(row.amount, 2),
+            'share': round(row.amount / total, 4) if total else 0.0
+        }
+        for row in rows if row.amount > 0
+    ]
@@ -1,36 +1,140 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
-import os
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from config import get_settings
+from functools import lru_cache
+import asyncio
+import logging
+import threading
+import time
 from dotenv import load_dotenv
 
-# TODO: Need to implement connection retry logic
 # TODO: Add better error handling for connection failures
-# TODO: Consider adding connection timeout settings
 
 load_dotenv()
 
-# Database URL from environment variable
-# Started with SQLite, moved to PostgreSQL for better concurrency
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+logger = logging.getLogger(__name__)
+
+def _async_url(url: str) -> str:
+    """
+    Swap the sync driver for its asyncio counterpart
+    """
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+class PoolStats:
+    """
+    Checkout wait-time metrics for one connection pool
+    Wait time covers queueing for a free connection plus the pre-ping
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+
+    def snapshot(self, pool) -> dict:
+        return {
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'avg_wait_seconds': self.total_wait / self.checkouts if self.checkouts else 0.0,
+            'max_wait_seconds': self.max_wait
+        }
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+def _instrumented(pool_class, stats: PoolStats):
+    """
+    Pool subclass that times every checkout
+    Stats live on the class so they survive pool.recreate() on dispose
+    """
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return pool_class.connect(self)
+        except PoolTimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.record(time.perf_counter() - start)
+
+    return type(f"Instrumented{pool_class.__name__}", (pool_class,), {'connect': connect, 'stats': stats})
+
+# Engines and session factories are built on first use, from
+# get_settings(), so importing database (or models) doesn't need the
+# environment. `from database import engine` etc. still works - the module
+# __getattr__ at the bottom builds them
 
 # Create engine with connection pooling
-# Had to tweak these values after some performance issues
-# Still not sure if these are optimal values
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=5,  # Might need to adjust based on load
-    max_overflow=10,  # Learned about this the hard way
-    pool_timeout=30,  # Had timeout issues in production
-    pool_recycle=1800,  # Connections were dying after 30 mins
-    echo=False  # Set to True when debugging SQL issues
-)
+# Pool sizing comes from config.Settings now instead of being hardcoded
+# pre_ping catches connections the server closed under us
+# Started with SQLite, moved to PostgreSQL for better concurrency
+@lru_cache()
+def get_engine():
+    settings = get_settings()
+    return create_engine(
+        settings.DATABASE_URL,
+        poolclass=_instrumented(QueuePool, sync_pool_stats),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        echo=False  # Set to True when debugging SQL issues
+    )
+
+# Async engine for the FastAPI handlers
+# The sync get_db blocked the event loop on every query
+@lru_cache()
+def get_async_engine():
+    settings = get_settings()
+    return create_async_engine(
+        settings.ASYNC_DATABASE_URL or _async_url(settings.DATABASE_URL),
+        poolclass=_instrumented(AsyncAdaptedQueuePool, async_pool_stats),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        echo=False
+    )
 
 # Create session factory
 # This took a while to get right - session management is tricky
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@lru_cache()
+def get_sessionmaker():
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+@lru_cache()
+def get_async_sessionmaker():
+    return sessionmaker(
+        bind=get_async_engine(),
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
 
 # Create base class for models
 # Using this for all our database models
@@ -40,21 +144,94 @@ def get_db():
     """Get database session
     Had to add proper session cleanup after memory leaks
     """
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    """Get async database session
+    Use this from async handlers - get_db blocks the event loop
+    """
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+def get_pool_stats() -> dict:
+    """Pool usage and checkout wait times for both engines"""
+    return {
+        'sync': sync_pool_stats.snapshot(get_engine().pool),
+        'async': async_pool_stats.snapshot(get_async_engine().pool)
+    }
+
+def _retry_delay(attempt: int) -> float:
+    return get_settings().DB_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+
+def connect_with_retry():
+    """Wait for the database to accept connections
+    Retries with exponential backoff - the DB is often still starting
+    when the app container comes up
+    """
+    retries = get_settings().DB_CONNECT_RETRIES
+    for attempt in range(retries):
+        try:
+            with get_engine().connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return
+        except OperationalError as e:
+            if attempt == retries - 1:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning(f"Database not reachable ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+async def async_connect_with_retry():
+    """Async version of connect_with_retry, also warms the async pool"""
+    retries = get_settings().DB_CONNECT_RETRIES
+    for attempt in range(retries):
+        try:
+            async with get_async_engine().connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            return
+        except OperationalError as e:
+            if attempt == retries - 1:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning(f"Database not reachable ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
 def init_db():
     """Initialize database
     This was a pain to debug - had issues with table creation
     and migrations
     """
     try:
-        Base.metadata.create_all(bind=engine)
+        connect_with_retry()
+        import models  # noqa: F401 - registers the tables on Base
+        Base.metadata.create_all(bind=get_engine())
         print("Database initialized successfully")
     except Exception as e:
         print(f"Error initializing database: {str(e)}")
         # TODO: Add proper error handling and logging
-        raise 
\ No newline at end of file
+        raise
+
+async def close_db():
+    """Release pooled connections on shutdown"""
+    # Only the engines that were actually created
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
+_LAZY_ATTRIBUTES = {
+    'engine': get_engine,
+    'async_engine': get_async_engine,
+    'SessionLocal': get_sessionmaker,
+    'AsyncSessionLocal': get_async_sessionmaker
+}
+
+def __getattr__(name):
+    # database.engine / async_engine / SessionLocal / AsyncSessionLocal
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -4,9 +4,14 @@ from sklearn.model_selection import cross_val_score
 from sklearn.preprocessing import StandardScaler
 from xgboost import XGBRegressor
 import joblib
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import json
+from feature_scaling import PrecomputedScaler
+from score_cache import make_cache_keys
+from history_features import compute_history_features
+from tree_compiler import check_parity, compile_ensemble, use_compiled
+from model_store import ENHANCED_CREDIT_MODEL
 
 # TODO: Need to implement model versioning system
 # TODO: Add more sophisticated feature engineering
@@ -14,11 +19,53 @@ import json
 # TODO: Add model performance monitoring
 # TODO: Consider adding more advanced ML models (neural networks?)
 
+# Order of the basic features - the advanced ones are appended after these
+BASIC_FEATURES = [
+    'annual_income',
+    'years_of_credit_history',
+    'num_accounts',
+    'payment_history_score',
+    'debt_to_income_ratio',
+    'num_recent_inquiries',
+    'age'
+]
+
+# Scalar inputs read from each applicant in the single feature pass
+SCALAR_FIELDS = BASIC_FEATURES + [
+    'savings_amount',
+    'total_credit',
+    'used_credit',
+    'on_time_payment_ratio',
+    'savings_frequency',
+    'overdraft_frequency',
+    'mobile_app_usage_score'
+]
+
+# Component breakdown and its weights (same order)
+COMPONENTS = ['payment_history', 'credit_utilization', 'credit_age', 'income_stability', 'behavioral']
+COMPONENT_WEIGHTS = np.array([0.35, 0.30, 0.15, 0.10, 0.10])
+
+# on-time payments, savings frequency, (1 - overdraft frequency), mobile app usage
+BEHAVIOR_WEIGHTS = np.array([0.4, 0.3, 0.2, 0.1])
+
+
+def _weighted_sum(matrix: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Row-wise weighted sum, accumulated column by column
+    Unlike matrix @ weights (BLAS) the rounding doesn't depend on the batch
+    size, so an applicant scores exactly the same alone or in a batch
+    """
+    total = matrix[:, 0] * weights[0]
+    for i in range(1, len(weights)):
+        total = total + matrix[:, i] * weights[i]
+    return total
+
 class MshiyaneCreditScoringSystem:
     def __init__(self):
         # Had to tune these parameters after initial poor performance
         # XGBoost performed better than RandomForest for our use case
         self.scaler = StandardScaler()
+        self.fast_scaler = None  # Set from the fitted scaler when the model is loaded
         self.model = XGBRegressor(
             n_estimators=200,  # Increased from 100 after testing
             learning_rate=0.05,  # Reduced to prevent overfitting
@@ -27,9 +74,11 @@ class MshiyaneCreditScoringSystem:
             colsample_bytree=0.8,  # Feature sampling for better robustness
             random_state=42
         )
+        self.compiled_model = None  # NumPy version of the model (see tree_compiler.py)
         self.feature_importance = {}
         self.model_version = "1.0.0"  # Need to implement proper versioning
         self.last_training_date = None
+        self.score_cache = None  # Optional ScoreCache/RedisScoreCache
         
     def preprocess_features(self, user_data: Dict) -> np.ndarray:
         """
@@ -39,36 +88,116 @@ class MshiyaneCreditScoringSystem:
         TODO: Add feature validation
         TODO: Consider adding more advanced feature engineering
         """
-        basic_features = [
-            float(user_data.get('annual_income', 0)),
-            float(user_data.get('years_of_credit_history', 0)),
-            float(user_data.get('num_accounts', 0)),
-            float(user_data.get('payment_history_score', 0)),
-            float(user_data.get('debt_to_income_ratio', 0)),
-            float(user_data.get('num_recent_inquiries', 0)),
-            float(user_data.get('age', 0))
-        ]
+        basic_features = [float(user_data.get(name, 0)) for name in BASIC_FEATURES]
         
-        # Advanced features
-        advanced_features = [
+        return np.array(basic_features + self._advanced_features(user_data)).reshape(1, -1)
+
+    def preprocess_features_batch(self, users, history: Optional[Dict] = None) -> np.ndarray:
+        """
+        Build the feature matrix for many applicants in one pass
+        Accepts a list of user dicts or a DataFrame (one row per applicant)
+        History features (income, transactions, employment) are computed
+        for the whole batch with grouped reductions. Callers holding
+        columnar histories can pass the output of
+        history_features.compute_history_features_from_frames as history
+        """
+        return self._compute_batch(users, history)[0]
+
+    def _compute_batch(self, users, history: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Single feature pass over a batch of applicants
+        Returns the model feature matrix and the (n, len(COMPONENTS))
+        component score matrix. Intermediates like income stability and
+        the behavioral score are computed once and feed both
+        """
+        if isinstance(users, pd.DataFrame):
+            scalars = users.reindex(columns=SCALAR_FIELDS, fill_value=0).fillna(0).to_numpy(dtype=float)
+            users = users.to_dict('records')
+        else:
+            scalars = np.array(
+                [[user.get(name, 0) for name in SCALAR_FIELDS] for user in users],
+                dtype=float
+            ).reshape(-1, len(SCALAR_FIELDS))
+
+        column = {name: scalars[:, i] for i, name in enumerate(SCALAR_FIELDS)}
+        basic = scalars[:, :len(BASIC_FEATURES)]
+
+        if history is None:
+            history = compute_history_features(users)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            income = column['annual_income']
+            savings_ratio = np.where(
+                income == 0, 0.0,
+                np.fmin(1.0, column['savings_amount'] / (income + 1e-6))
+            )
+
+            behavior = np.column_stack([
+                column['on_time_payment_ratio'],
+                column['savings_frequency'],
+                1.0 - column['overdraft_frequency'],
+                column['mobile_app_usage_score']
+            ])
+            behavioral = np.fmin(1.0, _weighted_sum(behavior, BEHAVIOR_WEIGHTS))
+
+            payments = np.array(
+                [[history_.get('on_time', 0), history_.get('total', 1), history_.get('late', 0)]
+                 for history_ in (user.get('payment_history', {}) for user in users)],
+                dtype=float
+            ).reshape(-1, 3)
+            on_time, total, late = payments[:, 0], payments[:, 1], payments[:, 2]
+            payment_history = np.where(
+                total == 0, 0.0,
+                np.clip((on_time / total) * (1 - 0.1 * late), 0.0, 1.0)
+            )
+
+            total_credit = column['total_credit']
+            credit_utilization = np.where(
+                total_credit == 0, 0.0,
+                1.0 - np.fmin(1.0, column['used_credit'] / total_credit)
+            )
+
+        credit_age = np.fmin(1.0, column['years_of_credit_history'] / 10.0)
+
+        features = np.column_stack([
+            basic,
+            history['income_stability'],
+            history['transaction_regularity'],
+            savings_ratio,
+            history['employment_stability'],
+            behavioral
+        ])
+        components = np.column_stack([
+            payment_history,
+            credit_utilization,
+            credit_age,
+            history['income_stability'],
+            behavioral
+        ])
+        return features, components
+
+    def _advanced_features(self, user_data: Dict) -> List[float]:
+        """
+        Derived features appended after the basic ones
+        """
+        return [
             self._calculate_income_stability(user_data),
             self._analyze_transaction_patterns(user_data),
             self._calculate_savings_ratio(user_data),
             self._assess_employment_stability(user_data),
             self._calculate_behavioral_score(user_data)
         ]
-        
-        return np.array(basic_features + advanced_features).reshape(1, -1)
 
     def _calculate_income_stability(self, user_data: Dict) -> float:
         """
         Calculate income stability score based on income history
         """
         income_history = user_data.get('income_history', [])
-        if not income_history:
+        if len(income_history) == 0:
             return 0.0
             
-        variations = np.std(income_history) / np.mean(income_history) if income_history else 1.0
+        income_history = np.asarray(income_history, dtype=float)
+        variations = np.std(income_history) / np.mean(income_history)
         stability_score = 1.0 / (1.0 + variations)
         return min(1.0, stability_score)
 
@@ -77,11 +206,16 @@ class MshiyaneCreditScoringSystem:
         Analyze transaction patterns for consistency and reliability
         """
         transactions = user_data.get('transaction_history', [])
-        if not transactions:
+        if len(transactions) == 0:
             return 0.0
             
         # Analyze transaction regularity
-        transaction_amounts = [t.get('amount', 0) for t in transactions]
+        # A plain array of amounts (columnar callers) skips the dict walk
+        if isinstance(transactions, np.ndarray):
+            transaction_amounts = transactions
+        else:
+            transaction_amounts = np.fromiter((t.get('amount', 0) for t in transactions),
+                                              dtype=float, count=len(transactions))
         transaction_regularity = 1.0 - (np.std(transaction_amounts) / (np.mean(transaction_amounts) + 1e-6))
         return max(0.0, min(1.0, transaction_regularity))
 
@@ -120,21 +254,14 @@ class MshiyaneCreditScoringSystem:
         """
         Calculate behavioral score based on user activities
         """
-        behavior_factors = {
-            'on_time_payments': user_data.get('on_time_payment_ratio', 0),
-            'savings_frequency': user_data.get('savings_frequency', 0),
-            'overdraft_frequency': 1.0 - user_data.get('overdraft_frequency', 0),
-            'mobile_app_usage': user_data.get('mobile_app_usage_score', 0)
-        }
-        
-        weights = {
-            'on_time_payments': 0.4,
-            'savings_frequency': 0.3,
-            'overdraft_frequency': 0.2,
-            'mobile_app_usage': 0.1
-        }
+        behavior_factors = [
+            user_data.get('on_time_payment_ratio', 0),
+            user_data.get('savings_frequency', 0),
+            1.0 - user_data.get('overdraft_frequency', 0),
+            user_data.get('mobile_app_usage_score', 0)
+        ]
         
-        behavioral_score = sum(score * weights[factor] for factor, score in behavior_factors.items())
+        behavioral_score = float(sum(score * weight for score, weight in zip(behavior_factors, BEHAVIOR_WEIGHTS)))
         return min(1.0, behavioral_score)
 
     def calculate_credit_score(self, user_data: Dict) -> Dict:
@@ -145,84 +272,81 @@ class MshiyaneCreditScoringSystem:
         TODO: Add bias detection
         TODO: Consider adding more sophisticated scoring components
         """
-        features = self.preprocess_features(user_data)
-        scaled_features = self.scaler.transform(features)
-        
-        # Base score prediction
-        base_score = self.model.predict(scaled_features)[0]
-        
-        # Calculate component scores
-        component_scores = {
-            'payment_history': self._calculate_payment_history_score(user_data),
-            'credit_utilization': self._calculate_credit_utilization_score(user_data),
-            'credit_age': self._calculate_credit_age_score(user_data),
-            'income_stability': self._calculate_income_stability(user_data),
-            'behavioral': self._calculate_behavioral_score(user_data)
-        }
-        
-        # Apply weights to component scores
-        weights = {
-            'payment_history': 0.35,
-            'credit_utilization': 0.30,
-            'credit_age': 0.15,
-            'income_stability': 0.10,
-            'behavioral': 0.10
-        }
-        
-        weighted_score = sum(score * weights[component] 
-                           for component, score in component_scores.items())
-        
-        # Final score between 300 and 850
-        final_score = max(300, min(850, base_score * weighted_score))
-        
-        return {
-            'credit_score': round(final_score, 2),
-            'component_scores': component_scores,
-            'score_breakdown': {
-                component: round(score * 100, 2)
-                for component, score in component_scores.items()
-            },
-            'risk_level': self._get_risk_level(final_score),
-            'improvement_tips': self._generate_improvement_tips(component_scores),
-            'model_version': self.model_version
-        }
+        return self.score_batch([user_data])[0]
 
-    def _calculate_payment_history_score(self, user_data: Dict) -> float:
+    def score_batch(self, users, history: Optional[Dict] = None) -> List[Dict]:
         """
-        Calculate payment history score
+        Calculate enhanced credit scores for many applicants
+        The whole batch goes through the model in a single predict call
+        history: optional precomputed history features (see preprocess_features_batch)
         """
-        payment_history = user_data.get('payment_history', {})
-        on_time_payments = payment_history.get('on_time', 0)
-        total_payments = payment_history.get('total', 1)
-        late_payments = payment_history.get('late', 0)
-        
-        if total_payments == 0:
-            return 0.0
-            
-        score = (on_time_payments / total_payments) * (1 - 0.1 * late_payments)
-        return max(0.0, min(1.0, score))
+        features, components = self._compute_batch(users, history)
+        if len(features) == 0:
+            return []
+
+        if self.score_cache is None:
+            base_scores = self._predict(self._scale(features))
+            return self._build_score_results(components, base_scores)
 
-    def _calculate_credit_utilization_score(self, user_data: Dict) -> float:
+        # The result is fully determined by the model features and the components
+        keys = make_cache_keys('enhanced_credit_score', self._cache_version(),
+                               np.column_stack([features, components]))
+        results = self.score_cache.get_many(keys)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            base_scores = self._predict(self._scale(features[missing]))
+            computed = self._build_score_results(components[missing], base_scores)
+            for i, result in zip(missing, computed):
+                results[i] = result
+            self.score_cache.set_many({keys[i]: results[i] for i in missing})
+        return results
+
+    def _cache_version(self) -> str:
         """
-        Calculate credit utilization score
+        Version part of cache keys
+        model_version alone isn't bumped on retraining yet, so include the training date
         """
-        total_credit = float(user_data.get('total_credit', 0))
-        used_credit = float(user_data.get('used_credit', 0))
-        
-        if total_credit == 0:
-            return 0.0
-            
-        utilization = used_credit / total_credit
-        score = 1.0 - min(1.0, utilization)
-        return score
+        return f"{self.model_version}-{self.last_training_date}"
 
-    def _calculate_credit_age_score(self, user_data: Dict) -> float:
+    def _scale(self, features: np.ndarray) -> np.ndarray:
         """
-        Calculate credit age score
+        Apply the persisted scaler, using the precomputed arrays when available
         """
-        years_of_history = float(user_data.get('years_of_credit_history', 0))
-        score = min(1.0, years_of_history / 10.0)  # Normalize to 10 years
-        return score
+        if self.fast_scaler is not None:
+            return self.fast_scaler.transform(features)
+        return self.scaler.transform(features)
+
+    def _predict(self, scaled_features: np.ndarray) -> np.ndarray:
+        """
+        Base score prediction, through the compiled trees for small batches
+        """
+        if use_compiled(self.compiled_model, len(scaled_features), self.model is not None):
+            return self.compiled_model.predict(scaled_features)
+        return self.model.predict(scaled_features)
+
+    def _build_score_results(self, components: np.ndarray, base_scores: np.ndarray) -> List[Dict]:
+        """
+        Combine the model's base scores with the component breakdown
+        """
+        # Apply weights to component scores, final score between 300 and 850
+        weighted_scores = _weighted_sum(components, COMPONENT_WEIGHTS)
+        final_scores = np.clip(base_scores * weighted_scores, 300, 850)
+
+        results = []
+        for component_row, final_score in zip(components.tolist(), final_scores.tolist()):
+            component_scores = dict(zip(COMPONENTS, component_row))
+            results.append({
+                'credit_score': round(final_score, 2),
+                'component_scores': component_scores,
+                'score_breakdown': {
+                    component: round(score * 100, 2)
+                    for component, score in component_scores.items()
+                },
+                'risk_level': self._get_risk_level(final_score),
+                'improvement_tips': self._generate_improvement_tips(component_scores),
+                'model_version': self.model_version
+            })
+        return results
 
     def _get_risk_level(self, credit_score: float) -> str:
         """
@@ -288,6 +412,16 @@ class MshiyaneCreditScoringSystem:
             'feature_importance': self.feature_importance
         }
 
+    def train_model_streaming(self, source, **kwargs) -> Dict:
+        """
+        Train from data that doesn't fit in memory
+        source is a chunk source from training_pipeline (parquet_source,
+        sql_source). See training_pipeline.train_streaming for the options
+        (folds, early stopping, warm start)
+        """
+        from training_pipeline import train_streaming
+        return train_streaming(self, source, **kwargs)
+
     def save_model(self, path: str):
         """
         Save model and metadata
@@ -296,8 +430,13 @@ class MshiyaneCreditScoringSystem:
         TODO: Add model validation before saving
         TODO: Consider adding model compression
         """
+        compiled_model = compile_ensemble(self.model)
+        if compiled_model is not None:
+            check_parity(compiled_model, self.model)
+
         model_data = {
             'model': self.model,
+            'compiled_model': compiled_model,
             'scaler': self.scaler,
             'feature_importance': self.feature_importance,
             'model_version': self.model_version,
@@ -311,7 +450,59 @@ class MshiyaneCreditScoringSystem:
         """
         model_data = joblib.load(f'{path}/enhanced_credit_model.joblib')
         self.model = model_data['model']
+        self.compiled_model = model_data.get('compiled_model')
         self.scaler = model_data['scaler']
+        self.fast_scaler = PrecomputedScaler.from_scaler(self.scaler)
         self.feature_importance = model_data['feature_importance']
         self.model_version = model_data['model_version']
-        self.last_training_date = model_data['last_training_date'] 
\ No newline at end of file
+        self.last_training_date = model_data['last_training_date']
+
+        # Cached scores belong to the previous model
+        if self.score_cache is not None:
+            self.score_cache.clear()
+
+    def publish_model(self, store) -> str:
+        """
+        Publish the trained model as a new version in a ModelStore
+        The version id (a hash of the artifacts) becomes the model_version
+        """
+        compiled_model = compile_ensemble(self.model)
+        if compiled_model is not None:
+            check_parity(compiled_model, self.model)
+
+        self.model_version = store.publish(
+            ENHANCED_CREDIT_MODEL,
+            {'model': self.model, 'compiled_model': compiled_model, 'scaler': self.scaler},
+            metadata={
+                'feature_importance': {name: float(value) for name, value in self.feature_importance.items()},
+                'last_training_date': self.last_training_date
+            }
+        )
+        return self.model_version
+
+    def load_published_model(self, store, version: Optional[str] = None, compiled_only: bool = False):
+        """
+        Load a version from a ModelStore (the current one by default)
+        Arrays are memory-mapped, so workers share one copy of the compiled
+        trees and the scaler. The XGBoost booster is an opaque buffer that
+        can't be mapped - compiled_only skips it and serves every batch
+        through the compiled trees
+        """
+        version, artifacts, metadata = store.load(
+            ENHANCED_CREDIT_MODEL, version, skip=('model',) if compiled_only else ()
+        )
+        # Models that couldn't be compiled (e.g. another xgboost objective)
+        # are published without compiled trees - nothing to serve them with
+        if compiled_only and artifacts.get('compiled_model') is None:
+            raise ValueError(f"Version {version} has no compiled model, "
+                             f"it can't be served with compiled_only")
+        self.model = artifacts.get('model')
+        self.compiled_model = artifacts['compiled_model']
+        self.scaler = artifacts['scaler']
+        self.fast_scaler = PrecomputedScaler.from_scaler(self.scaler)
+        self.feature_importance = metadata.get('feature_importance', {})
+        self.model_version = version
+        self.last_training_date = metadata.get('last_training_date')
+
+        if self.score_cache is not None:
+            self.score_cache.clear()
\ No newline at end of file
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+from auth import require_admin
+from inference_executor import InferenceSaturated, build_executor
+from metrics import watch_cache, watch_executor
+from model_experiments import ModelExperiment
+from model_registry import BackgroundWarmup, registry
+from model_store import ENHANCED_CREDIT_MODEL, ModelStore
+from request_batching import MicroBatcher
+from wire_formats import is_table, read_batch, read_object, respond, table_to_records
+
+# Serving for the enhanced (XGBoost) scoring system
+# The model comes from the versioned ModelStore (model_store.py) and every
+# worker polls the manifest: when a new version is activated it's loaded
+# in the background and swapped into the registry between requests, so
+# deploying a model needs no restart and drops nothing
+
+logger = logging.getLogger(__name__)
+
+MODEL_STORE_PATH = os.getenv("MODEL_STORE_PATH", "model_store")
+MODEL_STORE_POLL_SECONDS = float(os.getenv("MODEL_STORE_POLL_SECONDS", "10"))
+# Serve only the memory-mapped compiled trees, without loading the booster
+ENHANCED_COMPILED_ONLY = os.getenv("ENHANCED_COMPILED_ONLY", "false").lower() == "true"
+# Fallback when nothing has been published to the store yet
+MODELS_PATH = os.getenv("MODELS_PATH", "models")
+
+model_store = ModelStore(MODEL_STORE_PATH)
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+
+def _load_enhanced_system(version: Optional[str] = None):
+    """
+    Build the scoring system from the store, or from the old single-file
+    artifact if no version has been published yet
+    xgboost/pandas/sklearn are only imported here, not when the API boots
+    """
+    from enhanced_credit_scoring import MshiyaneCreditScoringSystem
+    from score_cache import build_score_cache
+
+    system = MshiyaneCreditScoringSystem()
+    system.score_cache = build_score_cache()
+    if version is None and model_store.current_version(ENHANCED_CREDIT_MODEL) is None:
+        system.load_model(MODELS_PATH)
+    else:
+        system.load_published_model(model_store, version, compiled_only=ENHANCED_COMPILED_ONLY)
+    return system
+
+registry.register(ENHANCED_CREDIT_MODEL, _load_enhanced_system)
+
+def get_enhanced_system():
+    return registry.get(ENHANCED_CREDIT_MODEL)
+
+def _score_enhanced_rows(users: List[Dict]) -> List[Dict]:
+    return get_enhanced_system().score_batch(users)
+
+def _flat_rows(results: List[Dict]) -> List[Dict]:
+    # Scalar fields only (score, rating...) - for Arrow responses
+    return [{key: value for key, value in result.items() if not isinstance(value, (dict, list))}
+            for result in results]
+
+# Everything here runs in this process, so the cache is read directly
+watch_cache(ENHANCED_CREDIT_MODEL, lambda: get_enhanced_system().score_cache
+            if registry.is_loaded(ENHANCED_CREDIT_MODEL) else None)
+
+# XGBoost releases the GIL, so threads are enough - and with threads the
+# swapped model is visible to inference straight away
+# Configure with XGBOOST_INFERENCE_EXECUTOR / _WORKERS / _MAX_QUEUE
+xgboost_executor = build_executor("XGBOOST_INFERENCE", default_mode="thread")
+watch_executor("xgboost", xgboost_executor)
+
+async def _score_enhanced_batch(users: List[Dict]) -> List[Dict]:
+    return await xgboost_executor.run(_score_enhanced_rows, users)
+
+enhanced_batcher = MicroBatcher(
+    _score_enhanced_batch,
+    int(os.getenv("SCORING_MAX_BATCH_SIZE", "64")),
+    float(os.getenv("SCORING_BATCH_WINDOW_MS", "2")),
+    fatal_errors=(InferenceSaturated,),
+    name="enhanced_credit_score"
+)
+
+# A/B and shadow evaluation of a candidate version (model_experiments.py)
+# Shadow scoring gets its own single-thread executor with a short queue
+# Configure with SHADOW_INFERENCE_WORKERS / _MAX_QUEUE
+shadow_executor = build_executor("SHADOW_INFERENCE", default_mode="thread",
+                                 default_workers=1, default_max_queue=4)
+watch_executor("shadow", shadow_executor)
+experiment = ModelExperiment(
+    xgboost_executor,
+    shadow_executor,
+    int(os.getenv("SCORING_MAX_BATCH_SIZE", "64")),
+    float(os.getenv("SCORING_BATCH_WINDOW_MS", "2"))
+)
+
+async def start_experiment(version: str, candidate_share: float = 0.0, shadow: bool = False):
+    loop = asyncio.get_event_loop()
+    candidate = await loop.run_in_executor(None, _load_enhanced_system, version)
+    experiment.configure(candidate, candidate_share, shadow)
+
+async def swap_to_version(version: str):
+    """
+    Load a version off the event loop and swap it in
+    """
+    loop = asyncio.get_event_loop()
+    system = await loop.run_in_executor(None, _load_enhanced_system, version)
+    registry.swap(ENHANCED_CREDIT_MODEL, system)
+    logger.info(f"Enhanced credit model switched to version {version}")
+
+async def _watch_model_store():
+    """
+    Pick up versions activated by other workers or the training job
+    """
+    while True:
+        await asyncio.sleep(MODEL_STORE_POLL_SECONDS)
+        try:
+            version = model_store.current_version(ENHANCED_CREDIT_MODEL)
+            # Nothing to swap until the warmup has loaded the first version
+            if not registry.is_loaded(ENHANCED_CREDIT_MODEL):
+                continue
+            if version is not None and version != get_enhanced_system().model_version:
+                await swap_to_version(version)
+        except Exception as e:
+            logger.error(f"Model store check failed: {e}")
+
+def _service_unavailable(error: InferenceSaturated) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
+@router.post("/enhanced_credit_score")
+async def enhanced_credit_score(request: Request):
+    """
+    Full enhanced score (components, rating, tips) for one applicant
+    JSON, msgpack or a one-row Arrow table in, the Accept type out
+    """
+    user_data = await read_object(request)
+    try:
+        candidate = experiment.pick_candidate(user_data)
+        if candidate is not None:
+            return respond(request, await experiment.score(user_data, candidate))
+        result = await enhanced_batcher.submit(user_data)
+    except InferenceSaturated as e:
+        raise _service_unavailable(e)
+    experiment.shadow_score(user_data, result)
+    return respond(request, result)
+
+@router.post("/enhanced_credit_score/batch")
+async def enhanced_credit_score_batch(request: Request):
+    """
+    The enhanced model builds a DataFrame from the rows anyway, so Arrow
+    tables are turned into row dicts here (results are nested, so Arrow
+    responses only carry the flat fields)
+    """
+    users = await read_batch(request)
+    if is_table(users):
+        users = table_to_records(users)
+    try:
+        results = await xgboost_executor.run(_score_enhanced_rows, users)
+    except InferenceSaturated as e:
+        raise _service_unavailable(e)
+    return respond(request, {"results": results}, rows=_flat_rows(results))
+
+@router.get("/models/enhanced", dependencies=[Depends(require_admin)])
+def enhanced_model_info():
+    """
+    Version this worker is serving and everything in the store
+    Admin tokens only - the store metadata isn't for customers
+    """
+    return {
+        "serving": get_enhanced_system().model_version,
+        "current": model_store.current_version(ENHANCED_CREDIT_MODEL),
+        "versions": model_store.versions(ENHANCED_CREDIT_MODEL)
+    }
+
+@router.post("/models/enhanced/activate/{version}", dependencies=[Depends(require_admin)])
+async def activate_enhanced_model(version: str):
+    """
+    Make a published version current (or roll back to an older one)
+    This worker swaps right away, the others on their next poll
+    Admin tokens only - this changes what every customer is scored with
+    """
+    # Load it here first, so a version this worker can't serve never
+    # becomes current for everyone else
+    try:
+        await swap_to_version(version)
+        model_store.activate(ENHANCED_CREDIT_MODEL, version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"serving": version}
+
+@router.get("/models/enhanced/experiment", dependencies=[Depends(require_admin)])
+def enhanced_experiment_stats():
+    return experiment.stats()
+
+@router.post("/models/enhanced/experiment", dependencies=[Depends(require_admin)])
+async def start_enhanced_experiment(config: Dict):
+    """
+    Evaluate a published version next to the serving one
+    {"version": ..., "candidate_share": 0.1, "shadow": true}
+    Per worker - send it to every worker (or use the env variables)
+    Admin tokens only, like activating a version
+    """
+    try:
+        await start_experiment(config["version"], float(config.get("candidate_share", 0.0)),
+                               bool(config.get("shadow", False)))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return experiment.stats()
+
+@router.delete("/models/enhanced/experiment", dependencies=[Depends(require_admin)])
+def stop_enhanced_experiment():
+    experiment.stop()
+    return experiment.stats()
+
+async def _warm_up():
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, registry.get, ENHANCED_CREDIT_MODEL)
+
+    # Experiments can also be set up per deployment
+    candidate_version = os.getenv("ENHANCED_CANDIDATE_VERSION")
+    if candidate_version:
+        await start_experiment(
+            candidate_version,
+            float(os.getenv("ENHANCED_CANDIDATE_SHARE", "0")),
+            os.getenv("ENHANCED_SHADOW", "false").lower() == "true"
+        )
+
+warmup = BackgroundWarmup(ENHANCED_CREDIT_MODEL, _warm_up)
+
+_watcher: Optional[asyncio.Task] = None
+
+@router.on_event("startup")
+async def start_enhanced_serving():
+    global _watcher
+    xgboost_executor.start()
+    warmup.start()
+    _watcher = asyncio.ensure_future(_watch_model_store())
+
+@router.on_event("shutdown")
+async def stop_enhanced_serving():
+    if _watcher is not None:
+        _watcher.cancel()
+    warmup.cancel()
+    experiment.stop()
+    xgboost_executor.shutdown()
+    shadow_executor.shutdown()
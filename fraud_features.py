@@ -0,0 +1,310 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Real-time fraud features
+# detect_fraud needs frequency_last_24h, average_transaction_amount and
+# distance_from_last_transaction, which used to mean an aggregate DB query
+# per transaction on the caller's side
+# This keeps that state per account in memory
+#
+# A transaction is recorded in the same step (and under the same lock) as
+# its features are read - admit/admit_batch - so concurrent requests for
+# one account each see the ones admitted before them, not the same stale
+# state. A request that then fails or gets rejected (503) hands its
+# admission to rollback(), so it isn't left counted in the history
+
+DERIVED_FEATURES = (
+    'time_of_day',
+    'distance_from_last_transaction',
+    'frequency_last_24h',
+    'average_transaction_amount'
+)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Naive timestamps are UTC, same as time_of_day - not server-local time
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _to_epoch_seconds(timestamp) -> float:
+    """
+    Accepts epoch seconds, an ISO-8601 string or a datetime
+    """
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, datetime):
+        return _as_utc(timestamp).timestamp()
+    if isinstance(timestamp, str):
+        return _as_utc(datetime.fromisoformat(timestamp.replace('Z', '+00:00'))).timestamp()
+    return float(timestamp)
+
+
+def _field(transaction: Dict, name: str, convert, default=None) -> float:
+    """
+    One raw input as a finite number
+    Raises ValueError naming the field, so the API can answer 422
+    """
+    value = transaction.get(name, default)
+    try:
+        number = convert(value)
+    except (TypeError, ValueError, OverflowError, OSError):
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValueError(f"Invalid {name}: {value!r}")
+    return number
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _needs_features(transaction: Dict) -> bool:
+    # No account_id, or the caller already sent the features -> used as-is
+    return ('account_id' in transaction
+            and not all(name in transaction for name in DERIVED_FEATURES))
+
+
+class _Event:
+    __slots__ = ('account_id', 'time', 'amount', 'latitude', 'longitude')
+
+    def __init__(self, transaction: Dict):
+        self.account_id = str(transaction['account_id'])
+        self.time = int(_field(transaction, 'timestamp', _to_epoch_seconds))
+        self.amount = _field(transaction, 'amount', float, 0)
+        latitude, longitude = transaction.get('latitude'), transaction.get('longitude')
+        if latitude is None or longitude is None:
+            self.latitude = self.longitude = None
+        else:
+            self.latitude = _field(transaction, 'latitude', float)
+            self.longitude = _field(transaction, 'longitude', float)
+
+
+class StreamingFraudFeatureStore:
+    """
+    Per-account rolling state for fraud features
+    All accounts share preallocated arrays (one row per account) instead of
+    a Python object each:
+    - a ring buffer of transaction times and amounts in the current window
+    - last known location
+    Accounts with more than max_events_per_window transactions in the
+    window report max_events_per_window, and their average covers the
+    latest max_events_per_window amounts
+    At most max_accounts accounts are kept - the least recently seen one
+    is dropped to make room (it starts again with no history)
+    Each account keeps a running amount total, and expired entries are
+    dropped from the head of its ring as it's read or written, so both
+    are amortized O(1) per event
+    """
+
+    def __init__(self, window_seconds: float = 86400, max_events_per_window: int = 128,
+                 initial_accounts: int = 1024, max_accounts: int = 100000):
+        self.window_seconds = window_seconds
+        self.window_size = max_events_per_window
+        self.max_accounts = max_accounts
+        # account -> row, least recently seen first
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._allocate(min(initial_accounts, max_accounts))
+
+    def _allocate(self, capacity: int):
+        # Second resolution is plenty for a 24h window and halves the memory
+        self._times = np.zeros((capacity, self.window_size), dtype=np.uint32)
+        self._amounts = np.zeros((capacity, self.window_size), dtype=np.float64)
+        self._head = np.zeros(capacity, dtype=np.int32)
+        self._count = np.zeros(capacity, dtype=np.int32)
+        self._total = np.zeros(capacity, dtype=np.float64)
+        self._last_location = np.full((capacity, 2), np.nan, dtype=np.float64)
+
+    def _arrays(self) -> Tuple[np.ndarray, ...]:
+        return self._times, self._amounts, self._head, self._count, self._total, self._last_location
+
+    def _grow(self):
+        """
+        Double the capacity, up to max_accounts (amortized O(1) per new account)
+        """
+        old = self._arrays()
+        self._allocate(min(len(self._head) * 2, self.max_accounts))
+        for new_array, old_array in zip(self._arrays(), old):
+            new_array[:len(old_array)] = old_array
+
+    def _slot(self, account_id: str) -> int:
+        """
+        The account's row, taking one (and maybe evicting an account) if it's new
+        """
+        slot = self._slots.get(account_id)
+        if slot is not None:
+            self._slots.move_to_end(account_id)
+            return slot
+        if len(self._slots) < len(self._head):
+            slot = len(self._slots)
+        elif len(self._head) < self.max_accounts:
+            slot = len(self._slots)
+            self._grow()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self._head[slot] = self._count[slot] = 0
+            self._total[slot] = 0.0
+            self._last_location[slot] = np.nan
+        self._slots[account_id] = slot
+        return slot
+
+    def _expire(self, slot: int, now: int):
+        """
+        Drop ring entries that have fallen out of the window at now
+        Each entry is dropped once, so this is amortized O(1) per event
+        Transactions are expected roughly in time order - one that arrives
+        after later ones won't see entries those have already expired
+        """
+        cutoff = now - self.window_seconds
+        head, count = self._head[slot], self._count[slot]
+        times, amounts = self._times[slot], self._amounts[slot]
+        total = self._total[slot]
+        while count and times[head] <= cutoff:
+            total -= amounts[head]
+            head = (head + 1) % self.window_size
+            count -= 1
+        self._head[slot], self._count[slot] = head, count
+        # No drift left over once the window is empty
+        self._total[slot] = total if count else 0.0
+
+    def _features(self, event: _Event) -> Dict:
+        """
+        Features for event from the account's state before it
+        """
+        now = event.time
+        slot = self._slots.get(event.account_id)
+        if slot is None:
+            count, total = 0, 0.0
+            last_lat = last_lon = math.nan
+        else:
+            self._expire(slot, now)
+            count, total = int(self._count[slot]), float(self._total[slot])
+            last_lat, last_lon = self._last_location[slot]
+
+        distance = 0.0
+        if event.latitude is not None and not math.isnan(last_lat):
+            distance = _haversine_km(last_lat, last_lon, event.latitude, event.longitude)
+
+        return {
+            # Hours since midnight UTC
+            'time_of_day': (now % 86400) / 3600.0,
+            'distance_from_last_transaction': distance,
+            'frequency_last_24h': float(count),
+            'average_transaction_amount': total / count if count else 0.0
+        }
+
+    def features(self, account_id: str, timestamp=None, latitude: Optional[float] = None,
+                 longitude: Optional[float] = None) -> Dict:
+        """
+        Current features for an account without recording anything
+        """
+        event = _Event({'account_id': account_id, 'timestamp': timestamp,
+                        'latitude': latitude, 'longitude': longitude})
+        with self._lock:
+            return self._features(event)
+
+    def admit_batch(self, transactions: List[Dict]) -> Tuple[List[Dict], List]:
+        """
+        Fill in the derived fraud features for raw transactions and record
+        them, in order
+        Features describe the account's history before each transaction,
+        including earlier ones in the same batch
+        Returns (enriched transactions, admission) - pass the admission to
+        rollback() if the transactions don't get scored after all
+        Transactions without an account_id, or that already carry the
+        features, are passed through unchanged and not recorded
+        A transaction with an unreadable field raises ValueError before
+        anything is recorded
+        """
+        events = [_Event(transaction) if _needs_features(transaction) else None
+                  for transaction in transactions]
+        enriched, admission = [], []
+        with self._lock:
+            for transaction, event in zip(transactions, events):
+                if event is None:
+                    enriched.append(transaction)
+                    continue
+                features = self._features(event)
+                admission.append((event, self._record(event)))
+                # Anything the caller did send wins over the computed values
+                enriched.append({**features, **transaction})
+        return enriched, admission
+
+    def admit(self, transaction: Dict) -> Tuple[Dict, List]:
+        """
+        admit_batch for a single transaction
+        """
+        enriched, admission = self.admit_batch([transaction])
+        return enriched[0], admission
+
+    def rollback(self, admission: List):
+        """
+        Take admitted transactions back out of their accounts' history
+        Anything admitted since is kept; entries that have already expired
+        or been pushed out of the ring are left alone
+        """
+        with self._lock:
+            for event, previous_location in reversed(admission):
+                slot = self._slots.get(event.account_id)
+                if slot is None:
+                    continue
+                self._remove(slot, event)
+                if (event.latitude is not None
+                        and tuple(self._last_location[slot]) == (event.latitude, event.longitude)):
+                    self._last_location[slot] = previous_location
+
+    def _record(self, event: _Event) -> Tuple[float, float]:
+        """
+        Append event to its account's ring
+        Returns the account's last location before it (for rollback)
+        """
+        slot = self._slot(event.account_id)
+        self._expire(slot, event.time)
+
+        # Append to the ring, overwriting the oldest entry when it's full
+        head, count = self._head[slot], self._count[slot]
+        if count == self.window_size:
+            position = head
+            self._total[slot] -= self._amounts[slot, head]
+            self._head[slot] = (head + 1) % self.window_size
+        else:
+            position = (head + count) % self.window_size
+            self._count[slot] = count + 1
+        self._times[slot, position] = event.time
+        self._amounts[slot, position] = event.amount
+        self._total[slot] += event.amount
+        previous_location = tuple(self._last_location[slot])
+        if event.latitude is not None:
+            self._last_location[slot] = (event.latitude, event.longitude)
+        return previous_location
+
+    def _remove(self, slot: int, event: _Event):
+        """
+        Remove the latest ring entry matching event, keeping the others in
+        order - O(max_events_per_window), only needed for rollbacks
+        """
+        count = int(self._count[slot])
+        positions = (self._head[slot] + np.arange(count)) % self.window_size
+        times, amounts = self._times[slot, positions], self._amounts[slot, positions]
+        matches = np.flatnonzero((times == event.time) & (amounts == event.amount))
+        if not len(matches):
+            return
+        keep = np.arange(count) != matches[-1]
+        self._times[slot, positions[:-1]] = times[keep]
+        self._amounts[slot, positions[:-1]] = amounts[keep]
+        self._count[slot] = count - 1
+        self._total[slot] = self._total[slot] - event.amount if count > 1 else 0.0
+
+    def __len__(self) -> int:
+        return len(self._slots)
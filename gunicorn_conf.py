@@ -0,0 +1,64 @@
+import gc
+import multiprocessing
+import os
+
+# Production settings for the Flask scoring API (api_server.py)
+#   gunicorn -c gunicorn_conf.py api_server:app
+#
+# The master imports the app and loads the models before forking, so the
+# workers start with the model and scaler arrays already in memory and
+# share those pages copy-on-write instead of each loading its own copy
+# A collection writes to the header of every object it scans, which would
+# copy the shared pages into each worker one by one. gc.freeze() moves the
+# loaded objects into the permanent generation the cyclic GC never scans.
+# It does nothing about refcounts though - a worker touching an object
+# still writes its refcount and copies that page. What stays shared is
+# mostly the big array buffers, which have no refcount of their own
+#
+# The GC is off in the master from here on, so the allocations while the
+# app and models load don't keep setting off collections, and each worker
+# turns it back on after the fork (post_fork)
+gc.disable()
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+# sklearn predict holds the GIL, so scale with processes, not threads
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_class = "sync"
+
+# Import the app (and the models, see when_ready) once in the master
+preload_app = True
+
+# Recycle workers now and then so slow leaks can't build up - a new
+# worker is forked from the master, so it starts warm and shares the
+# models again. The jitter keeps them from all restarting at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+# Requests in flight get this long to finish on restarts and shutdown
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", None)
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """
+    Runs in the master after the app is imported, before any worker forks
+    """
+    from api_server import load_models
+
+    scoring_system = load_models()
+    # Collect once so the garbage isn't frozen too, then freeze everything
+    # that's left (models included) into the permanent generation. The
+    # master itself keeps the GC off, it only ever forks workers
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Models {scoring_system.model_version} loaded in the master, "
+                    f"{gc.get_freeze_count()} objects frozen")
+
+
+def post_fork(server, worker):
+    gc.enable()
+    server.log.info(f"Worker {worker.pid} forked with shared models")
@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Grouped versions of the history-based features in enhanced_credit_scoring
+# Instead of walking each applicant's list of dicts and calling np.std /
+# np.mean per applicant, all histories for a batch are laid out as flat
+# columns plus an applicant index and reduced with np.bincount
+#
+# Columnar inputs: a pandas DataFrame, a pyarrow Table/RecordBatch or a
+# dict of NumPy arrays, with an applicant index column (0..n_applicants-1)
+# and a value column:
+#   transactions -> 'amount'
+#   income       -> 'income'
+#   employment   -> 'duration_years'
+
+APPLICANT_COLUMN = 'applicant_index'
+
+
+def _column(frame, name: str) -> np.ndarray:
+    """
+    Pull one column out of a DataFrame, Arrow table/batch or dict of arrays
+    """
+    if isinstance(frame, dict):
+        return np.asarray(frame[name])
+    if hasattr(frame, 'column') and not hasattr(frame, 'iloc'):
+        # pyarrow - zero-copy when the column has no nulls
+        return frame.column(name).to_numpy()
+    return frame[name].to_numpy()
+
+
+def grouped_mean_std(values: np.ndarray, groups: np.ndarray,
+                     n_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-group mean, population std (like np.std) and count
+    Two-pass so the std doesn't lose precision on large amounts
+    Empty groups get mean/std of 0
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups, dtype=np.intp)
+    counts = np.bincount(groups, minlength=n_groups)
+    safe_counts = np.maximum(counts, 1)
+
+    mean = np.bincount(groups, weights=values, minlength=n_groups) / safe_counts
+    deviations = values - mean[groups]
+    variance = np.bincount(groups, weights=deviations * deviations, minlength=n_groups) / safe_counts
+    return mean, np.sqrt(variance), counts
+
+
+def income_stability(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    1 / (1 + coefficient of variation) of each applicant's income history
+    Applicants without history get 0
+    """
+    mean, std, counts = grouped_mean_std(values, groups, n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stability = 1.0 / (1.0 + std / mean)
+    # fmin matches the scalar min(1.0, x), including for NaN
+    return np.where(counts > 0, np.fmin(1.0, stability), 0.0)
+
+
+def transaction_regularity(amounts: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    1 - std/mean of each applicant's transaction amounts, clipped to [0, 1]
+    Applicants without transactions get 0
+    """
+    mean, std, counts = grouped_mean_std(amounts, groups, n_groups)
+    regularity = 1.0 - std / (mean + 1e-6)
+    return np.where(counts > 0, np.fmax(0.0, np.fmin(1.0, regularity)), 0.0)
+
+
+def employment_stability(durations: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Average job tenure normalized to 5 years, capped at 1
+    Applicants without employment history get 0
+    """
+    groups = np.asarray(groups, dtype=np.intp)
+    counts = np.bincount(groups, minlength=n_groups)
+    totals = np.bincount(groups, weights=np.asarray(durations, dtype=np.float64), minlength=n_groups)
+    average_tenure = totals / np.maximum(counts, 1)
+    return np.where(counts > 0, np.fmin(1.0, average_tenure / 5.0), 0.0)
+
+
+def flatten_histories(users: List[Dict], key: str,
+                      field: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lay out a per-applicant history as flat (values, applicant_index) columns
+    field picks a value out of dict entries (e.g. 'amount'), otherwise the
+    entries are numbers already
+    A history that is already a NumPy array is used as-is
+    """
+    value_chunks = []
+    group_chunks = []
+    for index, user_data in enumerate(users):
+        history = user_data.get(key)
+        if history is None or len(history) == 0:
+            continue
+        if isinstance(history, np.ndarray):
+            values = history.astype(np.float64, copy=False)
+        elif field is not None:
+            values = np.fromiter((entry.get(field, 0) for entry in history),
+                                 dtype=np.float64, count=len(history))
+        else:
+            values = np.asarray(history, dtype=np.float64)
+        value_chunks.append(values)
+        group_chunks.append(np.full(len(values), index, dtype=np.intp))
+
+    if not value_chunks:
+        return np.zeros(0), np.zeros(0, dtype=np.intp)
+    return np.concatenate(value_chunks), np.concatenate(group_chunks)
+
+
+def compute_history_features(users: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    History features for a batch of user dicts
+    """
+    n = len(users)
+    income, income_groups = flatten_histories(users, 'income_history')
+    amounts, amount_groups = flatten_histories(users, 'transaction_history', 'amount')
+    durations, job_groups = flatten_histories(users, 'employment_history', 'duration_years')
+    return {
+        'income_stability': income_stability(income, income_groups, n),
+        'transaction_regularity': transaction_regularity(amounts, amount_groups, n),
+        'employment_stability': employment_stability(durations, job_groups, n)
+    }
+
+
+def compute_history_features_from_frames(n_applicants: int, transactions=None, income=None,
+                                         employment=None) -> Dict[str, np.ndarray]:
+    """
+    History features straight from columnar data (see the module comment)
+    Missing frames mean no history for anyone, i.e. a feature of 0
+    """
+    empty = (np.zeros(0), np.zeros(0, dtype=np.intp))
+
+    def columns(frame, value_column):
+        if frame is None:
+            return empty
+        return _column(frame, value_column), _column(frame, APPLICANT_COLUMN)
+
+    return {
+        'income_stability': income_stability(*columns(income, 'income'), n_applicants),
+        'transaction_regularity': transaction_regularity(*columns(transactions, 'amount'), n_applicants),
+        'employment_stability': employment_stability(*columns(employment, 'duration_years'), n_applicants)
+    }
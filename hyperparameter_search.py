@@ -0,0 +1,353 @@
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tree_compiler import compile_ensemble
+
+# Hyperparameter search for the scoring models
+# The constructor settings in credit_scoring.py / enhanced_credit_scoring.py
+# were tuned by hand - this tries many configs at once and reports both
+# accuracy and serving latency, since a slightly better model that's twice
+# as slow to score isn't a win for us
+#
+# - candidates run in a process pool (the estimators are single-threaded
+#   here so workers don't fight over cores)
+# - the dataset is written once as .npy files and every worker memory-maps
+#   it, instead of pickling X/y into each task
+# - successive halving: every candidate gets a small slice of the training
+#   rows, only the best 1/eta move on to eta times more rows
+# - latency is timed in this process after each rung, one model at a time
+#   while the pool sits idle - timings taken next to workers busy fitting
+#   would rank candidates on how contended the machine was
+
+FAMILIES = ('gradient_boosting', 'random_forest', 'xgboost')
+
+# Populated in each worker by _open_dataset
+_dataset: Dict[str, np.ndarray] = {}
+
+
+def default_search_space(task: str = 'regression') -> List[Dict]:
+    """
+    Grid around the hand-tuned settings
+    regression is the credit score (GradientBoostingRegressor / XGBoost),
+    classification the fraud model (RandomForestClassifier, 100 trees,
+    depth 10) - fraud labels are rare, so that grid also tries weighting
+    the classes
+    """
+    if task == 'regression':
+        grids = {
+            'gradient_boosting': {
+                'n_estimators': [50, 100, 200],
+                'learning_rate': [0.05, 0.1],
+                'max_depth': [3, 5]
+            },
+            'random_forest': {
+                'n_estimators': [50, 100, 200],
+                'max_depth': [6, 10, None]
+            },
+            'xgboost': {
+                'n_estimators': [100, 200],
+                'learning_rate': [0.05, 0.1],
+                'max_depth': [4, 6],
+                'subsample': [0.8],
+                'colsample_bytree': [0.8]
+            }
+        }
+    elif task == 'classification':
+        grids = {
+            'gradient_boosting': {
+                'n_estimators': [100, 200],
+                'learning_rate': [0.05, 0.1],
+                'max_depth': [3, 5]
+            },
+            'random_forest': {
+                'n_estimators': [50, 100, 200],
+                'max_depth': [6, 10, 16],
+                'min_samples_leaf': [1, 5],
+                'class_weight': [None, 'balanced']
+            },
+            'xgboost': {
+                'n_estimators': [100, 200],
+                'learning_rate': [0.05, 0.1],
+                'max_depth': [4, 6],
+                'subsample': [0.8],
+                'colsample_bytree': [0.8],
+                # Recommended for logistic loss on imbalanced classes
+                'max_delta_step': [0, 1]
+            }
+        }
+    else:
+        raise ValueError(f"Unknown task '{task}'")
+
+    candidates = []
+    for family, grid in grids.items():
+        names = list(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            candidates.append({'family': family, 'params': dict(zip(names, values))})
+    return candidates
+
+
+def build_estimator(family: str, params: Dict, task: str = 'regression'):
+    """
+    Estimator for a candidate, pinned to one thread
+    """
+    params = dict(params, random_state=42)
+    if family == 'gradient_boosting':
+        from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+        cls = GradientBoostingRegressor if task == 'regression' else GradientBoostingClassifier
+        return cls(**params)
+    if family == 'random_forest':
+        from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+        cls = RandomForestRegressor if task == 'regression' else RandomForestClassifier
+        return cls(n_jobs=1, **params)
+    if family == 'xgboost':
+        from xgboost import XGBClassifier, XGBRegressor
+        cls = XGBRegressor if task == 'regression' else XGBClassifier
+        return cls(n_jobs=1, **params)
+    raise ValueError(f"Unknown model family '{family}'")
+
+
+def prepare_dataset(X: np.ndarray, y: np.ndarray, directory: str,
+                    validation_fraction: float = 0.2, seed: int = 0) -> str:
+    """
+    Shuffle, split and write the data as uncompressed .npy files so the
+    workers can memory-map them (the OS shares the pages between processes)
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(X))
+    n_valid = max(1, int(len(X) * validation_fraction))
+    valid, train = order[:n_valid], order[n_valid:]
+
+    os.makedirs(directory, exist_ok=True)
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    np.save(os.path.join(directory, 'X_train.npy'), X[train])
+    np.save(os.path.join(directory, 'y_train.npy'), y[train])
+    np.save(os.path.join(directory, 'X_valid.npy'), X[valid])
+    np.save(os.path.join(directory, 'y_valid.npy'), y[valid])
+    return directory
+
+
+def _open_dataset(directory: str):
+    """
+    Worker initializer - map the dataset read-only
+    """
+    for name in ('X_train', 'y_train', 'X_valid', 'y_valid'):
+        _dataset[name] = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+
+
+def _median_ms(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def measure_latency(model, X: np.ndarray, repeats: int = 50, batch_rows: int = 1024) -> Dict:
+    """
+    Serving cost of a fitted model
+    Single-row latency is what one API request pays; the compiled engine
+    (tree_compiler.py) is what actually serves small batches
+    """
+    row = np.ascontiguousarray(X[:1])
+    batch = np.ascontiguousarray(X[:batch_rows])
+    predict = model.predict_proba if hasattr(model, 'predict_proba') else model.predict
+
+    predict(row)  # warm up
+    latency = {
+        'single_row_ms': _median_ms(lambda: predict(row), repeats),
+        'batch_ms_per_row': _median_ms(lambda: predict(batch), max(1, repeats // 10)) / len(batch)
+    }
+
+    try:
+        compiled = compile_ensemble(model)
+    except ValueError:
+        compiled = None
+    if compiled is not None:
+        compiled_predict = compiled.predict_proba if compiled.kind == 'classifier' else compiled.predict
+        compiled_predict(row)
+        latency['compiled_single_row_ms'] = _median_ms(lambda: compiled_predict(row), repeats)
+    return latency
+
+
+def _evaluate(candidate: Dict, n_rows: int, task: str) -> Tuple[Dict, Any]:
+    """
+    Fit one candidate on the first n_rows training rows and score it
+    Runs inside a worker process. Returns the fitted model too, so its
+    latency can be measured once the rest of the rung has finished
+    """
+    X_train = np.asarray(_dataset['X_train'][:n_rows])
+    y_train = np.asarray(_dataset['y_train'][:n_rows])
+    X_valid, y_valid = _dataset['X_valid'], _dataset['y_valid']
+
+    model = build_estimator(candidate['family'], candidate['params'], task)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    metric, score = _validation_score(model, np.asarray(X_valid), np.asarray(y_valid), task)
+    result = {
+        'family': candidate['family'],
+        'params': candidate['params'],
+        'n_train_rows': n_rows,
+        'metric': metric,
+        'score': score,
+        'fit_seconds': fit_seconds
+    }
+    return result, model
+
+
+def _validation_score(model, X_valid: np.ndarray, y_valid: np.ndarray, task: str) -> Tuple[str, float]:
+    """
+    (metric, score) on the validation rows, higher is better
+    R^2 for regression. Classifiers are ranked on their probabilities -
+    fraud labels are rare enough that accuracy barely moves between
+    candidates - with average precision for binary labels
+    """
+    if task != 'classification':
+        return 'r2', float(model.score(X_valid, y_valid))
+
+    from sklearn.metrics import average_precision_score, roc_auc_score
+
+    proba = model.predict_proba(X_valid)
+    labels = np.unique(y_valid)
+    if len(labels) > 2:
+        return 'roc_auc_ovr', float(roc_auc_score(y_valid, proba, multi_class='ovr', labels=model.classes_))
+    # A model fitted on a small early-rung slice may never have seen the positive class
+    positive = labels[-1]
+    classes = list(model.classes_)
+    scores = proba[:, classes.index(positive)] if positive in classes else np.zeros(len(y_valid))
+    return 'average_precision', float(average_precision_score(y_valid == positive, scores))
+
+
+def _serving_ms(result: Dict) -> float:
+    # What a single request pays: the compiled trees serve small batches
+    return result.get('compiled_single_row_ms', result['single_row_ms'])
+
+
+def _pareto_front(results: List[Dict]) -> List[Dict]:
+    """
+    Candidates no other candidate beats on both score and serving latency
+    """
+    front = []
+    for result in results:
+        dominated = any(
+            other['score'] >= result['score'] and _serving_ms(other) <= _serving_ms(result)
+            and (other['score'] > result['score'] or _serving_ms(other) < _serving_ms(result))
+            for other in results
+        )
+        if not dominated:
+            front.append(result)
+    return sorted(front, key=_serving_ms)
+
+
+def run_search(X: np.ndarray, y: np.ndarray, candidates: Optional[List[Dict]] = None,
+               task: str = 'regression', output_path: str = 'search_results.json',
+               max_workers: Optional[int] = None, eta: int = 3, min_rows: Optional[int] = None,
+               workdir: Optional[str] = None) -> Dict:
+    """
+    Successive halving over the candidates
+    Rung 0 fits every candidate on min_rows rows; each rung keeps the
+    best 1/eta and multiplies the rows by eta. By default min_rows is
+    picked so the last rung fits about eta candidates on all the rows
+    Every evaluation is written to output_path as JSON
+    """
+    if candidates is None:
+        candidates = default_search_space(task)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        prepare_dataset(X, y, directory)
+        n_train = len(np.load(os.path.join(directory, 'y_train.npy'), mmap_mode='r'))
+        X_valid = np.load(os.path.join(directory, 'X_valid.npy'), mmap_mode='r')
+
+        if min_rows is None:
+            n_rungs = max(1, int(np.log(len(candidates)) / np.log(eta) + 1e-9))
+            min_rows = max(50, n_train // eta ** (n_rungs - 1))
+
+        # Rows per rung, the last rung always gets everything
+        schedule = []
+        n_rows = min_rows
+        while n_rows < n_train and n_rows * eta <= n_train:
+            schedule.append(n_rows)
+            n_rows *= eta
+        schedule.append(n_train)
+
+        rungs = []
+        survivors = candidates
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_open_dataset,
+                                 initargs=(directory,)) as pool:
+            for n_rows in schedule:
+                futures = [pool.submit(_evaluate, candidate, n_rows, task) for candidate in survivors]
+                evaluated = [future.result() for future in futures]
+
+                # Every fit in the rung is done, so nothing else is running -
+                # time the models one after another
+                results = []
+                for result, model in evaluated:
+                    result.update(measure_latency(model, X_valid))
+                    results.append(result)
+                results.sort(key=lambda result: result['score'], reverse=True)
+                rungs.append({'n_train_rows': n_rows, 'results': results})
+
+                if len(results) <= 1:
+                    break
+                keep = max(1, len(results) // eta)
+                survivors = [{'family': result['family'], 'params': result['params']}
+                             for result in results[:keep]]
+
+    final = rungs[-1]['results']
+    report = {
+        'task': task,
+        'created_at': datetime.now().isoformat(),
+        'n_candidates': len(candidates),
+        'eta': eta,
+        'rungs': rungs,
+        'best': final[0],
+        'pareto_front': _pareto_front(final)
+    }
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search model hyperparameters")
+    parser.add_argument("data", help="Parquet or CSV file with feature columns and a label")
+    parser.add_argument("--label", default="credit_score")
+    parser.add_argument("--task", choices=["regression", "classification"], default="regression")
+    parser.add_argument("--families", nargs="+", choices=FAMILIES, default=list(FAMILIES))
+    parser.add_argument("--output", default="search_results.json")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--eta", type=int, default=3)
+    args = parser.parse_args()
+
+    import pandas as pd
+    if args.data.endswith(".parquet"):
+        data = pd.read_parquet(args.data)
+    else:
+        data = pd.read_csv(args.data)
+
+    space = [candidate for candidate in default_search_space(args.task)
+             if candidate['family'] in args.families]
+    report = run_search(
+        data.drop(columns=[args.label]).to_numpy(dtype=np.float64),
+        data[args.label].to_numpy(),
+        candidates=space,
+        task=args.task,
+        output_path=args.output,
+        max_workers=args.workers,
+        eta=args.eta
+    )
+    best = report['best']
+    print(f"Best: {best['family']} {best['params']} {best['metric']}={best['score']:.4f} "
+          f"latency={_serving_ms(best):.3f}ms")
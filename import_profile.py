@@ -0,0 +1,97 @@
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List
+
+# Import-time report for the API
+# Runs `python -X importtime -c "import <module>"` in a fresh interpreter
+# and summarizes where the boot time goes. Exits non-zero when a heavy ML
+# package gets imported at boot or the total goes over budget, so it can
+# run in CI and catch a stray top-level import
+#
+#   python import_profile.py                 # profile main
+#   python import_profile.py scoring_api --max-ms 500 --json report.json
+
+# Only allowed to load with the models, never at boot
+HEAVY_PACKAGES = ('sklearn', 'pandas', 'xgboost', 'joblib', 'scipy', 'tensorflow', 'pyarrow')
+
+
+def profile_imports(module: str) -> List[Dict]:
+    """
+    Import a module in a new interpreter and parse -X importtime output
+    Returns one entry per imported module, times in milliseconds
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000
+        })
+    return entries
+
+
+def build_report(module: str, entries: List[Dict], top: int = 25) -> Dict:
+    """
+    Totals plus the self time of every top-level package (fastapi,
+    sqlalchemy, numpy, ...), which is what actually moves when an import
+    is added or made lazy
+    """
+    top_level = [entry for entry in entries if entry['depth'] == 0]
+    packages: Dict[str, float] = {}
+    for entry in entries:
+        package = entry['module'].split('.')[0]
+        packages[package] = packages.get(package, 0.0) + entry['self_ms']
+
+    return {
+        'module': module,
+        'total_ms': sum(entry['cumulative_ms'] for entry in top_level),
+        'modules_imported': len(entries),
+        'heavy_packages': sorted(package for package in packages if package in HEAVY_PACKAGES),
+        'slowest_packages': [
+            {'package': package, 'self_ms': ms}
+            for package, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time report for the API")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail above this total import time")
+    parser.add_argument("--allow-heavy", action="store_true", help="Don't fail on heavy ML imports")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    report = build_report(args.module, profile_imports(args.module), args.top)
+
+    print(f"import {report['module']}: {report['total_ms']:.1f}ms, "
+          f"{report['modules_imported']} modules")
+    for entry in report['slowest_packages']:
+        print(f"  {entry['self_ms']:9.1f}ms  {entry['package']}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if report['heavy_packages'] and not args.allow_heavy:
+        print(f"Heavy packages imported at boot: {', '.join(report['heavy_packages'])}")
+        failed = True
+    if args.max_ms is not None and report['total_ms'] > args.max_ms:
+        print(f"Import time {report['total_ms']:.1f}ms is over the {args.max_ms:.0f}ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
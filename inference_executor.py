@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, Tuple
+
+# predict() is CPU-bound and used to run straight on the event loop,
+# which stalled everything else (even /health) while a batch was scored
+# XGBoost releases the GIL so a thread pool is enough there, sklearn trees
+# mostly don't so those get a process pool with the models preloaded
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceSaturated(Exception):
+    """
+    Raised when the executor already has as much work queued as it accepts
+    """
+    pass
+
+
+class InferenceUnavailable(InferenceSaturated):
+    """
+    Raised when inference can't run at all right now - the models failed to
+    load, or a worker died under the call (the pool is rebuilt for the next
+    one). A subclass so everything that answers 503 for a full queue, and
+    MicroBatcher's fatal_errors, treat it the same way
+    """
+    pass
+
+
+class InferenceExecutor:
+    """
+    Runs blocking inference calls off the event loop with admission control
+    At most max_workers + max_queue_depth calls are in flight at once,
+    anything beyond that is rejected straight away instead of queueing
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: Optional[int] = None,
+                 max_queue_depth: int = 64, initializer: Optional[Callable] = None,
+                 initargs: Tuple = ()):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth
+        self.initializer = initializer
+        self.initargs = initargs
+        self.in_flight = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._pool: Optional[Executor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue_depth
+
+    def start(self):
+        """
+        Create the worker pool
+        For process mode call this after the models are loaded so forked
+        workers inherit them warm
+        """
+        if self._pool is not None:
+            return
+        if self.mode == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=self.initializer,
+                initargs=self.initargs
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference",
+                initializer=self.initializer,
+                initargs=self.initargs
+            )
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the worker pool
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run fn(*args) in the pool and wait for the result
+        In process mode fn and args have to be picklable (module-level functions)
+        """
+        # Only touched from the event loop thread so no lock needed
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise InferenceSaturated(
+                f"Inference queue is full ({self.in_flight} calls in flight)"
+            )
+
+        if self._pool is None:
+            self.start()
+
+        pool = self._pool
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, partial(fn, *args))
+        except BrokenExecutor as e:
+            # A worker died (OOM kill, segfault, failed initializer) and took
+            # the pool with it - every later call would fail the same way
+            self._replace_broken(pool)
+            raise InferenceUnavailable(f"Inference worker died, pool restarted: {e}") from e
+        finally:
+            self.in_flight -= 1
+
+    def _replace_broken(self, pool: Executor):
+        """
+        Swap a broken pool for a new one
+        Every call that was running on it fails at once, only the first
+        one to get here rebuilds it. The call isn't retried - it may well
+        be what killed the worker
+        """
+        if self._pool is not pool:
+            return
+        self.restarts += 1
+        logger.error(f"Inference pool broken, restarting it ({self.restarts} restarts so far)")
+        pool.shutdown(wait=False)
+        self._pool = None
+        self.start()
+
+
+def build_executor(prefix: str, default_mode: str = "thread",
+                   initializer: Optional[Callable] = None,
+                   initargs: Tuple = (), default_workers: Optional[int] = None,
+                   default_max_queue: int = 64) -> InferenceExecutor:
+    """
+    Build an executor configured from environment variables:
+    {prefix}_EXECUTOR (thread/process), {prefix}_WORKERS and {prefix}_MAX_QUEUE
+    """
+    workers = os.getenv(f"{prefix}_WORKERS")
+    return InferenceExecutor(
+        mode=os.getenv(f"{prefix}_EXECUTOR", default_mode),
+        max_workers=int(workers) if workers else default_workers,
+        max_queue_depth=int(os.getenv(f"{prefix}_MAX_QUEUE", str(default_max_queue))),
+        initializer=initializer,
+        initargs=initargs
+    )
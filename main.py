@@ -1,7 +1,9 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
+from starlette.concurrency import run_in_threadpool
 from utils.error_handlers import (
     AppException,
     app_exception_handler,
@@ -9,40 +11,145 @@ from utils.error_handlers import (
     general_exception_handler
 )
 from utils.logger import logger
-from config import settings
-from database import init_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings, validate_settings
+from database import init_db, async_connect_with_retry, close_db, get_async_db, get_pool_stats
+from metrics import MetricsMiddleware, render_metrics, watch_cache, watch_pools
+from rate_limit import RateLimitMiddleware
+from scoring_api import router as scoring_router, score_applicant, warmup as scoring_warmup
+from enhanced_serving import router as enhanced_router, warmup as enhanced_warmup
+from auth import require_customer
+from profile_service import SCALAR_COLUMNS, profile_service
+from dashboard_rollups import balance_history, dashboard_version, month_start, spending_breakdown
+from datetime import datetime
 import uvicorn
 import os
 
 # TODO: Need to add better error messages for common failures
-# TODO: Rate limiting needs improvement - current implementation is basic
 # TODO: Add more comprehensive logging for debugging
 
 # Create FastAPI app
+# Nothing here reads the settings at import time - the title and version
+# come from custom_openapi below, CORS is configured on the first request
 app = FastAPI(
-    title=settings.APP_NAME,
     description="A modern banking system with credit scoring and financial management",
-    version=settings.APP_VERSION,
     docs_url=None,  # Disable default docs
-    redoc_url=None  # Disable default redoc
+    redoc_url=None,  # Disable default redoc
+    default_response_class=ORJSONResponse  # orjson instead of json.dumps for every response
 )
 
+# Rate limiting per client/API key (see rate_limit.py)
+# Added before CORS so it runs inside it - 429s still get CORS headers and
+# the browser can see them. Batch endpoints cost more than single calls,
+# /health and /ready are free
+app.add_middleware(RateLimitMiddleware, settings=settings)
+
 # Add CORS middleware
 # Note: In production, we should restrict this to specific origins
 # Current setup allows all origins for development
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=settings.CORS_METHODS,
-    allow_headers=settings.CORS_HEADERS,
-)
+class SettingsCORSMiddleware:
+    """
+    CORSMiddleware built from the settings on the first request
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.cors = None
+
+    async def __call__(self, scope, receive, send):
+        if self.cors is None:
+            self.cors = CORSMiddleware(
+                self.app,
+                allow_origins=settings.CORS_ORIGINS,
+                allow_credentials=True,
+                allow_methods=settings.CORS_METHODS,
+                allow_headers=settings.CORS_HEADERS,
+            )
+        await self.cors(scope, receive, send)
+
+app.add_middleware(SettingsCORSMiddleware)
 
 # Add exception handlers
 # These were added after spending hours debugging error responses
 app.add_exception_handler(AppException, app_exception_handler)
 app.add_exception_handler(Exception, general_exception_handler)
 
+# Request latency per route for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Credit scoring / fraud endpoints
+# Inference runs in its own worker pool (see inference_executor.py) so
+# it can't block the event loop and take /health down with it
+app.include_router(scoring_router)
+
+# Enhanced (XGBoost) scoring, served from the versioned model store
+app.include_router(enhanced_router)
+
+# Customer profiles
+# Assembled from the profile tables and cached (see profile_service.py),
+# so the dashboard and the scorer don't re-query the same history rows
+# Only the customer the bearer token was issued to can read them (auth.py)
+async def _load_profile(customer_id: int, db: AsyncSession) -> dict:
+    profile = await profile_service.get_profile_async(db, customer_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return profile
+
+@app.get("/customers/{customer_id}/profile", dependencies=[Depends(require_customer)])
+async def customer_profile(customer_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await _load_profile(customer_id, db)
+
+@app.get("/customers/{customer_id}/credit_score", dependencies=[Depends(require_customer)])
+async def customer_credit_score(customer_id: int, db: AsyncSession = Depends(get_async_db)):
+    profile = await _load_profile(customer_id, db)
+    # The scorer only reads the scalar columns - don't ship the income,
+    # employment and transaction history to the inference pool with them
+    user_data = {name: profile[name] for name in (*SCALAR_COLUMNS, 'customer_id', 'applicant_id')
+                 if name in profile}
+    return await score_applicant(user_data)
+
+# Dashboard charts
+# Read from the monthly/category rollup tables (see dashboard_rollups.py),
+# so a dashboard load costs one row per month however long the history is
+# Same token check as the profile endpoints
+# The ETag comes from a per-customer version that every transaction write
+# bumps, so an unchanged dashboard is answered with a 304 after a single
+# primary key lookup
+async def _dashboard_response(request: Request, db: AsyncSession, customer_id: int,
+                              months: int, build):
+    version = await dashboard_version(db, customer_id)
+    # The window ends at the current month, so a new month is new data too
+    current = month_start(datetime.utcnow()).strftime('%Y-%m')
+    etag = f'"{customer_id}-{version}-{months}-{current}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    content = {"customer_id": customer_id, "months": months, **await build()}
+    return JSONResponse(content=content, headers=headers)
+
+@app.get("/customers/{customer_id}/dashboard/balance_history", dependencies=[Depends(require_customer)])
+async def dashboard_balance_history(customer_id: int, request: Request,
+                                    months: int = Query(6, ge=1, le=120),
+                                    db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        return {"history": await balance_history(db, customer_id, months)}
+    return await _dashboard_response(request, db, customer_id, months, build)
+
+@app.get("/customers/{customer_id}/dashboard/spending", dependencies=[Depends(require_customer)])
+async def dashboard_spending(customer_id: int, request: Request,
+                             months: int = Query(6, ge=1, le=120),
+                             db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        return {"categories": await spending_breakdown(db, customer_id, months)}
+    return await _dashboard_response(request, db, customer_id, months, build)
+
+# Cache and connection pool stats are read when /metrics is scraped
+watch_cache("profile", lambda: profile_service.cache)
+watch_pools(get_pool_stats)
+
 # Custom OpenAPI schema
 # Had to customize this to add proper security schemes
 # The default one wasn't showing our JWT auth properly
@@ -85,22 +192,51 @@ async def custom_swagger_ui_html():
 
 # Health check endpoint
 # Added this after deployment issues - helps monitor if the service is up
+# Probes hit this every few seconds, so it doesn't log anymore
 @app.get("/health")
 async def health_check():
-    logger.info("Health check requested")
     return {"status": "healthy"}
 
+# Readiness check
+# Models load in the background after startup (no sklearn/xgboost import
+# at boot), so the process is up long before it can score - load balancers
+# should route on this, not /health
+@app.get("/ready")
+async def readiness_check():
+    warmups = {
+        warmup.name: warmup.status()
+        for warmup in (scoring_warmup, enhanced_warmup)
+    }
+    ready = all(status['ready'] for status in warmups.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming_up", "models": warmups}
+    )
+
+# Prometheus scrape endpoint
+# Latency per route, model stage timings, batch sizes, caches, executors
+# and the DB pools (see metrics.py)
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Initialize database
 # This was a pain to get right - connection pooling was tricky
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up application...")
-    init_db()
+    validate_settings()
+    # Wait for the database (with retries) without blocking the event loop,
+    # which also warms the async pool so the first requests don't pay for it
+    await async_connect_with_retry()
+    # Table creation is sync SQLAlchemy - keep it off the event loop too
+    await run_in_threadpool(init_db)
     logger.info("Application startup complete")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application...")
+    await close_db()
 
 if __name__ == "__main__":
     logger.info(f"Starting {settings.APP_NAME} in {settings.ENVIRONMENT} mode")
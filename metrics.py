@@ -0,0 +1,402 @@
+import bisect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus-style metrics without the client library
+# Histograms only keep a count per bucket (one bisect and two adds per
+# observation), and everything that already has counters of its own
+# (caches, connection pools, executors) is read when /metrics is scraped
+# instead of being updated on the hot path
+#
+# Model stages (features, scaling, predict, ...) are timed inside the
+# inference workers, which can be separate processes. The timings are
+# collected per call and shipped back with the results (instrumented_call
+# / merge_worker_report), so one /metrics shows every worker
+
+# Seconds - fine-grained at the bottom, inference stages are sub-millisecond
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+# (labels, value) pairs for one gauge / counter read at scrape time
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter:
+    """
+    Monotonic counter, optionally with labels
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _CounterChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _CounterChild())
+        return child
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus +Inf, not cumulative until exposed
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, optionally with labels
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labelnames + ('le',)
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(bucket_labels, values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Everything /metrics exposes
+    Collectors are called at scrape time and return
+    (name, documentation, type, samples) for values kept elsewhere
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, Samples]]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], List[Tuple[str, str, str, Samples]]]):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.expose())
+
+        # Samples with the same name can come from several collectors
+        # (e.g. one per executor) but HELP/TYPE may only appear once
+        collected: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collector in list(self._collectors):
+            for name, documentation, kind, samples in collector():
+                entry = collected.setdefault(name, (documentation, kind, []))
+                for labels, value in samples:
+                    entry[2].append(f"{name}{_format_labels(list(labels), list(labels.values()))} "
+                                    f"{_format_value(value)}")
+        for name, (documentation, kind, sample_lines) in collected.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(sample_lines)
+        return "\n".join(lines) + "\n"
+
+
+# Shared by everything in the process
+metrics_registry = MetricsRegistry()
+
+REQUEST_SECONDS = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+REQUESTS_TOTAL = metrics_registry.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+STAGE_SECONDS = metrics_registry.histogram(
+    "model_stage_duration_seconds", "Time per model stage and call", ("model", "stage"))
+BATCH_SIZE = metrics_registry.histogram(
+    "inference_batch_size", "Items per micro-batch", ("batcher",), BATCH_SIZE_BUCKETS)
+
+
+# Stage timing
+# Only recorded while a collection is active on the current thread, so
+# direct calls (scripts, training, the Flask app) pay one attribute lookup
+_local = threading.local()
+
+
+class _StageTimer:
+    __slots__ = ('model', 'stage', 'timings', 'started')
+
+    def __init__(self, model: str, stage: str):
+        self.model = model
+        self.stage = stage
+        self.timings = getattr(_local, 'timings', None)
+
+    def __enter__(self):
+        if self.timings is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timings is not None:
+            self.timings.append((self.model, self.stage, time.perf_counter() - self.started))
+        return False
+
+
+def time_stage(model: str, stage: str) -> _StageTimer:
+    """
+    with time_stage('credit_score', 'predict'): ...
+    """
+    return _StageTimer(model, stage)
+
+
+def _cache_counters(cache) -> Dict[str, float]:
+    return {'hits': cache.hits, 'misses': cache.misses}
+
+
+def instrumented_call(fn: Callable, *args, caches: Optional[Dict[str, Any]] = None) -> Tuple[Any, Dict]:
+    """
+    Run fn(*args) recording its stage timings
+    Returns (result, report) - the report is plain data so it can come
+    back from a process pool; hand it to merge_worker_report
+    caches are reported with their running hit/miss counters
+    """
+    previous = getattr(_local, 'timings', None)
+    _local.timings = timings = []
+    try:
+        result = fn(*args)
+    finally:
+        _local.timings = previous
+    report = {
+        'pid': os.getpid(),
+        'timings': timings,
+        'caches': {name: _cache_counters(cache) for name, cache in (caches or {}).items() if cache is not None}
+    }
+    return result, report
+
+
+# Latest cache counters per (cache, worker pid) - summed at scrape time
+_worker_caches: Dict[Tuple[str, int], Dict[str, float]] = {}
+
+
+def merge_worker_report(report: Dict):
+    """
+    Fold a report from instrumented_call into this process's metrics
+    """
+    for model, stage, seconds in report['timings']:
+        STAGE_SECONDS.labels(model, stage).observe(seconds)
+    for name, counters in report['caches'].items():
+        _worker_caches[(name, report['pid'])] = counters
+
+
+def _collect_worker_caches():
+    totals: Dict[str, Dict[str, float]] = {}
+    for (name, _), counters in list(_worker_caches.items()):
+        total = totals.setdefault(name, {'hits': 0, 'misses': 0})
+        total['hits'] += counters['hits']
+        total['misses'] += counters['misses']
+    return _cache_families(totals)
+
+
+def _cache_families(totals: Dict[str, Dict[str, float]]):
+    if not totals:
+        return []
+    return [
+        ('cache_hits_total', 'Cache hits', 'counter',
+         [({'cache': name}, counters['hits']) for name, counters in totals.items()]),
+        ('cache_misses_total', 'Cache misses', 'counter',
+         [({'cache': name}, counters['misses']) for name, counters in totals.items()]),
+        ('cache_hit_ratio', 'Cache hits / lookups', 'gauge',
+         [({'cache': name}, counters['hits'] / (counters['hits'] + counters['misses'])
+           if counters['hits'] + counters['misses'] else 0.0)
+          for name, counters in totals.items()])
+    ]
+
+metrics_registry.register_collector(_collect_worker_caches)
+
+
+def watch_cache(name: str, get_cache: Callable[[], Any]):
+    """
+    Expose a cache living in this process
+    get_cache can return None while nothing is loaded yet
+    """
+    def collect():
+        cache = get_cache()
+        if cache is None:
+            return []
+        return _cache_families({name: _cache_counters(cache)})
+    metrics_registry.register_collector(collect)
+
+
+def watch_executor(name: str, executor):
+    """
+    Expose an InferenceExecutor's queue state
+    """
+    def collect():
+        labels = {'executor': name}
+        return [
+            ('inference_in_flight', 'Calls running or queued in the executor', 'gauge',
+             [(labels, executor.in_flight)]),
+            ('inference_capacity', 'Calls the executor accepts before rejecting', 'gauge',
+             [(labels, executor.capacity)]),
+            ('inference_rejected_total', 'Calls rejected because the executor was full', 'counter',
+             [(labels, executor.rejected)]),
+            ('inference_pool_restarts_total', 'Worker pools rebuilt after a worker died', 'counter',
+             [(labels, executor.restarts)])
+        ]
+    metrics_registry.register_collector(collect)
+
+
+def watch_pools(get_pool_stats: Callable[[], Dict[str, Dict]]):
+    """
+    Expose connection pool stats (database.get_pool_stats)
+    """
+    def collect():
+        stats = get_pool_stats()
+        families = []
+        for key, kind in (('pool_size', 'gauge'), ('checked_out', 'gauge'), ('overflow', 'gauge'),
+                          ('checkouts', 'counter'), ('timeouts', 'counter'),
+                          ('avg_wait_seconds', 'gauge'), ('max_wait_seconds', 'gauge')):
+            name = f"db_pool_{key}_total" if kind == 'counter' else f"db_pool_{key}"
+            families.append((name, f"Connection pool {key.replace('_', ' ')}", kind,
+                             [({'engine': engine}, pool[key]) for engine, pool in stats.items()]))
+        return families
+    metrics_registry.register_collector(collect)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request
+    Labelled with the route template (/customers/{customer_id}/profile),
+    not the raw path, so ids don't blow up the number of series
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Any, str] = {}
+
+    def _route_path(self, scope) -> str:
+        # Newer Starlette puts the matched route in the scope
+        route = scope.get('route')
+        if route is not None:
+            return getattr(route, 'path', "unmatched")
+
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return "unmatched"
+        path = self._routes.get(endpoint)
+        if path is None:
+            # Built on first use, the routers are all included by then
+            app = scope.get('app')
+            for route in getattr(app, 'routes', []):
+                self._routes.setdefault(getattr(route, 'endpoint', None), getattr(route, 'path', ""))
+            path = self._routes.get(endpoint, "unmatched")
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = self._route_path(scope)
+            REQUEST_SECONDS.labels(scope['method'], route).observe(elapsed)
+            REQUESTS_TOTAL.labels(scope['method'], route, str(status[0])).inc()
+
+
+def render_metrics() -> str:
+    return metrics_registry.render()
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from inference_executor import InferenceExecutor, InferenceSaturated
+from request_batching import MicroBatcher
+
+# A/B and shadow evaluation of a candidate scoring system
+# - A/B: a share of applicants (picked by hashing their id, so the same
+#   applicant always gets the same model) is scored by the candidate
+# - shadow: after the primary result has been returned, the candidate
+#   scores the same applicant in the background and the two are compared
+# Shadow scoring runs on its own small executor with a short queue and is
+# dropped (and counted) when that's full - it can never hold up a response
+# or take inference capacity away from the primary model
+# Requests carry the candidate they were routed to through the batchers,
+# so stopping or changing the experiment mid-batch can't break them
+
+logger = logging.getLogger(__name__)
+
+# Fields that identify an applicant, in order of preference
+ID_FIELDS = ('applicant_id', 'customer_id', 'user_id')
+
+
+def traffic_bucket(user_data: Dict) -> float:
+    """
+    Stable position in [0, 1) for an applicant
+    Applicants without an id get a random one
+    """
+    for field in ID_FIELDS:
+        if user_data.get(field) is not None:
+            digest = hashlib.sha256(str(user_data[field]).encode("utf-8")).digest()
+            return int.from_bytes(digest[:8], "big") / 2 ** 64
+    return random.random()
+
+
+class ModelExperiment:
+    """
+    Candidate scoring system running next to the primary one
+    executor runs candidate traffic (A/B), shadow_executor runs shadow scoring
+    Both need to be thread executors - the candidate lives in this process
+    """
+
+    def __init__(self, executor: InferenceExecutor, shadow_executor: InferenceExecutor,
+                 max_batch_size: int = 64, max_wait_ms: float = 2.0, max_pending_shadows: int = 256):
+        self.executor = executor
+        self.shadow_executor = shadow_executor
+        self.max_pending_shadows = max_pending_shadows
+        self.candidate = None
+        self.candidate_share = 0.0
+        self.shadow = False
+        self._batcher = MicroBatcher(self._score_candidate_batch, max_batch_size, max_wait_ms,
+                                     fatal_errors=(InferenceSaturated,), name="candidate")
+        self._shadow_batcher = MicroBatcher(self._shadow_batch, max_batch_size, max_wait_ms,
+                                            fatal_errors=(InferenceSaturated,), name="shadow")
+        self._shadow_tasks = set()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.counts = {
+            'primary': 0,
+            'candidate': 0,
+            'shadow_scored': 0,
+            'shadow_dropped': 0,
+            'shadow_failed': 0
+        }
+        self._abs_diff_total = 0.0
+        self._max_abs_diff = 0.0
+        self._risk_level_matches = 0
+
+    def configure(self, candidate, candidate_share: float = 0.0, shadow: bool = False):
+        """
+        Start (or change) an experiment
+        """
+        if not 0.0 <= candidate_share <= 1.0:
+            raise ValueError("candidate_share has to be between 0 and 1")
+        self.candidate = candidate
+        self.candidate_share = candidate_share
+        self.shadow = shadow
+        self._reset_stats()
+
+    def stop(self):
+        self.candidate = None
+        self.candidate_share = 0.0
+        self.shadow = False
+
+    @property
+    def active(self) -> bool:
+        return self.candidate is not None
+
+    def pick_candidate(self, user_data: Dict) -> Optional[Any]:
+        """
+        Which arm an applicant's request goes to (also counts it)
+        Returns the candidate to score with, or None for the primary model
+        """
+        candidate = self.candidate
+        if candidate is not None and self.candidate_share > 0 \
+                and traffic_bucket(user_data) < self.candidate_share:
+            self.counts['candidate'] += 1
+            return candidate
+        self.counts['primary'] += 1
+        return None
+
+    @staticmethod
+    async def _run_grouped(executor: InferenceExecutor, items: List[Tuple[Any, Dict]]) -> List[Dict]:
+        """
+        Score (candidate, user_data) items - one call per candidate, which
+        is a single call unless the experiment changed while they queued
+        """
+        groups: Dict[int, Tuple[Any, List[int]]] = {}
+        for index, (candidate, _) in enumerate(items):
+            groups.setdefault(id(candidate), (candidate, []))[1].append(index)
+
+        results: List[Optional[Dict]] = [None] * len(items)
+        for candidate, indexes in groups.values():
+            scored = await executor.run(candidate.score_batch, [items[index][1] for index in indexes])
+            for index, result in zip(indexes, scored):
+                results[index] = result
+        return results
+
+    async def _score_candidate_batch(self, items: List[Tuple[Any, Dict]]) -> List[Dict]:
+        return await self._run_grouped(self.executor, items)
+
+    async def _shadow_batch(self, items: List[Tuple[Any, Dict]]) -> List[Dict]:
+        return await self._run_grouped(self.shadow_executor, items)
+
+    async def score(self, user_data: Dict, candidate: Any) -> Dict:
+        """
+        Score one applicant with the candidate pick_candidate returned (A/B arm)
+        """
+        return await self._batcher.submit((candidate, user_data))
+
+    def shadow_score(self, user_data: Dict, primary_result: Dict):
+        """
+        Queue a background comparison against the primary result
+        Returns straight away
+        """
+        candidate = self.candidate
+        if not self.shadow or candidate is None:
+            return
+        if len(self._shadow_tasks) >= self.max_pending_shadows:
+            self.counts['shadow_dropped'] += 1
+            return
+        task = asyncio.ensure_future(self._run_shadow(candidate, user_data, primary_result))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    async def _run_shadow(self, candidate: Any, user_data: Dict, primary_result: Dict):
+        try:
+            candidate_result = await self._shadow_batcher.submit((candidate, user_data))
+        except InferenceSaturated:
+            self.counts['shadow_dropped'] += 1
+            return
+        except Exception as e:
+            self.counts['shadow_failed'] += 1
+            logger.warning(f"Shadow scoring failed: {e}")
+            return
+        self._compare(user_data, primary_result, candidate_result, candidate)
+
+    def _compare(self, user_data: Dict, primary: Dict, candidate_result: Dict, candidate: Any):
+        diff = candidate_result['credit_score'] - primary['credit_score']
+        self.counts['shadow_scored'] += 1
+        self._abs_diff_total += abs(diff)
+        self._max_abs_diff = max(self._max_abs_diff, abs(diff))
+        if candidate_result.get('risk_level') == primary.get('risk_level'):
+            self._risk_level_matches += 1
+
+        applicant = next((user_data[field] for field in ID_FIELDS if user_data.get(field) is not None), None)
+        logger.info(json.dumps({
+            'event': 'shadow_score',
+            'applicant': applicant,
+            'primary_version': primary.get('model_version'),
+            'candidate_version': getattr(candidate, 'model_version', None),
+            'primary_score': primary['credit_score'],
+            'candidate_score': candidate_result['credit_score'],
+            'difference': diff,
+            'primary_risk_level': primary.get('risk_level'),
+            'candidate_risk_level': candidate_result.get('risk_level')
+        }, default=str))
+
+    def stats(self) -> Dict:
+        scored = self.counts['shadow_scored']
+        return {
+            'candidate_version': getattr(self.candidate, 'model_version', None),
+            'candidate_share': self.candidate_share,
+            'shadow': self.shadow,
+            **self.counts,
+            'shadow_mean_abs_difference': self._abs_diff_total / scored if scored else None,
+            'shadow_max_abs_difference': self._max_abs_diff if scored else None,
+            'shadow_risk_level_agreement': self._risk_level_matches / scored if scored else None
+        }
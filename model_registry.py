@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Shared home for warm model objects
+# Before this every request built its own scoring object and the one
+# loaded at startup was thrown away
+
+
+class ModelRegistry:
+    """
+    Thread-safe, process-wide registry of loaded models
+    Each entry is loaded once per worker on first use and then the same
+    object is handed to every caller
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """
+        Register a loader for a model name
+        The loader is only called when the model is first requested
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._models.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Return the loaded model, loading it on first use
+        """
+        # Fast path without the lock - dict reads are atomic
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Another thread might have loaded it while we waited
+            model = self._models.get(name)
+            if model is None:
+                if name not in self._loaders:
+                    raise KeyError(f"No model registered under '{name}'")
+                model = self._loaders[name]()
+                self._models[name] = model
+            return model
+
+    def is_loaded(self, name: str) -> bool:
+        """
+        Check whether a model has already been loaded
+        """
+        return name in self._models
+
+    def reload(self, name: str) -> Any:
+        """
+        Load a fresh copy of a model and replace the current one
+        Requests already holding the old object keep using it
+        """
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"No model registered under '{name}'")
+            model = self._loaders[name]()
+            self._models[name] = model
+            return model
+
+    def swap(self, name: str, model: Any) -> Any:
+        """
+        Replace the loaded model with one the caller already loaded
+        Returns the old one (None if nothing was loaded). Requests that
+        already hold the old object finish with it, so nothing is dropped
+        """
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"No model registered under '{name}'")
+            old = self._models.get(name)
+            self._models[name] = model
+            return old
+
+    def clear(self):
+        """
+        Drop all loaded models (loaders stay registered)
+        """
+        with self._lock:
+            self._models.clear()
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWarmup:
+    """
+    Runs a warmup coroutine as a background task after startup
+    The server can take requests (and answer readiness probes with "not
+    ready") while the models load, instead of blocking startup on them
+    """
+
+    def __init__(self, name: str, warm_up: Callable[[], Awaitable[Any]]):
+        self.name = name
+        self.warm_up = warm_up
+        self.ready = False
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        Schedule the warmup (call from the running event loop)
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        started = time.perf_counter()
+        try:
+            await self.warm_up()
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Warmup of {self.name} failed: {e}")
+            return
+        self.seconds = time.perf_counter() - started
+        self.ready = True
+
+    async def wait(self):
+        """
+        Wait for the warmup to finish (returns straight away if it never started)
+        """
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def status(self) -> Dict:
+        return {'ready': self.ready, 'error': self.error, 'seconds': self.seconds}
+
+
+# Create registry instance
+# This is shared by everything running in the worker process
+registry = ModelRegistry()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Versioned model artifacts
+# Layout:
+#   <root>/manifest.json              current version + history per model
+#   <root>/<model>/<version>/*.joblib one file per artifact
+# The version id is a hash of the artifact files, so publishing the same
+# model twice gives the same version. Artifacts are written uncompressed,
+# which lets joblib memory-map the NumPy arrays inside them on load - every
+# worker maps the same pages instead of holding its own copy
+# Version directories are never modified once published; switching versions
+# only rewrites the manifest, and that's done with an atomic os.replace
+
+MANIFEST_FILE = "manifest.json"
+
+# Names the models are published under
+ENHANCED_CREDIT_MODEL = "enhanced_credit_model"
+
+
+def _hash_directory(directory: str) -> str:
+    """
+    sha256 over every file name and its contents
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(directory, name), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """
+    Directory of published model versions plus a manifest
+    Meant for one publisher at a time (the training job) and any number
+    of readers (the API workers)
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+
+    def _read_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"models": {}}
+
+    def _write_manifest(self, manifest: Dict):
+        # Write next to the manifest and rename over it, so readers see
+        # either the old manifest or the new one, never half of one
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".manifest-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def version_path(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, version)
+
+    def publish(self, name: str, artifacts: Dict[str, Any], metadata: Optional[Dict] = None,
+                activate: bool = True) -> str:
+        """
+        Save a new version of a model and (by default) make it current
+        artifacts maps artifact names to objects, metadata must be JSON-able
+        Returns the version id
+        """
+        import joblib
+
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".staging-")
+        try:
+            for key, artifact in artifacts.items():
+                # No compression - compressed arrays can't be memory-mapped
+                joblib.dump(artifact, os.path.join(staging, f"{key}.joblib"))
+            version = _hash_directory(staging)[:16]
+
+            target = self.version_path(name, version)
+            if os.path.exists(target):
+                # Identical artifacts were published before
+                shutil.rmtree(staging)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        manifest = self._read_manifest()
+        entry = manifest["models"].setdefault(name, {"current": None, "versions": {}})
+        entry["versions"].setdefault(version, {
+            "created_at": datetime.now().isoformat(),
+            "artifacts": sorted(artifacts),
+            "metadata": metadata or {}
+        })
+        if activate:
+            entry["current"] = version
+        self._write_manifest(manifest)
+        return version
+
+    def activate(self, name: str, version: str):
+        """
+        Make an already published version current (also used for rollbacks)
+        """
+        manifest = self._read_manifest()
+        entry = manifest["models"].get(name)
+        if entry is None or version not in entry["versions"]:
+            raise KeyError(f"No version '{version}' of model '{name}'")
+        entry["current"] = version
+        self._write_manifest(manifest)
+
+    def current_version(self, name: str) -> Optional[str]:
+        entry = self._read_manifest()["models"].get(name)
+        return entry["current"] if entry else None
+
+    def versions(self, name: str) -> Dict:
+        entry = self._read_manifest()["models"].get(name)
+        return entry["versions"] if entry else {}
+
+    def load(self, name: str, version: Optional[str] = None, mmap: bool = True,
+             skip: Iterable[str] = ()) -> Tuple[str, Dict[str, Any], Dict]:
+        """
+        Load a version (the current one by default)
+        Returns (version, artifacts, metadata). With mmap the NumPy arrays
+        come back as read-only memory maps of the published files
+        skip leaves artifacts out, e.g. an estimator that isn't needed
+        """
+        if version is None:
+            version = self.current_version(name)
+            if version is None:
+                raise KeyError(f"No published version of model '{name}'")
+        info = self.versions(name).get(version)
+        if info is None:
+            raise KeyError(f"No version '{version}' of model '{name}'")
+
+        import joblib
+
+        path = self.version_path(name, version)
+        artifacts = {
+            key: joblib.load(os.path.join(path, f"{key}.joblib"), mmap_mode="r" if mmap else None)
+            for key in info["artifacts"] if key not in skip
+        }
+        return version, artifacts, info["metadata"]
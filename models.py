@@ -0,0 +1,198 @@
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, JSON, String
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from database import Base
+
+# Database models
+# Scoring decisions are append-only audit records - never updated
+
+
+class CreditScoreDecision(Base):
+    """
+    Every credit score the API hands out
+    """
+    __tablename__ = "credit_score_decisions"
+
+    id = Column(Integer, primary_key=True)
+    applicant_id = Column(String(64), index=True)
+    credit_score = Column(Float, nullable=False)
+    model_version = Column(String(64))
+    features = Column(JSON)  # The model inputs the score was based on
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class FraudDecision(Base):
+    """
+    Every fraud check the API runs
+    """
+    __tablename__ = "fraud_decisions"
+
+    id = Column(Integer, primary_key=True)
+    transaction_id = Column(String(64), index=True)
+    account_id = Column(String(64), index=True)
+    fraud_probability = Column(Float, nullable=False)
+    is_suspicious = Column(Boolean, nullable=False)
+    risk_level = Column(String(16), nullable=False)
+    model_version = Column(String(64))
+    features = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+# Customer profiles - everything the scorers need in user_data
+# The child tables are always read per customer in date order, so each one
+# has a (customer_id, date) index that also carries the columns we read
+# (postgresql_include), letting Postgres answer from the index alone
+
+
+class Customer(Base):
+    """
+    One applicant/account holder and their scalar scoring inputs
+    """
+    __tablename__ = "customers"
+
+    id = Column(Integer, primary_key=True)
+    annual_income = Column(Float, default=0)
+    age = Column(Integer)
+    years_of_credit_history = Column(Float, default=0)
+    num_accounts = Column(Integer, default=0)
+    payment_history_score = Column(Float, default=0)
+    debt_to_income_ratio = Column(Float, default=0)
+    num_recent_inquiries = Column(Integer, default=0)
+    credit_utilization = Column(Float, default=0)
+    savings_amount = Column(Float, default=0)
+    total_credit = Column(Float, default=0)
+    used_credit = Column(Float, default=0)
+    on_time_payment_ratio = Column(Float, default=0)
+    savings_frequency = Column(Float, default=0)
+    overdraft_frequency = Column(Float, default=0)
+    mobile_app_usage_score = Column(Float, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    income_records = relationship("IncomeRecord", back_populates="customer",
+                                  order_by="IncomeRecord.period", cascade="all, delete-orphan")
+    employment_records = relationship("EmploymentRecord", back_populates="customer",
+                                      order_by="EmploymentRecord.start_date", cascade="all, delete-orphan")
+    payment_history = relationship("PaymentHistory", back_populates="customer",
+                                   uselist=False, cascade="all, delete-orphan")
+    transactions = relationship("Transaction", back_populates="customer",
+                                order_by="Transaction.occurred_at", cascade="all, delete-orphan")
+
+
+class IncomeRecord(Base):
+    """
+    Monthly income
+    """
+    __tablename__ = "income_records"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    period = Column(Date, nullable=False)
+    amount = Column(Float, nullable=False)
+
+    customer = relationship("Customer", back_populates="income_records")
+
+    __table_args__ = (
+        Index("ix_income_records_customer_period", "customer_id", "period",
+              postgresql_include=["amount"]),
+    )
+
+
+class EmploymentRecord(Base):
+    """
+    One job in a customer's employment history
+    """
+    __tablename__ = "employment_records"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    employer = Column(String(255))
+    start_date = Column(Date)
+    duration_years = Column(Float, nullable=False, default=0)
+
+    customer = relationship("Customer", back_populates="employment_records")
+
+    __table_args__ = (
+        Index("ix_employment_records_customer_start", "customer_id", "start_date",
+              postgresql_include=["employer", "duration_years"]),
+    )
+
+
+class PaymentHistory(Base):
+    """
+    Running repayment counts (one row per customer)
+    """
+    __tablename__ = "payment_histories"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"),
+                         nullable=False, unique=True)
+    on_time = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+    customer = relationship("Customer", back_populates="payment_history")
+
+
+class Transaction(Base):
+    """
+    Account transactions
+    amount is signed: money in > 0, money out < 0
+    """
+    __tablename__ = "transactions"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    amount = Column(Float, nullable=False)
+    category = Column(String(64))
+    occurred_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    customer = relationship("Customer", back_populates="transactions")
+
+    __table_args__ = (
+        Index("ix_transactions_customer_occurred", "customer_id", "occurred_at",
+              postgresql_include=["amount", "category"]),
+    )
+
+
+# Dashboard rollups
+# Kept up to date from the transactions table on every flush (see
+# dashboard_rollups.py), so the dashboard reads one row per month instead
+# of scanning years of transactions
+
+
+class MonthlyBalance(Base):
+    """
+    Money in/out per customer per month
+    """
+    __tablename__ = "monthly_balances"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # First day of the month
+    inflow = Column(Float, nullable=False, default=0)
+    outflow = Column(Float, nullable=False, default=0)  # Positive total of money out
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+
+class CategorySpend(Base):
+    """
+    Money out per customer, month and category
+    """
+    __tablename__ = "category_spend"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    category = Column(String(64), primary_key=True)
+    amount = Column(Float, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+
+class DashboardVersion(Base):
+    """
+    Bumped whenever a customer's rollups change - the dashboard ETags
+    are built from it, so a conditional GET is one primary key lookup
+    """
+    __tablename__ = "dashboard_versions"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,201 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, selectinload
+
+from models import Customer, EmploymentRecord, IncomeRecord, PaymentHistory, Transaction
+from score_cache import ScoreCache
+
+# Assembles the user_data dict the scorers expect from the profile tables
+# A batch of customers always costs the same five queries (customers plus
+# one selectinload per related table), however many customers are asked for
+# Assembled profiles sit in a bounded LRU that's invalidated whenever a
+# session commits changes to a customer or any of their history rows
+
+# Scalar Customer columns copied straight into user_data
+SCALAR_COLUMNS = (
+    'annual_income',
+    'age',
+    'years_of_credit_history',
+    'num_accounts',
+    'payment_history_score',
+    'debt_to_income_ratio',
+    'num_recent_inquiries',
+    'credit_utilization',
+    'savings_amount',
+    'total_credit',
+    'used_credit',
+    'on_time_payment_ratio',
+    'savings_frequency',
+    'overdraft_frequency',
+    'mobile_app_usage_score'
+)
+
+# Only this much transaction history goes into a profile
+PROFILE_TRANSACTION_DAYS = int(os.getenv("PROFILE_TRANSACTION_DAYS", "365"))
+
+_CHILD_MODELS = (IncomeRecord, EmploymentRecord, PaymentHistory, Transaction)
+_CHANGED_KEY = "changed_customer_ids"
+
+
+def _profile_query(customer_ids: List[int]):
+    since = datetime.utcnow() - timedelta(days=PROFILE_TRANSACTION_DAYS)
+    return (
+        select(Customer)
+        .where(Customer.id.in_(customer_ids))
+        .options(
+            selectinload(Customer.income_records),
+            selectinload(Customer.employment_records),
+            selectinload(Customer.payment_history),
+            selectinload(Customer.transactions.and_(Transaction.occurred_at >= since))
+        )
+    )
+
+
+def _to_user_data(customer: Customer) -> Dict:
+    """
+    Flatten a loaded Customer into the scorers' user_data format
+    Empty columns are left out so the scorers' own defaults apply
+    """
+    user_data = {
+        name: getattr(customer, name) for name in SCALAR_COLUMNS
+        if getattr(customer, name) is not None
+    }
+    user_data['customer_id'] = customer.id
+    user_data['applicant_id'] = customer.id
+    user_data['income_history'] = [record.amount for record in customer.income_records]
+    user_data['employment_history'] = [
+        {'employer': job.employer, 'duration_years': job.duration_years}
+        for job in customer.employment_records
+    ]
+    payments = customer.payment_history
+    user_data['payment_history'] = (
+        {'on_time': payments.on_time, 'late': payments.late, 'total': payments.total}
+        if payments is not None else {}
+    )
+    user_data['transaction_history'] = [
+        {
+            'amount': transaction.amount,
+            'category': transaction.category,
+            'timestamp': transaction.occurred_at.isoformat()
+        }
+        for transaction in customer.transactions
+    ]
+    return user_data
+
+
+class ProfileService:
+    """
+    Read-through cache in front of profile assembly
+    Works with both sync Sessions and AsyncSessions
+    Cached profiles are shared between callers - treat them as read-only
+    """
+
+    def __init__(self, cache: Optional[ScoreCache] = None):
+        self.cache = cache
+
+    @staticmethod
+    def _key(customer_id: int) -> str:
+        return f"profile:{customer_id}"
+
+    def _lookup(self, customer_ids: List[int]):
+        """
+        Split the ids into cached profiles and ids that need loading
+        """
+        if self.cache is None:
+            return {}, list(customer_ids)
+        cached = self.cache.get_many([self._key(customer_id) for customer_id in customer_ids])
+        found = {}
+        missing = []
+        for customer_id, profile in zip(customer_ids, cached):
+            if profile is None:
+                missing.append(customer_id)
+            else:
+                found[customer_id] = profile
+        return found, missing
+
+    def _store(self, customers: Iterable[Customer]) -> Dict[int, Dict]:
+        profiles = {customer.id: _to_user_data(customer) for customer in customers}
+        if self.cache is not None and profiles:
+            self.cache.set_many({self._key(customer_id): profile
+                                 for customer_id, profile in profiles.items()})
+        return profiles
+
+    def get_profiles(self, session: Session, customer_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Profiles by customer id, unknown ids are left out
+        """
+        profiles, missing = self._lookup(list(dict.fromkeys(customer_ids)))
+        if missing:
+            customers = session.execute(_profile_query(missing)).scalars().all()
+            profiles.update(self._store(customers))
+        return profiles
+
+    async def get_profiles_async(self, session, customer_ids: List[int]) -> Dict[int, Dict]:
+        """
+        get_profiles for an AsyncSession
+        """
+        profiles, missing = self._lookup(list(dict.fromkeys(customer_ids)))
+        if missing:
+            result = await session.execute(_profile_query(missing))
+            profiles.update(self._store(result.scalars().all()))
+        return profiles
+
+    def get_profile(self, session: Session, customer_id: int) -> Optional[Dict]:
+        return self.get_profiles(session, [customer_id]).get(customer_id)
+
+    async def get_profile_async(self, session, customer_id: int) -> Optional[Dict]:
+        return (await self.get_profiles_async(session, [customer_id])).get(customer_id)
+
+    def invalidate(self, customer_ids: Iterable[int]):
+        """
+        Drop cached profiles
+        Needed by hand after Core-level writes (insert()/update() statements),
+        which bypass the ORM events below
+        """
+        if self.cache is not None:
+            self.cache.delete_many([self._key(customer_id) for customer_id in customer_ids])
+
+
+def build_profile_cache() -> Optional[ScoreCache]:
+    """
+    PROFILE_CACHE_SIZE (0 turns caching off) and PROFILE_CACHE_TTL_SECONDS
+    The TTL bounds staleness across workers, since invalidation is per process
+    """
+    max_entries = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+    if max_entries <= 0:
+        return None
+    return ScoreCache(max_entries, float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60")))
+
+
+profile_service = ProfileService(build_profile_cache())
+
+
+# Invalidation on write
+# Changed customer ids are collected at flush time (new/dirty/deleted still
+# hold the objects then) and dropped from the cache once the commit lands,
+# so a concurrent reader can't re-cache the old rows in between
+# AsyncSessions flush through a sync Session, so this covers them too
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_customers(session, flush_context):
+    changed = session.info.setdefault(_CHANGED_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Customer):
+            changed.add(obj.id)
+        elif isinstance(obj, _CHILD_MODELS) and obj.customer_id is not None:
+            changed.add(obj.customer_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_customers(session):
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if changed:
+        profile_service.invalidate(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_customers(session):
+    session.info.pop(_CHANGED_KEY, None)
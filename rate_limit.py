@@ -0,0 +1,288 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from auth import decode_token
+from metrics import metrics_registry
+
+# Per-client rate limiting (Settings.RATE_LIMIT_*)
+# Clients are identified by the subject of a valid bearer token and fall
+# back to their IP - never by a credential we haven't verified, or a new
+# made-up key per request would get a fresh bucket every time. Each
+# request costs budget by route, so one client sending batch scoring
+# calls can't starve everyone else, and health probes cost nothing
+#
+# Two backends:
+# - TokenBucketLimiter: in-process, O(1) per request. Each worker has its
+#   own buckets, so with N workers a client really gets N x the limit
+# - RedisSlidingWindowLimiter: shared by every worker, one round trip per
+#   request (a Lua script). Set RATE_LIMIT_REDIS_URL for multi-worker
+#   deployments
+#
+# Over the limit -> 429 with Retry-After. If Redis is down requests are
+# let through - the limiter shouldn't take scoring down with it
+
+logger = logging.getLogger(__name__)
+
+# Budget per request by path, everything else costs DEFAULT_ROUTE_COST
+# Override/extend with RATE_LIMIT_ROUTE_COSTS='{"/some/path": 5}'
+DEFAULT_ROUTE_COST = 1
+DEFAULT_ROUTE_COSTS = {
+    "/health": 0,
+    "/ready": 0,
+    "/metrics": 0,
+    "/predict_credit_score/batch": 10,
+    "/detect_fraud/batch": 10,
+    "/evaluate_business_risk/batch": 10,
+    "/enhanced_credit_score/batch": 20,
+    "/enhanced_credit_score": 2
+}
+
+RATE_LIMITED_TOTAL = metrics_registry.counter(
+    "rate_limited_requests_total", "Requests rejected by the rate limiter", ("route",))
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds, 0 when allowed
+
+
+class RouteCosts:
+    """
+    Exact path -> cost lookup (the middleware runs before routing, so
+    there are no route templates yet - unlisted paths cost the default)
+    """
+
+    def __init__(self, costs: Optional[Dict[str, float]] = None, default: float = DEFAULT_ROUTE_COST):
+        self.costs = {path.rstrip("/") or "/": cost for path, cost in (costs or {}).items()}
+        self.default = default
+
+    def route(self, path: str) -> Optional[str]:
+        path = path.rstrip("/") or "/"
+        return path if path in self.costs else None
+
+    def cost(self, path: str) -> float:
+        return self.costs.get(path.rstrip("/") or "/", self.default)
+
+
+def client_key(headers: Mapping[str, str], remote_address: Optional[str]) -> str:
+    """
+    Who is calling: the subject of a valid bearer token, otherwise the IP
+    headers needs lowercase .get() lookups (Flask's headers or a dict)
+    """
+    authorization = headers.get("authorization") or ""
+    if authorization.lower().startswith("bearer "):
+        claims = decode_token(authorization[7:].strip())
+        if claims is not None:
+            return f"sub:{claims['sub']}"
+    return f"ip:{remote_address or 'unknown'}"
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets, one per client
+    Buckets refill at per_minute / 60 tokens a second up to burst, and are
+    only refilled when they're used, so a request is a dict lookup and a
+    bit of arithmetic. Least recently used clients are dropped past
+    max_clients (a full bucket is the same as no bucket anyway)
+    """
+
+    blocking = False
+
+    def __init__(self, per_minute: int, burst: Optional[int] = None, max_clients: int = 100000):
+        self.limit = int(per_minute)
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: float = 1) -> RateLimitDecision:
+        # A request costing more than a full bucket could never get through
+        cost = min(cost, self.capacity)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return RateLimitDecision(True, self.limit, int(bucket[0]), 0.0)
+            return RateLimitDecision(False, self.limit, int(bucket[0]), (cost - bucket[0]) / self.rate)
+
+
+# Sliding window counter: this window's count plus the previous window's,
+# weighted by how much of it is still inside the sliding window
+# KEYS: current window, previous window
+# ARGV: limit, window length (ms), time into the current window (ms), cost
+# Returns {allowed, used, retry after (ms)}
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local weight = (window - elapsed) / window
+local used = previous * weight + current
+
+if used + cost > limit then
+    local retry = window - elapsed
+    if previous > 0 and current + cost <= limit then
+        -- enough of the previous window slides out before this one ends
+        retry = (weight - (limit - current - cost) / previous) * window
+    end
+    return {0, math.floor(used), math.ceil(retry)}
+end
+
+redis.call('INCRBY', KEYS[1], cost)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, math.floor(used + cost), 0}
+"""
+
+
+class RedisSlidingWindowLimiter:
+    """
+    Sliding window shared by every worker through Redis
+    One EVALSHA per request (redis-py falls back to EVAL the first time
+    a server hasn't seen the script)
+    """
+
+    blocking = True  # sync client - the ASGI middleware calls it off the event loop
+
+    def __init__(self, client, per_minute: int, window_seconds: float = 60.0, prefix: str = "rate_limit:"):
+        self.client = client
+        self.limit = int(per_minute)
+        self.window_ms = int(window_seconds * 1000)
+        self.prefix = prefix
+        self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._last_error_logged = 0.0
+
+    def acquire(self, key: str, cost: float = 1) -> RateLimitDecision:
+        cost = int(math.ceil(min(cost, self.limit)))
+        now_ms = int(time.time() * 1000)
+        window, elapsed = divmod(now_ms, self.window_ms)
+        keys = [f"{self.prefix}{key}:{window}", f"{self.prefix}{key}:{window - 1}"]
+        try:
+            allowed, used, retry_ms = self._script(keys=keys, args=[self.limit, self.window_ms, elapsed, cost])
+        except Exception as e:
+            # Fail open, and don't log every single request while Redis is out
+            if time.monotonic() - self._last_error_logged > 60:
+                self._last_error_logged = time.monotonic()
+                logger.warning(f"Rate limiter unavailable, letting requests through: {e}")
+            return RateLimitDecision(True, self.limit, self.limit, 0.0)
+        remaining = max(0, self.limit - int(used))
+        return RateLimitDecision(bool(allowed), self.limit, remaining, int(retry_ms) / 1000)
+
+
+def build_rate_limiter(settings):
+    """
+    Build the limiter from the app settings (config.py)
+    RATE_LIMIT_PER_MINUTE (0 turns limiting off), RATE_LIMIT_BURST (token
+    bucket size, default one minute's worth) and RATE_LIMIT_REDIS_URL
+    (shared sliding window instead of per-worker buckets)
+    """
+    if settings.RATE_LIMIT_PER_MINUTE <= 0:
+        return None
+    if settings.RATE_LIMIT_REDIS_URL:
+        import redis
+        return RedisSlidingWindowLimiter(redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL),
+                                         settings.RATE_LIMIT_PER_MINUTE)
+    return TokenBucketLimiter(settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST)
+
+
+def build_route_costs(settings) -> RouteCosts:
+    return RouteCosts({**DEFAULT_ROUTE_COSTS, **settings.RATE_LIMIT_ROUTE_COSTS})
+
+
+def rate_limit_headers(decision: RateLimitDecision) -> Dict[str, str]:
+    headers = {
+        "X-RateLimit-Limit": str(decision.limit),
+        "X-RateLimit-Remaining": str(decision.remaining)
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+    return headers
+
+
+def check_request(limiter, route_costs: RouteCosts, path: str, headers: Mapping[str, str],
+                  remote_address: Optional[str]) -> Optional[RateLimitDecision]:
+    """
+    Charge one request - None when it's free (or limiting is off)
+    For sync servers (Flask); the ASGI middleware does the same thing
+    """
+    cost = route_costs.cost(path)
+    if limiter is None or cost <= 0:
+        return None
+    decision = limiter.acquire(client_key(headers, remote_address), cost)
+    if not decision.allowed:
+        RATE_LIMITED_TOTAL.labels(route_costs.route(path) or "other").inc()
+    return decision
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware answering over-limit requests with 429 + Retry-After
+    before they reach the app
+    The limiter is built from settings on the first request, so adding
+    the middleware doesn't read the config at import time
+    """
+
+    def __init__(self, app, settings):
+        self.app = app
+        self.settings = settings
+        self.limiter = None
+        self.route_costs: Optional[RouteCosts] = None
+        self._built = False
+
+    def _build(self):
+        self.limiter = build_rate_limiter(self.settings)
+        self.route_costs = build_route_costs(self.settings)
+        self._built = True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not self._built:
+            self._build()
+        if self.limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if self.route_costs.cost(path) <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        client = scope.get("client")
+        remote_address = client[0] if client else None
+        if self.limiter.blocking:
+            decision = await run_in_threadpool(check_request, self.limiter, self.route_costs,
+                                               path, headers, remote_address)
+        else:
+            decision = check_request(self.limiter, self.route_costs, path, headers, remote_address)
+
+        if decision.allowed:
+            await self.app(scope, receive, send)
+            return
+
+        response = JSONResponse({"detail": "Rate limit exceeded"}, status_code=429,
+                                headers=rate_limit_headers(decision))
+        await response(scope, receive, send)
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+# The same applicants get re-scored all day (dashboard, loan officers,
+# batch jobs), so cache results keyed on what actually goes into the score
+# Keys include the model version, so a model swap can never serve stale results
+# numpy is only imported by the key functions, so the API (and the profile
+# cache, which only uses ScoreCache) can import this without it
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(namespace: str, model_version: str, features, extra: str = "") -> str:
+    """
+    Stable key for one canonicalized feature vector
+    Values are hashed as float64 bytes, so 1, 1.0 and "1" all map to the same key
+    """
+    import numpy as np
+
+    vector = np.ascontiguousarray(features, dtype=np.float64) + 0.0  # -0.0 -> 0.0
+    digest = hashlib.sha256(vector.tobytes())
+    if extra:
+        digest.update(extra.encode("utf-8"))
+    return f"{namespace}:{model_version}:{digest.hexdigest()}"
+
+
+def make_cache_keys(namespace: str, model_version: str, matrix) -> List[str]:
+    """
+    One key per row of a feature matrix
+    """
+    import numpy as np
+
+    matrix = np.ascontiguousarray(matrix, dtype=np.float64) + 0.0
+    prefix = f"{namespace}:{model_version}:"
+    return [prefix + hashlib.sha256(row.tobytes()).hexdigest() for row in matrix]
+
+
+class ScoreCache:
+    """
+    Bounded in-process LRU cache with a TTL per entry
+    Cached values are shared between callers - treat them as read-only
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """
+        Look up several keys at once, None for misses
+        """
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] < now:
+                    if entry is not None:
+                        del self._entries[key]
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[1])
+        return results
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, values: Dict[str, Any]):
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys: Sequence[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._entries)
+        }
+
+
+class RedisScoreCache:
+    """
+    Redis-backed cache shared by every worker
+    One MGET per lookup and one pipelined write per batch
+    If Redis is down lookups are misses and writes are dropped - scoring
+    carries on without the cache instead of failing
+    """
+
+    def __init__(self, client, ttl_seconds: float = 300, prefix: str = "score_cache:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._last_error_logged = 0.0
+
+    def _unavailable(self, error: Exception):
+        # Don't log every single request while Redis is out
+        self.errors += 1
+        if time.monotonic() - self._last_error_logged > 60:
+            self._last_error_logged = time.monotonic()
+            logger.warning(f"Score cache unavailable, scoring without it: {error}")
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        try:
+            raw_values = self.client.mget([self.prefix + key for key in keys])
+        except Exception as e:
+            self._unavailable(e)
+            self.misses += len(keys)
+            return [None] * len(keys)
+        results = []
+        for raw in raw_values:
+            if raw is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(json.loads(raw))
+        return results
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, values: Dict[str, Any]):
+        if not values:
+            return
+        ttl = max(1, int(self.ttl_seconds))
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipeline.set(self.prefix + key, json.dumps(value), ex=ttl)
+        try:
+            pipeline.execute()
+        except Exception as e:
+            self._unavailable(e)
+
+    def delete_many(self, keys: Sequence[str]):
+        if not keys:
+            return
+        try:
+            self.client.delete(*[self.prefix + key for key in keys])
+        except Exception as e:
+            self._unavailable(e)
+
+    def clear(self):
+        # Keys carry the model version, so entries for an old model are
+        # never read again and just expire - no need to scan Redis here
+        pass
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'backend': 'redis',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'errors': self.errors
+        }
+
+
+def build_score_cache():
+    """
+    Build the cache from environment variables
+    SCORE_CACHE_SIZE (0 turns caching off), SCORE_CACHE_TTL_SECONDS and
+    SCORE_CACHE_REDIS_URL (use Redis instead of the in-process cache)
+    """
+    max_entries = int(os.getenv("SCORE_CACHE_SIZE", "10000"))
+    ttl_seconds = float(os.getenv("SCORE_CACHE_TTL_SECONDS", "300"))
+    redis_url = os.getenv("SCORE_CACHE_REDIS_URL")
+
+    if max_entries <= 0:
+        return None
+    if redis_url:
+        import redis
+        return RedisScoreCache(redis.Redis.from_url(redis_url), ttl_seconds)
+    return ScoreCache(max_entries, ttl_seconds)
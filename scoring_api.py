@@ -0,0 +1,471 @@
+import asyncio
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+from inference_executor import InferenceSaturated, InferenceUnavailable, build_executor
+from metrics import instrumented_call, merge_worker_report, watch_executor
+from model_registry import BackgroundWarmup, registry
+from request_batching import MicroBatcher
+from wire_formats import (is_table, read_batch, read_object, require_numeric_columns, respond, table_column,
+                          table_to_matrix, table_to_records)
+
+# HTTP side of credit scoring and fraud detection
+# Kept apart from credit_scoring.py so importing the API doesn't import
+# sklearn, pandas or joblib - those load with the models, in the background
+# warmup or on first use
+
+# Directory the trained models are loaded from
+MODELS_PATH = os.getenv("MODELS_PATH", "models")
+SCORING_MODEL_NAME = "credit_scoring"
+
+# Scoring endpoints live on a router so main.py can serve them too
+# JSON goes out through orjson, msgpack/Arrow on request (wire_formats.py)
+router = APIRouter(default_response_class=ORJSONResponse)
+
+def _load_scoring_system():
+    """
+    Build the scoring system and load the trained models into it
+    """
+    from credit_scoring import MshiyaneCreditScoring
+    from score_cache import build_score_cache
+
+    scoring_system = MshiyaneCreditScoring()
+    scoring_system.score_cache = build_score_cache()
+    scoring_system.load_models(MODELS_PATH)
+    return scoring_system
+
+registry.register(SCORING_MODEL_NAME, _load_scoring_system)
+
+def get_scoring_system():
+    """
+    Shared scoring system for this worker
+    """
+    return registry.get(SCORING_MODEL_NAME)
+
+# These run inside the inference pool, so they have to stay module-level
+# functions (picklable) and fetch the models from the worker's registry
+# They return (results, metrics report) - see metrics.instrumented_call
+def _warm_inference_worker():
+    registry.get(SCORING_MODEL_NAME)
+
+def _score_credit_rows(users: List[Dict]) -> Tuple[List[float], Dict]:
+    scoring_system = get_scoring_system()
+    return instrumented_call(scoring_system.score_batch, users,
+                             caches={SCORING_MODEL_NAME: scoring_system.score_cache})
+
+def _detect_fraud_rows(transactions: List[Dict]) -> Tuple[List[Dict], Dict]:
+    scoring_system = get_scoring_system()
+    return instrumented_call(scoring_system.detect_fraud_batch, transactions,
+                             caches={SCORING_MODEL_NAME: scoring_system.score_cache})
+
+# Columnar (Arrow) requests arrive as feature matrices already
+def _score_credit_features(features, utilization) -> Tuple[List[float], Dict]:
+    scoring_system = get_scoring_system()
+    return instrumented_call(scoring_system.score_features, features, utilization,
+                             caches={SCORING_MODEL_NAME: scoring_system.score_cache})
+
+def _detect_fraud_features(features) -> Tuple[List[Dict], Dict]:
+    scoring_system = get_scoring_system()
+    return instrumented_call(scoring_system.detect_fraud_features, features,
+                             caches={SCORING_MODEL_NAME: scoring_system.score_cache})
+
+def _evaluate_business_rows(businesses) -> Tuple[List[Dict], Dict]:
+    scoring_system = get_scoring_system()
+    return instrumented_call(scoring_system.evaluate_business_risk_batch, businesses,
+                             caches={SCORING_MODEL_NAME: scoring_system.score_cache})
+
+# GradientBoosting/RandomForest hold the GIL, so default to a process pool
+# Configure with SKLEARN_INFERENCE_EXECUTOR / _WORKERS / _MAX_QUEUE
+inference_executor = build_executor(
+    "SKLEARN_INFERENCE",
+    default_mode="process",
+    initializer=_warm_inference_worker
+)
+watch_executor("sklearn", inference_executor)
+
+# Micro-batching for the single-applicant endpoints
+# Window is in milliseconds - set SCORING_MAX_BATCH_SIZE=1 to turn it off
+SCORING_BATCH_WINDOW_MS = float(os.getenv("SCORING_BATCH_WINDOW_MS", "2"))
+SCORING_MAX_BATCH_SIZE = int(os.getenv("SCORING_MAX_BATCH_SIZE", "64"))
+
+# The pool can't be started while the warmup is still loading the models
+# here - forked workers would inherit the registry lock mid-load and hang -
+# so requests that arrive early wait for the warmup first
+# If the warmup failed the pool isn't started at all: every worker's
+# initializer would fail the same way and break the pool straight away
+async def _wait_for_models():
+    await warmup.wait()
+    if warmup.error is not None:
+        raise InferenceUnavailable(f"Models failed to load: {warmup.error}")
+
+async def _run_inference(fn, *args) -> List:
+    await _wait_for_models()
+    results, report = await inference_executor.run(fn, *args)
+    merge_worker_report(report)
+    return results
+
+async def _score_credit_batch(users: List[Dict]) -> List[float]:
+    return await _run_inference(_score_credit_rows, users)
+
+async def _detect_fraud_batch(transactions: List[Dict]) -> List[Dict]:
+    return await _run_inference(_detect_fraud_rows, transactions)
+
+credit_batcher = MicroBatcher(_score_credit_batch, SCORING_MAX_BATCH_SIZE, SCORING_BATCH_WINDOW_MS,
+                              fatal_errors=(InferenceSaturated,), name="credit_score")
+fraud_batcher = MicroBatcher(_detect_fraud_batch, SCORING_MAX_BATCH_SIZE, SCORING_BATCH_WINDOW_MS,
+                             fatal_errors=(InferenceSaturated,), name="fraud")
+
+# Rolling per-account fraud state lives in this (event loop) process so
+# every transaction for an account updates the same state, no matter which
+# inference worker ends up scoring it
+# With several uvicorn workers, route by account for consistent features
+# Created on first use so booting the API doesn't import numpy
+fraud_feature_store = None
+
+def _fraud_feature_store():
+    global fraud_feature_store
+    if fraud_feature_store is None:
+        from fraud_features import StreamingFraudFeatureStore
+        fraud_feature_store = StreamingFraudFeatureStore(
+            max_events_per_window=int(os.getenv("FRAUD_FEATURE_MAX_EVENTS", "128")),
+            max_accounts=int(os.getenv("FRAUD_FEATURE_MAX_ACCOUNTS", "100000"))
+        )
+    return fraud_feature_store
+
+# Every score / fraud check is written to the audit tables (models.py) by a
+# write-behind buffer started with the app - requests never wait on the DB
+# The buffer creates the two audit tables itself if they're missing, so the
+# standalone apps work without init_db
+# Set SCORING_AUDIT_ENABLED=false to run without a database
+SCORING_AUDIT_ENABLED = os.getenv("SCORING_AUDIT_ENABLED", "true").lower() == "true"
+audit_log = None
+
+def _audit_features(data: Dict, names: List[str]) -> Dict:
+    return {name: data[name] for name in names if name in data}
+
+def _audit_model_version() -> Optional[str]:
+    # Never load the models on the event loop just for an audit row
+    if not registry.is_loaded(SCORING_MODEL_NAME):
+        return None
+    return get_scoring_system().model_version
+
+def _audit_credit_scores(users: List[Dict], scores: List[float]):
+    if audit_log is None:
+        return
+    from credit_scoring import CREDIT_FEATURES
+
+    model_version = _audit_model_version()
+    for user_data, score in zip(users, scores):
+        audit_log.record_credit_score(
+            score,
+            _audit_features(user_data, CREDIT_FEATURES + ['credit_utilization']),
+            model_version,
+            applicant_id=user_data.get('applicant_id', user_data.get('user_id'))
+        )
+
+def _audit_fraud_check(transaction_data: Dict, result: Dict):
+    if audit_log is None:
+        return
+    from credit_scoring import FRAUD_FEATURES
+
+    audit_log.record_fraud_check(
+        result,
+        _audit_features(transaction_data, FRAUD_FEATURES),
+        _audit_model_version(),
+        transaction_id=transaction_data.get('transaction_id'),
+        account_id=transaction_data.get('account_id')
+    )
+
+def _table_records(table, names: List[str], matrix, id_columns: Tuple[str, ...]) -> List[Dict]:
+    """
+    Audit rows for a columnar request: the features that were scored
+    plus whichever id columns the client sent
+    """
+    records = [dict(zip(names, row)) for row in matrix.tolist()]
+    for column in id_columns:
+        if column in table.column_names:
+            for record, value in zip(records, table.column(column).to_pylist()):
+                record[column] = value
+    return records
+
+def _service_unavailable(error: InferenceSaturated) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
+# Model inputs are checked on the event loop, before they're batched:
+# a null, "abc" or NaN is the client's mistake (422), and inside a
+# micro-batch it would fail the whole model call and set off the bisect
+
+def _finite_inputs(record: Dict, names: List[str]) -> Dict:
+    """
+    Copy of the record with its model inputs as floats
+    Missing inputs are left out (the scorers default them to 0)
+    """
+    clean = dict(record)
+    invalid = []
+    for name in names:
+        if name not in record:
+            continue
+        try:
+            value = float(record[name])
+        except (TypeError, ValueError):
+            value = math.nan
+        if math.isfinite(value):
+            clean[name] = value
+        else:
+            invalid.append(name)
+    if invalid:
+        raise HTTPException(status_code=422,
+                            detail=f"{', '.join(invalid)} must be finite numbers (got {record[invalid[0]]!r})")
+    return clean
+
+def _credit_inputs(user_data: Dict) -> Dict:
+    from credit_scoring import CREDIT_FEATURES
+    return _finite_inputs(user_data, CREDIT_FEATURES + ['credit_utilization'])
+
+def _fraud_inputs(transaction_data: Dict) -> Dict:
+    from credit_scoring import FRAUD_FEATURES
+    return _finite_inputs(transaction_data, FRAUD_FEATURES)
+
+def _business_inputs(rules, businesses):
+    """
+    Check the rule fields of a business batch (rows or an Arrow table)
+    Null and NaN count as 0, like a missing field, but "abc" is a 422
+    """
+    if is_table(businesses):
+        require_numeric_columns(businesses, rules.numeric_fields)
+        return
+    for business in businesses:
+        for name in rules.numeric_fields:
+            value = business.get(name)
+            if value is None:
+                continue
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=422, detail=f"{name} must be a number (got {value!r})")
+
+def _enrich_error(error: ValueError) -> HTTPException:
+    # The feature store couldn't read a raw field (timestamp, amount, location)
+    return HTTPException(status_code=422, detail=str(error))
+
+def _require_finite_matrix(matrix, what: str):
+    import numpy as np
+    if not np.isfinite(matrix).all():
+        raise HTTPException(status_code=422, detail=f"{what} must be finite numbers (got null, NaN or inf)")
+
+async def score_applicant(user_data: Dict) -> Dict:
+    """
+    Score one applicant (also used by main.py for stored profiles)
+    Concurrent calls are coalesced into one model call
+    """
+    try:
+        # credit_scoring (the feature names) is imported by the warmup
+        await _wait_for_models()
+        user_data = _credit_inputs(user_data)
+        score = await credit_batcher.submit(user_data)
+    except InferenceSaturated as e:
+        raise _service_unavailable(e)
+    _audit_credit_scores([user_data], [score])
+    return {"credit_score": score}
+
+@router.post("/predict_credit_score")
+async def predict_credit_score(request: Request):
+    """
+    API endpoint to predict credit score
+    JSON, msgpack or a one-row Arrow table in, the Accept type out
+    """
+    user_data = await read_object(request)
+    return respond(request, await score_applicant(user_data))
+
+@router.post("/predict_credit_score/batch")
+async def predict_credit_score_batch(request: Request):
+    """
+    API endpoint to score many applicants in one call
+    An Arrow table (one column per CREDIT_FEATURES name plus
+    credit_utilization, or a "features" list column) goes straight into
+    the feature matrix without building a dict per applicant
+    """
+    users = await read_batch(request)
+    try:
+        if is_table(users):
+            # credit_scoring is imported by the warmup, not on the event loop
+            await _wait_for_models()
+            import numpy as np
+            from credit_scoring import CREDIT_FEATURES
+
+            features = table_to_matrix(users, CREDIT_FEATURES)
+            utilization = table_column(users, 'credit_utilization')
+            _require_finite_matrix(features, 'credit features')
+            _require_finite_matrix(utilization, 'credit_utilization')
+            scores = await _run_inference(_score_credit_features, features, utilization)
+            if audit_log is not None:
+                _audit_credit_scores(
+                    _table_records(users, CREDIT_FEATURES + ['credit_utilization'],
+                                   np.column_stack([features, utilization]), ('applicant_id', 'user_id')),
+                    scores
+                )
+        else:
+            await _wait_for_models()
+            users = [_credit_inputs(user_data) for user_data in users]
+            scores = await _run_inference(_score_credit_rows, users)
+            _audit_credit_scores(users, scores)
+    except InferenceSaturated as e:
+        raise _service_unavailable(e)
+    return respond(request, {"credit_scores": scores}, rows={"credit_score": scores})
+
+@router.post("/detect_fraud")
+async def detect_fraud(request: Request):
+    """
+    API endpoint to detect fraud
+    Raw transactions (with account_id) get their history features from
+    the streaming feature store, precomputed ones are used as-is
+    Concurrent requests are coalesced into one model call
+    """
+    raw_transaction = await read_object(request)
+    feature_store = _fraud_feature_store()
+    try:
+        await _wait_for_models()
+        try:
+            transaction_data, admission = feature_store.admit(raw_transaction)
+        except ValueError as e:
+            raise _enrich_error(e)
+        try:
+            transaction_data = _fraud_inputs(transaction_data)
+            result = await fraud_batcher.submit(transaction_data)
+        except BaseException:
+            # Only scored transactions stay in the account's history
+            feature_store.rollback(admission)
+            raise
+    except InferenceSaturated as e:
+        raise _service_unavailable(e)
+    _audit_fraud_check(transaction_data, result)
+    return respond(request, result)
+
+@router.post("/detect_fraud/batch")
+async def detect_fraud_batch(request: Request):
+    """
+    API endpoint to check many transactions in one call
+    Arrow tables with the FRAUD_FEATURES columns go straight into the
+    feature matrix; raw transactions (account_id, no derived features)
+    go through the feature store in order, and are taken back out of it
+    if the batch isn't scored
+    """
+    transactions = await read_batch(request)
+    if is_table(transactions) and 'account_id' in transactions.column_names:
+        from fraud_features import DERIVED_FEATURES
+        if not all(name in transactions.column_names for name in DERIVED_FEATURES):
+            transactions = table_to_records(transactions)
+
+    try:
+        if is_table(transactions):
+            await _wait_for_models()
+            from credit_scoring import FRAUD_FEATURES
+
+            features = table_to_matrix(transactions, FRAUD_FEATURES)
+            _require_finite_matrix(features, 'fraud features')
+            results = await _run_inference(_detect_fraud_features, features)
+            if audit_log is not None:
+                transactions = _table_records(transactions, FRAUD_FEATURES, features,
+                                              ('transaction_id', 'account_id'))
+        else:
+            feature_store = _fraud_feature_store()
+            raw_transactions = transactions
+            await _wait_for_models()
+            try:
+                transactions, admission = feature_store.admit_batch(raw_transactions)
+            except ValueError as e:
+                raise _enrich_error(e)
+            try:
+                transactions = [_fraud_inputs(t) for t in transactions]
+                results = await _run_inference(_detect_fraud_rows, transactions)
+            except BaseException:
+                feature_store.rollback(admission)
+                raise
+    except InferenceSaturated as e:
+        raise _service_unavailable(e)
+    if audit_log is not None:
+        for transaction_data, result in zip(transactions, results):
+            _audit_fraud_check(transaction_data, result)
+    return respond(request, {"results": results}, rows=results)
+
+@router.post("/evaluate_business_risk")
+def evaluate_business_risk(business_data: Dict, scoring_system=Depends(get_scoring_system)):
+    """
+    API endpoint to evaluate business risk
+    """
+    _business_inputs(scoring_system.business_rules, [business_data])
+    risk_evaluation = scoring_system.evaluate_business_risk(business_data)
+    return risk_evaluation
+
+@router.post("/evaluate_business_risk/batch")
+async def evaluate_business_risk_batch(request: Request):
+    """
+    API endpoint to evaluate many businesses in one call (portfolio review)
+    Arrow tables are passed on as columns, no per-business dicts
+    """
+    businesses = await read_batch(request)
+    try:
+        await _wait_for_models()
+        _business_inputs(get_scoring_system().business_rules, businesses)
+        if is_table(businesses):
+            businesses = businesses.to_pydict()
+        results = await _run_inference(_evaluate_business_rows, businesses)
+    except InferenceSaturated as e:
+        raise _service_unavailable(e)
+    return respond(request, {"results": results}, rows=results)
+
+async def _warm_up():
+    """
+    Load the models off the event loop, then start the inference pool
+    so its workers start warm
+    """
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, registry.get, SCORING_MODEL_NAME)
+    inference_executor.start()
+
+warmup = BackgroundWarmup(SCORING_MODEL_NAME, _warm_up)
+
+@router.on_event("startup")
+def load_models():
+    """
+    Load models in the background so the first request doesn't pay for it
+    and the server starts answering (and reporting not-ready) straight away
+    """
+    warmup.start()
+
+@router.on_event("startup")
+async def start_audit_log():
+    """
+    Start flushing audit rows in the background
+    Imported here so the scoring module itself doesn't need a database
+    """
+    global audit_log
+    if SCORING_AUDIT_ENABLED and audit_log is None:
+        from scoring_audit import build_audit_buffer
+        audit_log = build_audit_buffer()
+        await audit_log.start()
+
+@router.on_event("shutdown")
+def release_models():
+    """
+    Release models at shutdown
+    Used to save a fresh (untrained) instance here, which overwrote
+    the trained models on disk every time the server stopped
+    """
+    warmup.cancel()
+    inference_executor.shutdown()
+    registry.clear()
+
+@router.on_event("shutdown")
+async def stop_audit_log():
+    """
+    Write out whatever audit rows are still buffered
+    """
+    global audit_log
+    if audit_log is not None:
+        await audit_log.stop()
+        audit_log = None
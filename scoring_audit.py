@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import math
+import os
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+
+from database import Base, get_async_sessionmaker
+from models import CreditScoreDecision, FraudDecision
+
+# Write-behind audit log for scoring decisions
+# Requests only append to an in-memory buffer; a background task writes
+# the rows in bulk (one executemany INSERT per table and one commit per
+# flush) every flush_rows rows or flush_interval_ms, whichever comes first
+# If a flush fails because of the data (not the connection), the batch is
+# split in halves and retried so one bad row can't hold up the rest - a row
+# that still fails on its own is dead-lettered (logged, counted, dropped)
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLES = [CreditScoreDecision.__table__, FraudDecision.__table__]
+ID_LENGTH = CreditScoreDecision.__table__.c.applicant_id.type.length
+
+# The database being down or unreachable - keep the rows for the next flush
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, DisconnectionError,
+                    OSError, asyncio.TimeoutError)
+
+
+def _audit_id(value) -> Optional[str]:
+    # Ids come straight from the request, clip them to the column size
+    if value is None:
+        return None
+    return str(value)[:ID_LENGTH]
+
+
+def _json_safe(value: Any) -> Any:
+    # Features go into a JSON column: no bytes (msgpack), no NaN/inf
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode('utf-8', errors='replace')
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    try:
+        return _json_safe(value.item())  # numpy scalars
+    except (AttributeError, ValueError):
+        return str(value)
+
+
+class AuditWriteBuffer:
+    """
+    Buffers audit rows and flushes them to the database in bulk
+    record() never blocks and never touches the database
+    If the database falls behind, at most max_pending rows are kept and
+    anything beyond that is dropped (and counted) rather than slowing
+    down scoring
+    """
+
+    def __init__(self, session_factory=None, flush_rows: int = 500,
+                 flush_interval_ms: float = 250, max_pending: int = 100000):
+        self.session_factory = session_factory or get_async_sessionmaker()
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self.dead_letters = deque(maxlen=100)  # The last few rows we gave up on
+        self._tables_ready = False
+        self._pending: Dict[type, List[Dict]] = defaultdict(list)
+        self._pending_count = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, model: type, row: Dict):
+        """
+        Queue one row for the model's table
+        """
+        if self._pending_count >= self.max_pending:
+            self.dropped += 1
+            return
+        row.setdefault('created_at', datetime.utcnow())
+        self._pending[model].append(row)
+        self._pending_count += 1
+        if self._pending_count >= self.flush_rows and self._wakeup is not None:
+            self._wakeup.set()
+
+    def record_credit_score(self, credit_score: float, features: Dict,
+                            model_version: str, applicant_id=None):
+        self.record(CreditScoreDecision, {
+            'applicant_id': _audit_id(applicant_id),
+            'credit_score': credit_score,
+            'model_version': _audit_id(model_version),
+            'features': _json_safe(features)
+        })
+
+    def record_fraud_check(self, result: Dict, features: Dict, model_version: str,
+                           transaction_id=None, account_id=None):
+        self.record(FraudDecision, {
+            'transaction_id': _audit_id(transaction_id),
+            'account_id': _audit_id(account_id),
+            'fraud_probability': result['fraud_probability'],
+            'is_suspicious': result['is_suspicious'],
+            'risk_level': result['risk_level'],
+            'model_version': _audit_id(model_version),
+            'features': _json_safe(features)
+        })
+
+    async def start(self):
+        """
+        Start the background flush task (call from the running event loop)
+        """
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        Stop the flush task and write whatever is still buffered
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """
+        Write everything buffered so far in one transaction
+        Falls back to bisecting each table's rows if that transaction fails
+        """
+        if not self._pending_count:
+            return
+
+        batch, self._pending = self._pending, defaultdict(list)
+        count, self._pending_count = self._pending_count, 0
+        try:
+            await self._ensure_tables()
+            async with self.session_factory() as session:
+                for model, rows in batch.items():
+                    await session.execute(insert(model), rows)
+                await session.commit()
+            self.written += count
+            return
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"Failed to write {count} audit rows: {e}")
+            self._requeue(batch)
+            return
+        except Exception as e:
+            logger.warning(f"Failed to write {count} audit rows, splitting the batch: {e}")
+
+        models = list(batch)
+        for n, model in enumerate(models):
+            chunks = [batch[model]]
+            while chunks:
+                rows = chunks.pop()
+                try:
+                    await self._insert(model, rows)
+                    self.written += len(rows)
+                except TRANSIENT_ERRORS as e:
+                    # Lost the database half way - keep what's left for later
+                    logger.error(f"Failed to write audit rows: {e}")
+                    rest = {model: rows + [r for c in reversed(chunks) for r in c]}
+                    rest.update((m, batch[m]) for m in models[n + 1:])
+                    self._requeue(rest)
+                    return
+                except Exception as e:
+                    if len(rows) == 1:
+                        self._dead_letter(model, rows[0], e)
+                    else:
+                        mid = len(rows) // 2
+                        chunks.append(rows[mid:])
+                        chunks.append(rows[:mid])
+
+    async def _ensure_tables(self):
+        # The standalone apps never run init_db, so create the audit
+        # tables on the first flush if they're missing
+        if self._tables_ready:
+            return
+        async with self.session_factory() as session:
+            conn = await session.connection()
+            await conn.run_sync(lambda sync_conn: Base.metadata.create_all(
+                sync_conn, tables=AUDIT_TABLES))
+            await session.commit()
+        self._tables_ready = True
+
+    async def _insert(self, model: type, rows: List[Dict]):
+        async with self.session_factory() as session:
+            await session.execute(insert(model), rows)
+            await session.commit()
+
+    def _requeue(self, batch: Dict[type, List[Dict]]):
+        # Put them back for the next flush, keeping within max_pending
+        for model, rows in batch.items():
+            room = self.max_pending - self._pending_count
+            kept = rows[:max(0, room)]
+            self._pending[model][:0] = kept
+            self._pending_count += len(kept)
+            self.dropped += len(rows) - len(kept)
+
+    def _dead_letter(self, model: type, row: Dict, error: Exception):
+        self.dead_lettered += 1
+        self.dead_letters.append((model.__tablename__, row))
+        logger.error(f"Dropping audit row for {model.__tablename__} "
+                     f"that can't be written: {error}")
+
+    def stats(self) -> Dict:
+        return {
+            'pending': self._pending_count,
+            'written': self.written,
+            'dropped': self.dropped,
+            'dead_lettered': self.dead_lettered
+        }
+
+
+def build_audit_buffer() -> AuditWriteBuffer:
+    """
+    Build the buffer from environment variables
+    SCORING_AUDIT_FLUSH_ROWS, SCORING_AUDIT_FLUSH_MS and SCORING_AUDIT_MAX_PENDING
+    """
+    return AuditWriteBuffer(
+        flush_rows=int(os.getenv("SCORING_AUDIT_FLUSH_ROWS", "500")),
+        flush_interval_ms=float(os.getenv("SCORING_AUDIT_FLUSH_MS", "250")),
+        max_pending=int(os.getenv("SCORING_AUDIT_MAX_PENDING", "100000"))
+    )
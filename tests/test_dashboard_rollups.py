@@ -0,0 +1,172 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import Session
+
+import dashboard_rollups  # noqa: F401 - registers the after_flush listener
+from dashboard_rollups import month_start, rebuild_rollups
+from database import Base
+from models import CategorySpend, Customer, DashboardVersion, MonthlyBalance, Transaction
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bank.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([Customer(id=1), Customer(id=2)])
+        session.commit()
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def session(db_url):
+    engine = create_engine(db_url)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _balances(session):
+    return {(row.customer_id, row.month): (row.inflow, row.outflow, row.transaction_count)
+            for row in session.scalars(select(MonthlyBalance))}
+
+
+def _categories(session):
+    return {(row.customer_id, row.month, row.category): (row.amount, row.transaction_count)
+            for row in session.scalars(select(CategorySpend))}
+
+
+def _versions(session):
+    return {row.customer_id: row.version for row in session.scalars(select(DashboardVersion))}
+
+
+JAN, FEB = date(2026, 1, 1), date(2026, 2, 1)
+
+
+def test_flushes_keep_the_rollups_up_to_date(session):
+    salary = Transaction(customer_id=1, amount=100.0, occurred_at=datetime(2026, 1, 5))
+    food = Transaction(customer_id=1, amount=-30.0, category='food', occurred_at=datetime(2026, 1, 10))
+    rent = Transaction(customer_id=1, amount=-20.0, category='rent', occurred_at=datetime(2026, 2, 1))
+    session.add_all([salary, food, rent, Transaction(customer_id=2, amount=-5.0, occurred_at=datetime(2026, 2, 3))])
+    session.commit()
+    assert _balances(session) == {(1, JAN): (100.0, 30.0, 2), (1, FEB): (0.0, 20.0, 1), (2, FEB): (0.0, 5.0, 1)}
+    assert _categories(session) == {(1, JAN, 'food'): (30.0, 1), (1, FEB, 'rent'): (20.0, 1),
+                                    (2, FEB, 'uncategorized'): (5.0, 1)}
+    assert _versions(session) == {1: 1, 2: 1}
+
+    # An update moves the old values out and the new ones in
+    food.amount, food.category = -50.0, 'groceries'
+    session.commit()
+    assert _balances(session)[(1, JAN)] == (100.0, 50.0, 2)
+    assert _categories(session)[(1, JAN, 'food')] == (0.0, 0)
+    assert _categories(session)[(1, JAN, 'groceries')] == (50.0, 1)
+    assert _versions(session) == {1: 2, 2: 1}
+
+    session.delete(rent)
+    session.commit()
+    assert _balances(session)[(1, FEB)] == (0.0, 0.0, 0)
+    assert _versions(session) == {1: 3, 2: 1}
+
+    # Rolled back flushes leave the rollups alone
+    session.add(Transaction(customer_id=2, amount=-1000.0, occurred_at=datetime(2026, 2, 4)))
+    session.flush()
+    session.rollback()
+    assert _balances(session)[(2, FEB)] == (0.0, 5.0, 1)
+    assert _versions(session) == {1: 3, 2: 1}
+
+
+def test_rebuild_after_bulk_changes(session):
+    session.add_all([
+        Transaction(customer_id=1, amount=-30.0, category='food', occurred_at=datetime(2026, 1, 10)),
+        Transaction(customer_id=1, amount=-10.0, category='food', occurred_at=datetime(2026, 1, 11)),
+        Transaction(customer_id=2, amount=40.0, occurred_at=datetime(2026, 1, 12))
+    ])
+    session.commit()
+    expected_balances = _balances(session)
+    assert _categories(session)[(1, JAN, 'food')] == (40.0, 2)
+
+    # Bulk deletes skip the ORM events, the rollups go stale
+    session.execute(delete(Transaction).where(Transaction.amount == -10.0))
+    session.commit()
+    assert _balances(session) == expected_balances
+
+    rebuild_rollups(session, [1])
+    session.commit()
+    assert _balances(session)[(1, JAN)] == (0.0, 30.0, 1)
+    assert _categories(session)[(1, JAN, 'food')] == (30.0, 1)
+    assert _balances(session)[(2, JAN)] == expected_balances[(2, JAN)]
+    assert _versions(session) == {1: 2, 2: 1}
+
+    # A full rebuild bumps customers whose transactions are all gone too
+    session.execute(delete(Transaction).where(Transaction.customer_id == 2))
+    rebuild_rollups(session)
+    session.commit()
+    assert (2, JAN) not in _balances(session)
+    assert _balances(session)[(1, JAN)] == (0.0, 30.0, 1)
+    assert _versions(session) == {1: 3, 2: 2}
+
+
+def test_dashboard_etag_and_304(db_url, session, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    from fastapi.testclient import TestClient
+    from jose import jwt
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import main
+    from config import get_settings
+    from database import get_async_db
+
+    monkeypatch.setenv("SECRET_KEY", "test-secret")
+    monkeypatch.setenv("DATABASE_URL", db_url)
+    monkeypatch.setenv("DATABASE_ENCRYPTION_KEY", "test-key")
+    monkeypatch.setenv("RATE_LIMIT_PER_MINUTE", "0")
+    get_settings.cache_clear()
+
+    engine = create_async_engine(db_url.replace("sqlite://", "sqlite+aiosqlite://"))
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def test_db():
+        async with async_session() as db:
+            yield db
+
+    main.app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(main.app)
+        token = jwt.encode({"sub": "1"}, "test-secret", algorithm="HS256")
+        auth = {"Authorization": f"Bearer {token}"}
+        path = "/customers/1/dashboard/spending?months=1"
+
+        session.add(Transaction(customer_id=1, amount=-12.5, category='food', occurred_at=datetime.utcnow()))
+        session.commit()
+        first = client.get(path, headers=auth)
+        assert first.status_code == 200
+        assert first.json()["categories"] == [{'category': 'food', 'amount': 12.5, 'share': 1.0}]
+        etag = first.headers["ETag"]
+        current = month_start(datetime.utcnow()).strftime('%Y-%m')
+        assert etag == f'"1-1-1-{current}"'
+
+        unchanged = client.get(path, headers={**auth, "If-None-Match": f"W/{etag}"})
+        assert unchanged.status_code == 304
+        assert unchanged.headers["ETag"] == etag
+
+        # A new transaction bumps the version, so the old ETag no longer matches
+        session.add(Transaction(customer_id=1, amount=-7.5, category='fuel', occurred_at=datetime.utcnow()))
+        session.commit()
+        changed = client.get(path, headers={**auth, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert len(changed.json()["categories"]) == 2
+
+        # Someone else's token doesn't get the data or its ETag
+        other = jwt.encode({"sub": "2"}, "test-secret", algorithm="HS256")
+        assert client.get(path, headers={"Authorization": f"Bearer {other}"}).status_code == 403
+    finally:
+        main.app.dependency_overrides.clear()
+        get_settings.cache_clear()
+        asyncio.run(engine.dispose())
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from fraud_features import StreamingFraudFeatureStore
+
+
+def _txn(account_id, timestamp, amount, latitude=None, longitude=None):
+    transaction = {'account_id': account_id, 'timestamp': timestamp, 'amount': amount}
+    if latitude is not None:
+        transaction.update(latitude=latitude, longitude=longitude)
+    return transaction
+
+
+def test_matches_a_brute_force_window():
+    store = StreamingFraudFeatureStore(window_seconds=100, max_events_per_window=8)
+    rng = random.Random(7)
+    history = {}
+    now = 1_000_000
+    for _ in range(2000):
+        now += rng.randint(0, 20)
+        account_id = rng.choice('abc')
+        amount = float(rng.randint(1, 500))
+        enriched, _ = store.admit(_txn(account_id, now, amount))
+
+        # What's left of the latest 8 once the window has moved on
+        recent = [(t, a) for t, a in history.get(account_id, [])[-8:] if t > now - 100]
+        assert enriched['frequency_last_24h'] == len(recent)
+        expected = sum(a for _, a in recent) / len(recent) if recent else 0.0
+        assert enriched['average_transaction_amount'] == pytest.approx(expected)
+        history.setdefault(account_id, []).append((now, amount))
+
+
+def test_concurrent_admissions_see_each_other():
+    store = StreamingFraudFeatureStore()
+    first, _ = store.admit(_txn('a', 1000, 10.0))
+    second, _ = store.admit(_txn('a', 1001, 30.0))
+    assert first['frequency_last_24h'] == 0
+    assert second['frequency_last_24h'] == 1
+    assert second['average_transaction_amount'] == 10.0
+
+    batch, _ = store.admit_batch([_txn('a', 1002, 50.0), _txn('a', 1003, 70.0)])
+    assert [t['frequency_last_24h'] for t in batch] == [2, 3]
+    assert batch[1]['average_transaction_amount'] == 30.0
+
+
+def test_rollback_keeps_later_admissions():
+    store = StreamingFraudFeatureStore()
+    store.admit(_txn('a', 1000, 10.0, 0.0, 0.0))
+    _, failed = store.admit(_txn('a', 1001, 1000.0, 10.0, 10.0))
+    later, _ = store.admit(_txn('a', 1002, 20.0))
+    assert later['frequency_last_24h'] == 2
+
+    store.rollback(failed)
+    features = store.features('a', timestamp=1003, latitude=0.0, longitude=0.0)
+    assert features['frequency_last_24h'] == 2
+    assert features['average_transaction_amount'] == 15.0
+    # The location it brought in is gone too
+    assert features['distance_from_last_transaction'] == 0.0
+
+
+def test_full_ring_and_eviction():
+    store = StreamingFraudFeatureStore(max_events_per_window=4, initial_accounts=1, max_accounts=2)
+    for i in range(6):
+        store.admit(_txn('a', 1000 + i, float(i)))
+    features = store.features('a', timestamp=1010)
+    assert features['frequency_last_24h'] == 4
+    assert features['average_transaction_amount'] == 3.5
+
+    store.admit(_txn('b', 1010, 1.0))
+    store.admit(_txn('c', 1010, 1.0))
+    assert len(store) == 2
+    assert store.features('a', timestamp=1011)['frequency_last_24h'] == 0
+
+
+def test_bad_field_records_nothing():
+    store = StreamingFraudFeatureStore()
+    with pytest.raises(ValueError):
+        store.admit_batch([_txn('a', 1000, 10.0), _txn('a', 'yesterday', 10.0)])
+    assert store.features('a', timestamp=1001)['frequency_last_24h'] == 0
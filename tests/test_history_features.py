@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from history_features import APPLICANT_COLUMN, compute_history_features, compute_history_features_from_frames
+
+
+def _reference(user_data):
+    # One applicant at a time, the way the scalar features walk a user dict
+    income = np.asarray(user_data.get('income_history', []), dtype=float)
+    if len(income):
+        with np.errstate(invalid='ignore'):  # all-zero incomes give 0/0, min() then picks 1.0
+            income_stability = min(1.0, 1.0 / (1.0 + np.std(income) / np.mean(income)))
+    else:
+        income_stability = 0.0
+
+    amounts = np.asarray([t.get('amount', 0) for t in user_data.get('transaction_history', [])], dtype=float)
+    if len(amounts):
+        transaction_regularity = max(0.0, min(1.0, 1.0 - np.std(amounts) / (np.mean(amounts) + 1e-6)))
+    else:
+        transaction_regularity = 0.0
+
+    jobs = user_data.get('employment_history', [])
+    if jobs:
+        employment_stability = min(1.0, sum(job.get('duration_years', 0) for job in jobs) / len(jobs) / 5.0)
+    else:
+        employment_stability = 0.0
+
+    return {
+        'income_stability': income_stability,
+        'transaction_regularity': transaction_regularity,
+        'employment_stability': employment_stability
+    }
+
+
+def _users():
+    rng = np.random.default_rng(3)
+    users = [
+        {},
+        {'income_history': [], 'transaction_history': [], 'employment_history': []},
+        {'income_history': [52000.0], 'transaction_history': [{'amount': 120.0}],
+         'employment_history': [{'duration_years': 2.5}]},
+        {'income_history': [1e9, 1e9 + 1.0], 'transaction_history': [{'amount': 5.0}, {}]},
+        {'income_history': [0.0, 0.0], 'employment_history': [{'duration_years': 12}, {}]}
+    ]
+    for _ in range(40):
+        size = int(rng.integers(0, 6))
+        users.append({
+            'income_history': list(rng.uniform(1000, 9000, size)),
+            'transaction_history': [{'amount': float(a)} for a in rng.uniform(-200, 800, size + 1)],
+            'employment_history': [{'duration_years': float(d)} for d in rng.uniform(0, 10, size // 2)]
+        })
+    return users
+
+
+def _frames(users):
+    # The same histories laid out as flat columns with an applicant index
+    def flat(key, field, value_column):
+        values, groups = [], []
+        for index, user_data in enumerate(users):
+            for entry in user_data.get(key, []):
+                values.append(entry if field is None else entry.get(field, 0))
+                groups.append(index)
+        return {value_column: np.asarray(values, dtype=float), APPLICANT_COLUMN: np.asarray(groups, dtype=np.intp)}
+
+    return {
+        'income': flat('income_history', None, 'income'),
+        'transactions': flat('transaction_history', 'amount', 'amount'),
+        'employment': flat('employment_history', 'duration_years', 'duration_years')
+    }
+
+
+def _assert_matches_reference(features, users):
+    for index, user_data in enumerate(users):
+        for name, expected in _reference(user_data).items():
+            assert features[name][index] == pytest.approx(expected, rel=1e-9, abs=1e-12), (name, index)
+
+
+def test_grouped_features_match_per_applicant():
+    users = _users()
+    _assert_matches_reference(compute_history_features(users), users)
+
+
+def test_frames_match_per_applicant():
+    users = _users()
+    frames = _frames(users)
+    _assert_matches_reference(compute_history_features_from_frames(len(users), **frames), users)
+
+
+@pytest.mark.parametrize("module", ["pandas", "pyarrow"])
+def test_dataframe_and_arrow_inputs(module):
+    lib = pytest.importorskip(module)
+    users = _users()
+    if module == "pandas":
+        frames = {key: lib.DataFrame(frame) for key, frame in _frames(users).items()}
+    else:
+        frames = {key: lib.table(frame) for key, frame in _frames(users).items()}
+    _assert_matches_reference(compute_history_features_from_frames(len(users), **frames), users)
+
+
+def test_no_histories_at_all():
+    for features in (compute_history_features([{}, {}]), compute_history_features_from_frames(2)):
+        assert {name: values.tolist() for name, values in features.items()} == {
+            'income_stability': [0.0, 0.0],
+            'transaction_regularity': [0.0, 0.0],
+            'employment_stability': [0.0, 0.0]
+        }
+    assert all(len(values) == 0 for values in compute_history_features([]).values())
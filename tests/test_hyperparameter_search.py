@@ -0,0 +1,28 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from hyperparameter_search import _pareto_front, _validation_score
+
+
+def test_classifiers_are_ranked_on_probabilities():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 3))
+    # Rare positives: accuracy would be ~0.95 for any model
+    y = (X[:, 0] > 1.6).astype(int)
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X[:300], y[:300])
+
+    metric, score = _validation_score(model, X[300:], y[300:], 'classification')
+    assert metric == 'average_precision'
+    assert 0.5 < score <= 1.0
+
+    # Never saw a positive: every row scores 0
+    blind = RandomForestClassifier(n_estimators=5, random_state=0).fit(X[:50], np.zeros(50, dtype=int))
+    _, score = _validation_score(blind, X[300:], y[300:], 'classification')
+    assert score == y[300:].mean()
+
+
+def test_pareto_front_uses_compiled_latency():
+    fast_compiled = {'score': 0.9, 'single_row_ms': 2.0, 'compiled_single_row_ms': 0.05}
+    fast_plain = {'score': 0.8, 'single_row_ms': 0.5}
+    slow = {'score': 0.85, 'single_row_ms': 3.0, 'compiled_single_row_ms': 0.5}
+    assert _pareto_front([fast_plain, fast_compiled, slow]) == [fast_compiled]
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_main_boots_without_the_ml_packages():
+    # A fresh interpreter - this one has already imported sklearn for other tests
+    code = ("import sys, main; "
+            "print(','.join(name for name in ('sklearn', 'pandas', 'xgboost') if name in sys.modules))")
+    completed = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    assert completed.stdout.strip() == ""
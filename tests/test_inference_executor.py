@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+import pytest
+
+from inference_executor import InferenceExecutor, InferenceUnavailable
+
+
+def _square(x):
+    return x * x
+
+
+def _die(x):
+    os._exit(1)
+
+
+def test_pool_is_rebuilt_after_a_worker_dies():
+    executor = InferenceExecutor(mode="process", max_workers=2)
+
+    async def main():
+        assert await executor.run(_square, 3) == 9
+        with pytest.raises(InferenceUnavailable):
+            await executor.run(_die, 1)
+        # The next call gets a fresh pool instead of BrokenProcessPool
+        return await executor.run(_square, 4)
+
+    try:
+        assert asyncio.run(main()) == 16
+        assert executor.restarts == 1
+    finally:
+        executor.shutdown()
+
+
+def test_failed_warmup_answers_503_without_starting_the_pool(monkeypatch):
+    import scoring_api
+    from model_registry import BackgroundWarmup
+
+    async def broken():
+        raise RuntimeError("no models")
+
+    async def main():
+        warmup = BackgroundWarmup("credit_scoring", broken)
+        monkeypatch.setattr(scoring_api, "warmup", warmup)
+        warmup.start()
+        with pytest.raises(InferenceUnavailable):
+            await scoring_api._run_inference(_square, 2)
+
+    asyncio.run(main())
+    assert scoring_api.inference_executor._pool is None
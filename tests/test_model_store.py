@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import model_store
+from model_registry import registry
+from model_store import ENHANCED_CREDIT_MODEL, ModelStore
+
+pytest.importorskip("xgboost")
+
+
+def _trained(seed):
+    from benchmarks.synthetic import generate_applicants
+    from enhanced_credit_scoring import MshiyaneCreditScoringSystem
+
+    system = MshiyaneCreditScoringSystem()
+    users = generate_applicants(200, seed)
+    X = system.preprocess_features_batch(users)
+    system.scaler.fit(X)
+    system.model.set_params(n_estimators=10)
+    system.model.fit(system.scaler.transform(X), np.random.default_rng(seed).uniform(300, 850, len(X)))
+    return system, users
+
+
+@pytest.fixture
+def serving(tmp_path, monkeypatch):
+    # enhanced_serving against a store in tmp_path, with nothing loaded
+    import enhanced_serving
+
+    store = ModelStore(str(tmp_path))
+    monkeypatch.setattr(enhanced_serving, "model_store", store)
+    registry.register(ENHANCED_CREDIT_MODEL, enhanced_serving._load_enhanced_system)
+    yield enhanced_serving, store
+    registry.register(ENHANCED_CREDIT_MODEL, enhanced_serving._load_enhanced_system)
+
+
+def test_publish_activate_load_and_swap(serving):
+    enhanced_serving, store = serving
+    first, users = _trained(0)
+    second, _ = _trained(1)
+    v1 = first.publish_model(store)
+    v2 = second.publish_model(store)
+    assert v1 != v2 and store.current_version(ENHANCED_CREDIT_MODEL) == v2
+    # Same artifacts, same version
+    assert first.publish_model(store) == v1
+    assert store.current_version(ENHANCED_CREDIT_MODEL) == v1
+
+    store.activate(ENHANCED_CREDIT_MODEL, v2)
+    serving_before = registry.get(ENHANCED_CREDIT_MODEL)
+    assert serving_before.model_version == v2
+    # The compiled trees are maps of the published files
+    assert isinstance(serving_before.compiled_model.threshold, np.memmap)
+    assert serving_before.score_batch(users[:5]) == second.score_batch(users[:5])
+
+    result = asyncio.run(enhanced_serving.activate_enhanced_model(v1))
+    assert result == {"serving": v1}
+    assert store.current_version(ENHANCED_CREDIT_MODEL) == v1
+    swapped = registry.get(ENHANCED_CREDIT_MODEL)
+    assert swapped.model_version == v1
+    assert swapped.score_batch(users[:5]) == first.score_batch(users[:5])
+    # Requests already holding the old system finish with it
+    assert serving_before.model_version == v2
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(enhanced_serving.activate_enhanced_model("no-such-version"))
+    assert error.value.status_code == 404
+    assert store.current_version(ENHANCED_CREDIT_MODEL) == v1
+
+
+def test_compiled_only_rejects_versions_without_compiled_trees(serving, monkeypatch):
+    import enhanced_credit_scoring
+    from enhanced_credit_scoring import MshiyaneCreditScoringSystem
+
+    enhanced_serving, store = serving
+    compiled, _ = _trained(0)
+    v1 = compiled.publish_model(store)
+    monkeypatch.setattr(enhanced_credit_scoring, "compile_ensemble", lambda model: None)
+    plain, _ = _trained(1)
+    v2 = plain.publish_model(store)
+    store.activate(ENHANCED_CREDIT_MODEL, v1)
+
+    with pytest.raises(ValueError, match="compiled"):
+        MshiyaneCreditScoringSystem().load_published_model(store, v2, compiled_only=True)
+
+    # Activating it on a compiled_only worker is refused and changes nothing
+    monkeypatch.setattr(enhanced_serving, "ENHANCED_COMPILED_ONLY", True)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(enhanced_serving.activate_enhanced_model(v2))
+    assert error.value.status_code == 400
+    assert store.current_version(ENHANCED_CREDIT_MODEL) == v1
+
+
+def test_manifest_is_replaced_atomically(tmp_path, monkeypatch):
+    store = ModelStore(str(tmp_path))
+    version = store.publish("toy", {"weights": np.arange(5.0)})
+    before = (tmp_path / "manifest.json").read_text()
+
+    def broken_dump(manifest, f, **kwargs):
+        f.write('{"models": {"toy"')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(model_store.json, "dump", broken_dump)
+    with pytest.raises(OSError):
+        store.publish("toy", {"weights": np.arange(6.0)})
+
+    # Readers still see the whole old manifest, and no temp file is left
+    assert (tmp_path / "manifest.json").read_text() == before
+    assert json.loads(before)["models"]["toy"]["current"] == version
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".manifest-")]
+
+
+def test_model_info_endpoints_are_admin_only(serving, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from jose import jwt
+
+    from config import get_settings
+
+    enhanced_serving, _ = serving
+    monkeypatch.setenv("SECRET_KEY", "test-secret")
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    monkeypatch.setenv("DATABASE_ENCRYPTION_KEY", "test-key")
+    get_settings.cache_clear()
+    try:
+        app = FastAPI()
+        app.include_router(enhanced_serving.router)
+        client = TestClient(app)
+        customer = jwt.encode({"sub": "42"}, "test-secret", algorithm="HS256")
+        admin = jwt.encode({"sub": "ops", "role": "admin"}, "test-secret", algorithm="HS256")
+
+        for path in ("/models/enhanced", "/models/enhanced/experiment"):
+            assert client.get(path).status_code == 401
+            assert client.get(path, headers={"Authorization": f"Bearer {customer}"}).status_code == 403
+        response = client.get("/models/enhanced/experiment", headers={"Authorization": f"Bearer {admin}"})
+        assert response.status_code == 200
+    finally:
+        get_settings.cache_clear()
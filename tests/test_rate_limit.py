@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+import pytest
+from jose import jwt
+
+import rate_limit
+from rate_limit import (DEFAULT_ROUTE_COSTS, RateLimitMiddleware, RedisSlidingWindowLimiter, RouteCosts,
+                        TokenBucketLimiter, check_request, client_key)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Start exactly at the beginning of a 60s window
+    clock = Clock(1_800_000_000.0)
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    from config import get_settings
+
+    monkeypatch.setenv("SECRET_KEY", "test-secret")
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    monkeypatch.setenv("DATABASE_ENCRYPTION_KEY", "test-key")
+    get_settings.cache_clear()
+    yield "test-secret"
+    get_settings.cache_clear()
+
+
+def test_token_bucket_burst_and_refill(clock):
+    limiter = TokenBucketLimiter(per_minute=60, burst=3)
+    assert [limiter.acquire("a").allowed for _ in range(3)] == [True, True, True]
+    denied = limiter.acquire("a")
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(1.0)
+    # Other clients have their own bucket
+    assert limiter.acquire("b").allowed
+
+    clock.now += 1.0
+    assert limiter.acquire("a").allowed
+    assert not limiter.acquire("a").allowed
+
+    # Never refills past the burst
+    clock.now += 600
+    assert [limiter.acquire("a").allowed for _ in range(4)] == [True, True, True, False]
+
+
+def test_route_costs(clock):
+    costs = RouteCosts(DEFAULT_ROUTE_COSTS)
+    assert costs.cost("/health") == 0
+    assert costs.cost("/predict_credit_score/batch/") == 10
+    assert costs.cost("/customers/1/transactions") == 1
+    assert costs.route("/customers/1/transactions") is None
+
+    limiter = TokenBucketLimiter(per_minute=60, burst=15)
+    assert check_request(limiter, costs, "/health", {}, "10.0.0.1") is None
+    first = check_request(limiter, costs, "/detect_fraud/batch", {}, "10.0.0.1")
+    assert first.allowed and first.remaining == 5
+    second = check_request(limiter, costs, "/detect_fraud/batch", {}, "10.0.0.1")
+    assert not second.allowed
+    assert second.retry_after == pytest.approx(5.0)
+    # Single calls still fit in what's left
+    assert check_request(limiter, costs, "/detect_fraud", {}, "10.0.0.1").allowed
+
+    # A request costing more than the burst is capped at a full bucket
+    assert TokenBucketLimiter(per_minute=60, burst=5).acquire("c", cost=20).allowed
+
+
+def test_sliding_window_allow_deny_and_retry_after(clock):
+    limiter = RedisSlidingWindowLimiter(fakeredis.FakeRedis(server=fakeredis.FakeServer()), per_minute=5)
+    clock.now += 30
+    assert [limiter.acquire("a").allowed for _ in range(5)] == [True] * 5
+    denied = limiter.acquire("a")
+    assert not denied.allowed and denied.remaining == 0
+    # Nothing from the previous window to slide out - wait for the next one
+    assert denied.retry_after == pytest.approx(30.0)
+
+    # Half way into the next window half of the previous one still counts
+    clock.now += 60
+    assert limiter.acquire("a", cost=2).allowed
+    denied = limiter.acquire("a")
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(6.0)
+
+    clock.now += 6
+    assert limiter.acquire("a").allowed
+
+
+def test_sliding_window_fails_open(clock):
+    server = fakeredis.FakeServer()
+    limiter = RedisSlidingWindowLimiter(fakeredis.FakeRedis(server=server), per_minute=1)
+    assert limiter.acquire("a").allowed
+    assert not limiter.acquire("a").allowed
+
+    server.connected = False
+    decision = limiter.acquire("a")
+    assert decision.allowed and decision.remaining == 1
+
+
+def test_invalid_tokens_fall_back_to_the_ip(secret):
+    token = jwt.encode({"sub": "42"}, secret, algorithm="HS256")
+    forged = jwt.encode({"sub": "42"}, "wrong-secret", algorithm="HS256")
+    assert client_key({"authorization": f"Bearer {token}"}, "10.0.0.1") == "sub:42"
+    assert client_key({"authorization": f"Bearer {forged}"}, "10.0.0.1") == "ip:10.0.0.1"
+    assert client_key({"authorization": "Bearer made-up"}, "10.0.0.1") == "ip:10.0.0.1"
+    assert client_key({}, None) == "ip:unknown"
+
+
+def test_middleware_answers_429():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    app = Starlette(routes=[
+        Route("/detect_fraud", lambda request: PlainTextResponse("ok"), methods=["POST"]),
+        Route("/health", lambda request: PlainTextResponse("ok"))
+    ])
+    settings = SimpleNamespace(RATE_LIMIT_PER_MINUTE=60, RATE_LIMIT_BURST=2,
+                               RATE_LIMIT_REDIS_URL=None, RATE_LIMIT_ROUTE_COSTS={})
+    client = TestClient(RateLimitMiddleware(app, settings=settings))
+
+    assert [client.post("/detect_fraud").status_code for _ in range(3)] == [200, 200, 429]
+    limited = client.post("/detect_fraud")
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert limited.headers["X-RateLimit-Remaining"] == "0"
+    # Free routes are never limited
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,46 @@
+import asyncio
+
+from request_batching import MicroBatcher
+
+
+class Saturated(Exception):
+    pass
+
+
+def _run(batcher, items):
+    async def main():
+        return await asyncio.gather(*(batcher.submit(item) for item in items),
+                                    return_exceptions=True)
+    return asyncio.run(main())
+
+
+def test_bad_item_is_bisected_out():
+    calls = []
+
+    async def double(items):
+        calls.append(list(items))
+        if 13 in items:
+            raise ValueError("bad row")
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=64, max_wait_ms=50)
+    results = _run(batcher, range(64))
+
+    assert isinstance(results[13], ValueError)
+    assert [result for i, result in enumerate(results) if i != 13] == [i * 2 for i in range(64) if i != 13]
+    # 1 + 2 per level of the split, not 1 + 64
+    assert len(calls) == 1 + 2 * 6
+
+
+def test_fatal_errors_fail_the_whole_batch():
+    calls = []
+
+    async def saturated(items):
+        calls.append(list(items))
+        raise Saturated()
+
+    batcher = MicroBatcher(saturated, max_batch_size=8, max_wait_ms=50, fatal_errors=(Saturated,))
+    results = _run(batcher, range(8))
+
+    assert all(isinstance(result, Saturated) for result in results)
+    assert len(calls) == 1
@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+
+from score_cache import RedisScoreCache, ScoreCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def cache(server):
+    return RedisScoreCache(fakeredis.FakeRedis(server=server), ttl_seconds=60)
+
+
+def test_round_trip(cache):
+    cache.set_many({'a': 700.5, 'b': {'risk_level': 'LOW'}})
+    assert cache.get_many(['a', 'b', 'c']) == [700.5, {'risk_level': 'LOW'}, None]
+    assert cache.get('a') == 700.5
+
+    cache.delete_many(['a'])
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 3
+    assert cache.stats()['misses'] == 2
+
+
+def test_entries_expire(cache):
+    cache.set('a', 1)
+    assert 0 < cache.client.ttl('score_cache:a') <= 60
+
+
+def test_redis_outage_fails_open(cache, server, caplog):
+    cache.set('a', 1)
+    server.connected = False
+
+    with caplog.at_level(logging.WARNING, logger='score_cache'):
+        assert cache.get_many(['a', 'b']) == [None, None]
+        cache.set_many({'c': 2})
+        cache.delete_many(['a'])
+        assert cache.get('a') is None
+
+    # Logged once, not once per call
+    assert len([record for record in caplog.records if record.name == 'score_cache']) == 1
+    assert cache.stats()['errors'] == 4
+    assert cache.stats()['misses'] == 3
+
+    server.connected = True
+    assert cache.get('a') == 1
+
+
+def test_memory_cache_lru():
+    cache = ScoreCache(max_entries=2, ttl_seconds=60)
+    cache.set_many({'a': 1, 'b': 2})
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get_many(['a', 'b', 'c']) == [1, None, 3]
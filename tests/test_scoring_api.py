@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import scoring_api
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    calls = []
+
+    async def submit(user_data):
+        calls.append(user_data)
+        return 700.0
+
+    monkeypatch.setattr(scoring_api.credit_batcher, "submit", submit)
+    monkeypatch.setattr(scoring_api, "audit_log", None)
+    return calls
+
+
+@pytest.mark.parametrize("value", [None, "abc", "nan", float("inf")])
+def test_bad_credit_input_is_422_before_batching(submitted, value):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scoring_api.score_applicant({'annual_income': value, 'age': 30}))
+    assert error.value.status_code == 422
+    assert 'annual_income' in error.value.detail
+    assert submitted == []
+
+
+def test_credit_inputs_are_converted_on_the_event_loop(submitted):
+    result = asyncio.run(scoring_api.score_applicant({'annual_income': '52000', 'user_id': 'u1'}))
+    assert result == {'credit_score': 700.0}
+    assert submitted == [{'annual_income': 52000.0, 'user_id': 'u1'}]
+
+
+def test_unreadable_raw_transaction_is_422():
+    from fraud_features import StreamingFraudFeatureStore
+
+    store = StreamingFraudFeatureStore()
+    with pytest.raises(ValueError, match="timestamp"):
+        store.admit({'account_id': 'a1', 'amount': 10, 'timestamp': 'not-a-date'})
+    with pytest.raises(ValueError, match="amount"):
+        store.admit_batch([{'account_id': 'a1', 'amount': 'ten'}])
+    assert scoring_api._enrich_error(ValueError("Invalid timestamp")).status_code == 422
+
+
+def test_non_numeric_business_field_is_422():
+    from business_rules import load_business_rules
+
+    rules = load_business_rules()
+    scoring_api._business_inputs(rules, [{'annual_revenue': None}, {'annual_revenue': '1e6'}])
+    with pytest.raises(HTTPException) as error:
+        scoring_api._business_inputs(rules, [{'annual_revenue': 'lots'}])
+    assert error.value.status_code == 422
+
+
+def test_string_arrow_column_is_422():
+    pa = pytest.importorskip("pyarrow")
+    from wire_formats import table_to_matrix
+
+    matrix = table_to_matrix(pa.table({'a': [1, None], 'b': pa.nulls(2)}), ['a', 'b'])
+    assert matrix.tolist() == [[1.0, 0.0], [0.0, 0.0]]
+    with pytest.raises(HTTPException) as error:
+        table_to_matrix(pa.table({'a': ['1', 'x']}), ['a'])
+    assert error.value.status_code == 422
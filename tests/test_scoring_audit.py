@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from models import CreditScoreDecision, FraudDecision
+from scoring_audit import AuditWriteBuffer
+
+pytest.importorskip("aiosqlite")
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A fresh database without any tables - the buffer has to create them
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'audit.db'}")
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+async def _rows(session_factory, model):
+    async with session_factory() as session:
+        return (await session.execute(select(model))).scalars().all()
+
+
+def test_flush_creates_tables_and_cleans_rows(session_factory):
+    async def scenario():
+        buffer = AuditWriteBuffer(session_factory=session_factory)
+        buffer.record_credit_score(712.0, {'income': 50000.0, 'age': float('nan')},
+                                   'v1', applicant_id='x' * 200)
+        buffer.record_fraud_check(
+            {'fraud_probability': 0.1, 'is_suspicious': False, 'risk_level': 'LOW'},
+            {'amount': 12.5, 'device': b'\xa3raw'}, 'v1',
+            transaction_id='t1', account_id=7)
+        await buffer.flush()
+        return buffer, (await _rows(session_factory, CreditScoreDecision),
+                        await _rows(session_factory, FraudDecision))
+
+    buffer, (scores, checks) = asyncio.run(scenario())
+    assert buffer.stats() == {'pending': 0, 'written': 2, 'dropped': 0, 'dead_lettered': 0}
+    assert scores[0].applicant_id == 'x' * 64
+    assert scores[0].features == {'income': 50000.0, 'age': None}
+    assert checks[0].account_id == '7'
+    assert isinstance(checks[0].features['device'], str)
+
+
+def test_bad_row_is_dead_lettered(session_factory):
+    async def scenario():
+        buffer = AuditWriteBuffer(session_factory=session_factory)
+        for i in range(10):
+            # credit_score is NOT NULL, so row 6 can never be written
+            buffer.record_credit_score(None if i == 6 else 600.0 + i, {}, 'v1',
+                                       applicant_id=i)
+        await buffer.flush()
+        # The next flush isn't held up by it
+        buffer.record_credit_score(650.0, {}, 'v1', applicant_id='next')
+        await buffer.flush()
+        return buffer, await _rows(session_factory, CreditScoreDecision)
+
+    buffer, rows = asyncio.run(scenario())
+    assert buffer.stats() == {'pending': 0, 'written': 10, 'dropped': 0, 'dead_lettered': 1}
+    assert [r.applicant_id for r in rows] == ['0', '1', '2', '3', '4', '5', '7', '8', '9', 'next']
+    table, row = buffer.dead_letters[0]
+    assert table == 'credit_score_decisions'
+    assert row['applicant_id'] == '6'
+
+
+def test_database_outage_keeps_rows(session_factory):
+    def unavailable():
+        raise OperationalError("connect", {}, Exception("connection refused"))
+
+    async def scenario():
+        buffer = AuditWriteBuffer(session_factory=unavailable)
+        for i in range(3):
+            buffer.record_credit_score(700.0, {}, 'v1', applicant_id=i)
+        await buffer.flush()
+        stats = buffer.stats()
+
+        buffer.session_factory = session_factory
+        await buffer.flush()
+        async with session_factory() as session:
+            written = await session.scalar(select(func.count(CreditScoreDecision.id)))
+        return stats, buffer.stats(), written
+
+    during, after, written = asyncio.run(scenario())
+    assert during['pending'] == 3 and during['dead_lettered'] == 0
+    assert after['pending'] == 0 and after['written'] == 3
+    assert written == 3
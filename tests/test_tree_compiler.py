@@ -0,0 +1,135 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+
+from tree_compiler import check_parity, compile_ensemble
+
+
+def _data(rows=400, features=5, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=rows)
+    return X, y
+
+
+def _on_thresholds(compiled, base):
+    """
+    One probe per split threshold, exactly on it (the <= vs < edge)
+    """
+    is_split = compiled.left != np.arange(len(compiled.left))
+    probes = np.repeat(base[None, :], is_split.sum(), axis=0)
+    probes[np.arange(len(probes)), compiled.feature[is_split]] = compiled.threshold[is_split]
+    return probes
+
+
+def test_gradient_boosting_parity():
+    X, y = _data()
+    model = GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0).fit(X, y)
+    compiled = compile_ensemble(model)
+
+    check_parity(compiled, model)
+    for probes in (X, _on_thresholds(compiled, X[0])):
+        np.testing.assert_allclose(compiled.predict(probes), model.predict(probes), rtol=1e-6, atol=1e-6)
+
+
+def test_random_forest_parity():
+    X, y = _data()
+    labels = (y > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0).fit(X, labels)
+    compiled = compile_ensemble(model)
+
+    check_parity(compiled, model)
+    for probes in (X, _on_thresholds(compiled, X[0])):
+        np.testing.assert_allclose(compiled.predict_proba(probes), model.predict_proba(probes),
+                                   rtol=1e-6, atol=1e-6)
+        np.testing.assert_array_equal(compiled.predict(probes), model.predict(probes))
+
+
+def test_xgboost_parity():
+    xgboost = pytest.importorskip("xgboost")
+    X, y = _data()
+    model = xgboost.XGBRegressor(n_estimators=30, max_depth=4, random_state=0).fit(X, y)
+    compiled = compile_ensemble(model)
+
+    check_parity(compiled, model)
+    on_thresholds = _on_thresholds(compiled, X[0])
+    with_missing = X[:50].copy()
+    with_missing[::3, 0] = np.nan
+    for probes in (X, on_thresholds, with_missing):
+        np.testing.assert_allclose(compiled.predict(probes), model.predict(probes), rtol=1e-5, atol=1e-5)
+
+
+def test_xgboost_other_objectives_are_not_compiled():
+    xgboost = pytest.importorskip("xgboost")
+    X, y = _data()
+    model = xgboost.XGBClassifier(n_estimators=5, max_depth=3).fit(X, (y > 0).astype(int))
+    assert compile_ensemble(model) is None
+
+
+def test_unfitted_models_are_not_compiled():
+    assert compile_ensemble(GradientBoostingRegressor()) is None
+    assert compile_ensemble(RandomForestClassifier()) is None
+
+
+def _trained_system(tmp_path):
+    from credit_scoring import CREDIT_FEATURES, FRAUD_FEATURES, MshiyaneCreditScoring
+
+    system = MshiyaneCreditScoring()
+    X, y = _data(features=len(CREDIT_FEATURES))
+    system.scaler.fit(X)
+    system.credit_model.set_params(n_estimators=10)
+    system.credit_model.fit(system.scaler.transform(X), 600 + 50 * y)
+    Xf, yf = _data(features=len(FRAUD_FEATURES), seed=1)
+    system.fraud_model.set_params(n_estimators=10)
+    system.fraud_model.fit(Xf, (yf > 2).astype(int))
+    system.save_models(str(tmp_path))
+    return system
+
+
+def test_save_models_removes_stale_compiled_files(tmp_path, monkeypatch):
+    import credit_scoring
+
+    system = _trained_system(tmp_path)
+    stale = tmp_path / 'credit_model.compiled.joblib'
+    assert stale.exists()
+    system.load_models(str(tmp_path))
+    with_compiled = system.model_version
+
+    monkeypatch.setattr(credit_scoring, 'compile_ensemble', lambda model: None)
+    system.save_models(str(tmp_path))
+    assert not stale.exists()
+    system.load_models(str(tmp_path))
+    assert system.compiled_credit_model is None
+    assert system.model_version != with_compiled
+
+
+def test_save_models_parity_failure_leaves_directory_alone(tmp_path, monkeypatch):
+    import credit_scoring
+
+    system = _trained_system(tmp_path)
+    before = {name: os.path.getmtime(tmp_path / name) for name in os.listdir(tmp_path)}
+
+    def fail(compiled, model):
+        raise ValueError("mismatch")
+
+    monkeypatch.setattr(credit_scoring, 'check_parity', fail)
+    system.credit_model.set_params(n_estimators=5)
+    with pytest.raises(ValueError):
+        system.save_models(str(tmp_path))
+    assert {name: os.path.getmtime(tmp_path / name) for name in os.listdir(tmp_path)} == before
+    assert joblib.load(tmp_path / 'credit_model.joblib').n_estimators == 10
+
+
+def test_non_finite_inputs_are_rejected(tmp_path):
+    system = _trained_system(tmp_path)
+    system.load_models(str(tmp_path))
+
+    # Same answer whichever engine the batch size would pick
+    for rows in (1, 500):
+        with pytest.raises(ValueError):
+            system.score_batch([{'annual_income': None}] * rows)
+        with pytest.raises(ValueError):
+            system.detect_fraud_batch([{'amount': float('nan')}] * rows)
@@ -0,0 +1,278 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBRegressor
+
+from feature_scaling import PrecomputedScaler
+from tree_compiler import check_parity, compile_ensemble
+
+# Out-of-core training for the enhanced (XGBoost) model
+# train_model needs the whole training set as one DataFrame, which no
+# longer fits in memory. This streams it in chunks instead:
+#   1. one pass to fit the scaler (partial_fit) and collect label stats
+#   2. QuantileDMatrix built straight from the chunk iterator - xgboost
+#      only keeps the quantized (1 byte per value) matrix, not the floats
+#   3. CV folds trained in parallel threads with early stopping (two
+#      passes per fold, one each for its training and validation rows)
+#   4. final model on everything, optionally continuing the saved booster
+#
+# A chunk source is any callable that returns a fresh iterator of
+# DataFrames (feature columns + the label), since every pass restarts it
+
+ChunkSource = Callable[[], Iterator[pd.DataFrame]]
+
+LABEL_COLUMN = 'credit_score'
+
+
+def parquet_source(path: str, batch_size: int = 100000) -> ChunkSource:
+    """
+    Chunks from a Parquet file, or every *.parquet file in a directory
+    """
+    import pyarrow.parquet as pq
+
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, '*.parquet')))
+    else:
+        paths = [path]
+
+    def chunks():
+        for file_path in paths:
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=batch_size):
+                yield batch.to_pandas()
+
+    return chunks
+
+
+def sql_source(query: str, engine=None, chunksize: int = 100000) -> ChunkSource:
+    """
+    Chunks from a SQL query, using a server-side cursor so the driver
+    doesn't buffer the whole result either
+    """
+    from sqlalchemy import text
+
+    if engine is None:
+        from database import engine
+
+    def chunks():
+        with engine.connect().execution_options(stream_results=True) as connection:
+            for chunk in pd.read_sql(text(query), connection, chunksize=chunksize):
+                yield chunk
+
+    return chunks
+
+
+class _ChunkIter(xgb.DataIter):
+    """
+    Feeds scaled chunks into a QuantileDMatrix
+    keep picks rows by their global row number (used for the CV folds)
+    """
+
+    def __init__(self, source: ChunkSource, prepare: Callable,
+                 keep: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        self.source = source
+        self.prepare = prepare
+        self.keep = keep
+        self._chunks = None
+        self._offset = 0
+        super().__init__()
+
+    def reset(self):
+        self._chunks = None
+        self._offset = 0
+
+    def next(self, input_data) -> bool:
+        if self._chunks is None:
+            self._chunks = iter(self.source())
+        for chunk in self._chunks:
+            X, y = self.prepare(chunk)
+            row_ids = np.arange(self._offset, self._offset + len(y))
+            self._offset += len(y)
+            if self.keep is not None:
+                mask = self.keep(row_ids)
+                X, y = X[mask], y[mask]
+            if len(y):
+                input_data(data=X, label=y)
+                return True
+        return False
+
+
+def _chunk_preparer(columns: List[str], scaler, label_column: str) -> Callable:
+    fast_scaler = PrecomputedScaler.from_scaler(scaler)
+
+    def prepare(chunk: pd.DataFrame):
+        X = chunk.reindex(columns=columns, fill_value=0).to_numpy(dtype=np.float64)
+        y = chunk[label_column].to_numpy(dtype=np.float64)
+        return fast_scaler.transform(X), y
+
+    return prepare
+
+
+def scan_training_data(source: ChunkSource, label_column: str = LABEL_COLUMN, n_folds: int = 5,
+                       scaler: Optional[StandardScaler] = None) -> Dict:
+    """
+    First pass over the data
+    Fits a new scaler with partial_fit unless one is passed in, and
+    collects per-fold label sums (needed for R^2) and the feature columns
+    """
+    fit_scaler = scaler is None
+    if fit_scaler:
+        scaler = StandardScaler()
+
+    columns = None
+    n_rows = 0
+    n_groups = max(n_folds, 1)
+    label_count = np.zeros(n_groups)
+    label_sum = np.zeros(n_groups)
+    label_sum_sq = np.zeros(n_groups)
+
+    for chunk in source():
+        if columns is None:
+            columns = [name for name in chunk.columns if name != label_column]
+        y = chunk[label_column].to_numpy(dtype=np.float64)
+        if fit_scaler:
+            scaler.partial_fit(chunk.reindex(columns=columns, fill_value=0).to_numpy(dtype=np.float64))
+
+        fold = np.arange(n_rows, n_rows + len(y)) % n_groups
+        label_count += np.bincount(fold, minlength=n_groups)
+        label_sum += np.bincount(fold, weights=y, minlength=n_groups)
+        label_sum_sq += np.bincount(fold, weights=y * y, minlength=n_groups)
+        n_rows += len(y)
+
+    if n_rows == 0:
+        raise ValueError("Training data is empty")
+
+    # Population variance of the labels in each fold
+    label_variance = label_sum_sq / np.maximum(label_count, 1) - (label_sum / np.maximum(label_count, 1)) ** 2
+    return {
+        'columns': columns,
+        'scaler': scaler,
+        'n_rows': n_rows,
+        'label_variance': label_variance
+    }
+
+
+def _train_fold(fold: int, n_folds: int, source: ChunkSource, prepare: Callable,
+                reference: xgb.DMatrix, params: Dict, num_boost_round: int,
+                early_stopping_rounds: int, max_bin: int, previous_booster) -> Dict:
+    """
+    Train on every fold but one and evaluate on the one left out
+    Fold matrices reuse the full matrix's quantile cuts (ref), so neither
+    needs a sketching pass of its own - but each is still one full pass
+    over the source (rows outside it are skipped), two per fold. Holding
+    the held-out rows back from the training pass would save one, at the
+    cost of keeping a fold's worth of floats in memory
+    """
+    train = xgb.QuantileDMatrix(_ChunkIter(source, prepare, lambda rows: rows % n_folds != fold),
+                                ref=reference, max_bin=max_bin)
+    # xgboost wants the evaluation matrix to reference the training one
+    valid = xgb.QuantileDMatrix(_ChunkIter(source, prepare, lambda rows: rows % n_folds == fold),
+                                ref=train, max_bin=max_bin)
+    evals_result = {}
+    booster = xgb.train(
+        params, train,
+        num_boost_round=num_boost_round,
+        evals=[(valid, 'valid')],
+        early_stopping_rounds=early_stopping_rounds,
+        evals_result=evals_result,
+        xgb_model=previous_booster,
+        verbose_eval=False
+    )
+    rmse = evals_result['valid']['rmse']
+    # evals_result only covers the rounds added here, best_iteration counts all of them
+    first_round = booster.num_boosted_rounds() - len(rmse)
+    return {
+        'best_iteration': booster.best_iteration,
+        'rmse': rmse[booster.best_iteration - first_round]
+    }
+
+
+def train_streaming(system, source: ChunkSource, label_column: str = LABEL_COLUMN,
+                    n_folds: int = 5, early_stopping_rounds: int = 20, max_bin: int = 256,
+                    n_jobs: Optional[int] = None, warm_start: bool = False) -> Dict:
+    """
+    Train system.model (a MshiyaneCreditScoringSystem) from a chunk source
+    n_folds=0 skips cross-validation and trains for model.n_estimators rounds,
+    otherwise the final model uses the median best round from the folds
+    warm_start continues the currently loaded booster; its scaler and
+    feature columns are kept, since the trees' thresholds depend on them
+    (its CV folds continue the booster too, so rows it was trained on
+    can end up in a validation fold - expect optimistic scores there)
+    """
+    previous_booster = None
+    scaler = None
+    if warm_start:
+        if not hasattr(system.model, '_Booster'):
+            raise ValueError("warm_start needs a trained model to continue from")
+        previous_booster = system.model.get_booster()
+        scaler = system.scaler
+
+    scan = scan_training_data(source, label_column, n_folds, scaler)
+    columns = scan['columns']
+    if warm_start and system.feature_importance:
+        columns = list(system.feature_importance)
+    prepare = _chunk_preparer(columns, scan['scaler'], label_column)
+
+    n_threads = os.cpu_count() or 1
+    workers = max(1, min(n_folds, n_jobs or n_threads))
+    params = system.model.get_xgb_params()
+    params.pop('n_jobs', None)
+    params['nthread'] = max(1, n_threads // workers)
+    num_boost_round = system.model.n_estimators
+    previous_rounds = previous_booster.num_boosted_rounds() if previous_booster is not None else 0
+
+    full = xgb.QuantileDMatrix(_ChunkIter(source, prepare), max_bin=max_bin, nthread=n_threads)
+
+    folds = []
+    if n_folds > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_train_fold, fold, n_folds, source, prepare, full, params,
+                            num_boost_round, early_stopping_rounds, max_bin, previous_booster)
+                for fold in range(n_folds)
+            ]
+            folds = [future.result() for future in futures]
+        # best_iteration counts the continued booster's rounds too
+        num_boost_round = int(np.median([fold['best_iteration'] + 1 - previous_rounds for fold in folds]))
+        num_boost_round = max(1, num_boost_round)
+
+    params['nthread'] = n_threads
+    booster = xgb.train(params, full, num_boost_round=num_boost_round,
+                        xgb_model=previous_booster, verbose_eval=False)
+
+    model = XGBRegressor(**system.model.get_params())
+    model.load_model(bytearray(booster.save_raw()))
+    # Same check as every export path, before anything on system changes
+    compiled_model = compile_ensemble(model)
+    if compiled_model is not None:
+        check_parity(compiled_model, model)
+
+    system.model = model
+    system.scaler = scan['scaler']
+    system.fast_scaler = PrecomputedScaler.from_scaler(system.scaler)
+    system.compiled_model = compiled_model
+    system.feature_importance = dict(zip(columns, model.feature_importances_))
+    system.last_training_date = datetime.now().isoformat()
+
+    result = {
+        'n_rows': scan['n_rows'],
+        'num_boost_round': num_boost_round,
+        'feature_importance': system.feature_importance
+    }
+    if folds:
+        # Same metric as train_model's cross_val_score (R^2), from the fold RMSEs
+        rmse = np.array([fold['rmse'] for fold in folds])
+        r2 = 1.0 - rmse ** 2 / scan['label_variance'][:n_folds]
+        result.update({
+            'cv_scores_mean': r2.mean(),
+            'cv_scores_std': r2.std(),
+            'cv_rmse': rmse.tolist(),
+            'cv_best_iterations': [fold['best_iteration'] for fold in folds]
+        })
+    return result
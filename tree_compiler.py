@@ -0,0 +1,363 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Flattens trained tree ensembles (GradientBoostingRegressor,
+# RandomForestClassifier, XGBRegressor) into plain NumPy arrays and
+# evaluates them with a batched traversal
+# Skips all the per-call validation in sklearn/xgboost and means serving
+# only needs numpy + this module to load the compiled artifact
+
+# The NumPy traversal wins by a lot for small batches (single requests,
+# micro-batches) but the estimators' compiled loops win on big ones
+COMPILED_MAX_ROWS = int(os.getenv("COMPILED_INFERENCE_MAX_ROWS", "128"))
+
+
+class CompiledTreeEnsemble:
+    """
+    Tree ensemble stored as contiguous node arrays
+    Every tree lives in the same arrays, roots[t] is where tree t starts
+    Leaves point back at themselves so a traversal can just run for
+    max_depth steps without checking which rows have finished
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, missing_left: np.ndarray, value: np.ndarray,
+                 roots: np.ndarray, max_depth: int, n_features: int,
+                 base_score: np.ndarray, scale: float, aggregation: str,
+                 strict_less: bool, kind: str, classes: Optional[List] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.base_score = base_score
+        self.scale = scale
+        self.aggregation = aggregation  # 'sum' (boosting) or 'mean' (forest)
+        self.strict_less = strict_less  # xgboost splits on x < t, sklearn on x <= t
+        self.kind = kind
+        self.classes = classes
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """
+        Walk every row down every tree at once
+        Returns an (n_rows, n_trees) array of leaf node indices
+        """
+        # Both sklearn and xgboost evaluate on float32 inputs
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(
+                f"Expected {self.n_features} features, got {X.shape[1]}"
+            )
+
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        has_missing = np.isnan(X).any()
+
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            if self.strict_less:
+                go_left = x < self.threshold[node]
+            else:
+                go_left = x <= self.threshold[node]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.missing_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return node
+
+    def _aggregate(self, X: np.ndarray) -> np.ndarray:
+        leaf_values = self.value[self._leaf_indices(X)]
+        if self.aggregation == 'mean':
+            combined = leaf_values.mean(axis=1)
+        else:
+            combined = leaf_values.sum(axis=1)
+        return self.base_score + self.scale * combined
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Regression output, or the predicted class for classifiers
+        """
+        output = self._aggregate(X)
+        if self.kind == 'classifier':
+            return np.asarray(self.classes)[output.argmax(axis=1)]
+        return output[:, 0]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Class probabilities (classifiers only)
+        """
+        if self.kind != 'classifier':
+            raise ValueError("predict_proba is only available for classifiers")
+        return self._aggregate(X)
+
+
+class _NodeBuffer:
+    """
+    Collects nodes from many trees before packing them into arrays
+    """
+
+    def __init__(self, n_outputs: int):
+        self.n_outputs = n_outputs
+        self.feature: List[int] = []
+        self.threshold: List[float] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.missing_left: List[bool] = []
+        self.value: List[np.ndarray] = []
+        self.roots: List[int] = []
+        self.max_depth = 0
+
+    def add_node(self) -> int:
+        self.feature.append(0)
+        self.threshold.append(0.0)
+        self.left.append(0)
+        self.right.append(0)
+        self.missing_left.append(False)
+        self.value.append(np.zeros(self.n_outputs))
+        return len(self.feature) - 1
+
+    def set_split(self, node: int, feature: int, threshold: float, left: int,
+                  right: int, missing_left: bool):
+        self.feature[node] = feature
+        self.threshold[node] = threshold
+        self.left[node] = left
+        self.right[node] = right
+        self.missing_left[node] = missing_left
+
+    def set_leaf(self, node: int, value):
+        # Self-loop so extra traversal steps stay on the leaf
+        self.left[node] = node
+        self.right[node] = node
+        self.value[node] = np.asarray(value, dtype=np.float64).reshape(self.n_outputs)
+
+    def arrays(self) -> Dict:
+        return {
+            'feature': np.asarray(self.feature, dtype=np.intp),
+            'threshold': np.asarray(self.threshold, dtype=np.float64),
+            'left': np.asarray(self.left, dtype=np.intp),
+            'right': np.asarray(self.right, dtype=np.intp),
+            'missing_left': np.asarray(self.missing_left, dtype=bool),
+            'value': np.ascontiguousarray(np.vstack(self.value)),
+            'roots': np.asarray(self.roots, dtype=np.intp),
+            'max_depth': self.max_depth,
+        }
+
+
+def _add_sklearn_tree(buffer: _NodeBuffer, tree, normalize: bool):
+    """
+    Append one fitted sklearn tree (estimator.tree_) to the buffer
+    """
+    offset = len(buffer.feature)
+    buffer.roots.append(offset)
+    buffer.max_depth = max(buffer.max_depth, int(tree.max_depth))
+
+    # Older sklearn versions don't have missing value support
+    missing_go_to_left = getattr(tree, 'missing_go_to_left', None)
+
+    for node in range(tree.node_count):
+        index = buffer.add_node()
+        left = tree.children_left[node]
+        if left == -1:
+            value = tree.value[node][0]
+            if normalize:
+                # Older sklearn stores class counts, newer stores fractions
+                value = value / value.sum()
+            buffer.set_leaf(index, value)
+        else:
+            buffer.set_split(
+                index,
+                int(tree.feature[node]),
+                float(tree.threshold[node]),
+                offset + int(left),
+                offset + int(tree.children_right[node]),
+                bool(missing_go_to_left[node]) if missing_go_to_left is not None else False
+            )
+
+
+def _compile_gradient_boosting(model) -> CompiledTreeEnsemble:
+    buffer = _NodeBuffer(n_outputs=1)
+    for stage in model.estimators_[:, 0]:
+        _add_sklearn_tree(buffer, stage.tree_, normalize=False)
+
+    if model.init_ == 'zero':
+        base_score = 0.0
+    else:
+        base_score = float(model.init_.predict(np.zeros((1, model.n_features_in_)))[0])
+
+    return CompiledTreeEnsemble(
+        n_features=model.n_features_in_,
+        base_score=np.array([base_score]),
+        scale=float(model.learning_rate),
+        aggregation='sum',
+        strict_less=False,
+        kind='regressor',
+        **buffer.arrays()
+    )
+
+
+def _compile_random_forest(model) -> CompiledTreeEnsemble:
+    buffer = _NodeBuffer(n_outputs=len(model.classes_))
+    for estimator in model.estimators_:
+        _add_sklearn_tree(buffer, estimator.tree_, normalize=True)
+
+    return CompiledTreeEnsemble(
+        n_features=model.n_features_in_,
+        base_score=np.zeros(len(model.classes_)),
+        scale=1.0,
+        aggregation='mean',
+        strict_less=False,
+        kind='classifier',
+        classes=model.classes_.tolist(),
+        **buffer.arrays()
+    )
+
+
+def _compile_xgboost(model) -> Optional[CompiledTreeEnsemble]:
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())
+    objective = config['learner']['objective']['name']
+    if objective != 'reg:squarederror':
+        # Other objectives transform the margin (logistic, exp, ...) - leave
+        # those to xgboost rather than refusing to save the model
+        return None
+
+    # Newer xgboost writes base_score as a vector like "[6.2E2]"
+    base_score = config['learner']['learner_model_param']['base_score']
+    base_score = float(str(base_score).strip('[]'))
+
+    # Respect early stopping the same way XGBRegressor.predict does
+    best_iteration = getattr(model, 'best_iteration', None)
+    if best_iteration is not None:
+        booster = booster[:best_iteration + 1]
+
+    feature_names = booster.feature_names
+    n_features = booster.num_features()
+
+    def feature_index(split) -> int:
+        if feature_names:
+            return feature_names.index(split)
+        return int(split.lstrip('f'))
+
+    buffer = _NodeBuffer(n_outputs=1)
+    for dump in booster.get_dump(dump_format='json'):
+        tree = json.loads(dump)
+        offset = len(buffer.feature)
+        buffer.roots.append(offset)
+
+        # Node ids are per tree, map them onto buffer slots first
+        slots = {}
+        stack = [(tree, 0)]
+        nodes = []
+        while stack:
+            node, depth = stack.pop()
+            slots[node['nodeid']] = buffer.add_node()
+            nodes.append(node)
+            buffer.max_depth = max(buffer.max_depth, depth)
+            for child in node.get('children', []):
+                stack.append((child, depth + 1))
+
+        for node in nodes:
+            index = slots[node['nodeid']]
+            if 'leaf' in node:
+                buffer.set_leaf(index, node['leaf'])
+            else:
+                buffer.set_split(
+                    index,
+                    feature_index(node['split']),
+                    # xgboost thresholds are float32
+                    float(np.float32(node['split_condition'])),
+                    slots[node['yes']],
+                    slots[node['no']],
+                    node['missing'] == node['yes']
+                )
+
+    return CompiledTreeEnsemble(
+        n_features=n_features,
+        base_score=np.array([base_score]),
+        scale=1.0,
+        aggregation='sum',
+        strict_less=True,
+        kind='regressor',
+        **buffer.arrays()
+    )
+
+
+def use_compiled(compiled: Optional[CompiledTreeEnsemble], n_rows: int,
+                 estimator_available: bool = True) -> bool:
+    """
+    Decide whether a batch of n_rows should go through the compiled engine
+    """
+    if compiled is None:
+        return False
+    return not estimator_available or n_rows <= COMPILED_MAX_ROWS
+
+
+def compile_ensemble(model) -> Optional[CompiledTreeEnsemble]:
+    """
+    Flatten a fitted tree ensemble into a CompiledTreeEnsemble
+    Returns None if the model hasn't been fitted yet, or is an xgboost
+    model with an objective other than reg:squarederror
+    """
+    if hasattr(model, 'get_booster'):
+        if not hasattr(model, '_Booster'):
+            return None
+        return _compile_xgboost(model)
+
+    if not hasattr(model, 'estimators_'):
+        return None
+
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+    if isinstance(model, GradientBoostingRegressor):
+        return _compile_gradient_boosting(model)
+    if isinstance(model, RandomForestClassifier):
+        return _compile_random_forest(model)
+    raise ValueError(f"Don't know how to compile {type(model).__name__}")
+
+
+def check_parity(compiled: CompiledTreeEnsemble, model, n_samples: int = 512,
+                 tolerance: float = 1e-4):
+    """
+    Compare the compiled ensemble with the original estimator
+    Probe rows are drawn around the split thresholds (and exactly on
+    them) so both sides of most splits get exercised
+    """
+    rng = np.random.default_rng(0)
+    probes = np.zeros((n_samples, compiled.n_features))
+    is_split = compiled.left != np.arange(len(compiled.left))
+
+    for f in range(compiled.n_features):
+        thresholds = compiled.threshold[is_split & (compiled.feature == f)]
+        if len(thresholds) == 0:
+            continue
+        low, high = thresholds.min(), thresholds.max()
+        margin = max(1.0, 0.1 * (high - low))
+        probes[:, f] = rng.uniform(low - margin, high + margin, n_samples)
+        on_split = rng.random(n_samples) < 0.25
+        probes[on_split, f] = rng.choice(thresholds, on_split.sum())
+
+    if compiled.kind == 'classifier':
+        expected = model.predict_proba(probes)
+        actual = compiled.predict_proba(probes)
+    else:
+        expected = model.predict(probes)
+        actual = compiled.predict(probes)
+
+    if not np.allclose(actual, expected, rtol=tolerance, atol=tolerance):
+        worst = np.abs(np.asarray(actual, dtype=float) - expected).max()
+        raise ValueError(
+            f"Compiled {type(model).__name__} doesn't match the original "
+            f"estimator (max difference {worst})"
+        )
@@ -0,0 +1,41 @@
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from utils.logger import logger
+
+# Exception handlers registered in main.py
+# Every error goes out as {"detail": ...} like FastAPI's own HTTPException,
+# so clients only have one error shape to handle
+
+
+class AppException(Exception):
+    """
+    An error the app raises on purpose, with the status code to answer with
+    """
+
+    def __init__(self, message: str, status_code: int = 400, details: Optional[Any] = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details
+
+
+async def app_exception_handler(request: Request, exc: AppException) -> ORJSONResponse:
+    content = {"detail": exc.message}
+    if exc.details is not None:
+        content["details"] = exc.details
+    return ORJSONResponse(content, status_code=exc.status_code)
+
+
+async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> ORJSONResponse:
+    return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code,
+                          headers=getattr(exc, "headers", None))
+
+
+async def general_exception_handler(request: Request, exc: Exception) -> ORJSONResponse:
+    # Anything unexpected - log the traceback, don't leak it to the client
+    logger.exception(f"Unhandled error on {request.method} {request.url.path}: {exc}")
+    return ORJSONResponse({"detail": "Internal server error"}, status_code=500)
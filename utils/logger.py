@@ -0,0 +1,25 @@
+import logging
+import os
+
+# App-wide logger
+# Level and format come from LOG_LEVEL / LOG_FORMAT (same names and
+# defaults as config.Settings) - read from the environment directly so
+# importing this doesn't load and validate the whole settings object
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def get_logger(name: str = "mshiyanepay") -> logging.Logger:
+    """
+    Logger with a stream handler, configured once per name
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(os.getenv("LOG_FORMAT", LOG_FORMAT)))
+        logger.addHandler(handler)
+        logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    return logger
+
+
+logger = get_logger()
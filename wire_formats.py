@@ -0,0 +1,220 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response
+
+# Request/response formats for the scoring endpoints
+# For batch callers, parsing JSON into dicts and copying them field by
+# field into NumPy cost more CPU than the models themselves, so besides
+# JSON (parsed and written with orjson) the endpoints speak:
+# - msgpack (application/msgpack): same shape as the JSON, smaller and faster
+# - Arrow IPC stream (application/vnd.apache.arrow.stream): one row per
+#   applicant/transaction, read straight into the feature matrix
+# The request format follows Content-Type, the response format follows
+# Accept (JSON when there's nothing better)
+# numpy, msgpack and pyarrow are imported on first use, not when the API boots
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/x-apache-arrow-stream": ARROW
+}
+SUPPORTED = (JSON, MSGPACK, ARROW)
+
+# Fixed-size list column that carries the whole feature vector per row
+FEATURES_COLUMN = "features"
+
+
+def _media_type(header: str) -> str:
+    media_type = header.split(";")[0].strip().lower()
+    return _ALIASES.get(media_type, media_type)
+
+
+async def read_payload(request: Request) -> Tuple[str, Any]:
+    """
+    Decode the body by Content-Type
+    Returns (media type, payload) - dicts/lists, or a pyarrow Table for Arrow
+    """
+    media_type = _media_type(request.headers.get("content-type", "") or JSON)
+    body = await request.body()
+    try:
+        if media_type == JSON or media_type.endswith("+json"):
+            return JSON, orjson.loads(body)
+        if media_type == MSGPACK:
+            import msgpack
+            return MSGPACK, msgpack.unpackb(body)
+        if media_type == ARROW:
+            import pyarrow as pa
+            return ARROW, pa.ipc.open_stream(body).read_all()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode {media_type} body: {e}")
+    raise HTTPException(status_code=415, detail=f"Unsupported content type {media_type}")
+
+
+def table_to_records(table) -> List[Dict]:
+    """
+    Arrow table -> list of row dicts, for the paths that need dicts anyway
+    """
+    columns = table.to_pydict()
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+
+async def read_object(request: Request) -> Dict:
+    """
+    One applicant/transaction - an object, or a one-row Arrow table
+    """
+    media_type, payload = await read_payload(request)
+    if media_type == ARROW:
+        records = table_to_records(payload)
+        if len(records) != 1:
+            raise HTTPException(status_code=400, detail=f"Expected one row, got {len(records)}")
+        payload = records[0]
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Expected an object")
+    return payload
+
+
+async def read_batch(request: Request):
+    """
+    Many applicants/transactions - a list of objects, or an Arrow table
+    (returned as the table, see table_to_matrix)
+    """
+    media_type, payload = await read_payload(request)
+    if media_type != ARROW and not (isinstance(payload, list) and all(isinstance(item, dict) for item in payload)):
+        raise HTTPException(status_code=400, detail="Expected a list of objects")
+    return payload
+
+
+def is_table(payload) -> bool:
+    return hasattr(payload, "column_names")
+
+
+def require_numeric_columns(table, columns: Sequence[str]):
+    """
+    422 if any of these columns is there but isn't numeric (e.g. strings)
+    """
+    import pyarrow as pa
+
+    for name in columns:
+        if name not in table.column_names:
+            continue
+        arrow_type = table.schema.field(name).type
+        if not (pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+                or pa.types.is_boolean(arrow_type) or pa.types.is_decimal(arrow_type)
+                or pa.types.is_null(arrow_type)):
+            raise HTTPException(status_code=422, detail=f"Column {name} must be numeric, got {arrow_type}")
+
+
+def table_to_matrix(table, columns: Sequence[str]):
+    """
+    Feature matrix (rows x columns) from an Arrow table
+    - a "features" FixedSizeList<double> column with len(columns) values
+      per row is used as-is: the matrix is a view of the Arrow buffer
+    - otherwise one column per feature: every column is read without a
+      copy and written once into a column-major matrix. Missing columns
+      and nulls are 0, the same as a missing key in a JSON object
+    A non-numeric feature column is the client's mistake: 422
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if FEATURES_COLUMN in table.column_names:
+        column = table.column(FEATURES_COLUMN)
+        field_type = column.type
+        if (pa.types.is_fixed_size_list(field_type) and field_type.list_size == len(columns)
+                and pa.types.is_float64(field_type.value_type) and column.null_count == 0):
+            column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+            values = column.flatten()
+            if values.null_count == 0:
+                return values.to_numpy(zero_copy_only=True).reshape(-1, len(columns))
+
+    require_numeric_columns(table, columns)
+    matrix = np.zeros((table.num_rows, len(columns)), dtype=np.float64, order="F")
+    for index, name in enumerate(columns):
+        if name not in table.column_names:
+            continue
+        column = table.column(name)
+        if column.null_count == len(column):
+            continue  # All null (possibly typed null) - left at 0
+        if column.null_count:
+            column = pc.fill_null(column, 0)
+        matrix[:, index] = column.to_numpy()
+    return matrix
+
+
+def table_column(table, name: str, default: Any = 0):
+    """
+    One numeric column as float64 (default where it's missing or null)
+    """
+    import numpy as np
+
+    if name not in table.column_names:
+        return np.full(table.num_rows, default, dtype=np.float64)
+    return table_to_matrix(table, [name])[:, 0]
+
+
+def negotiate(request: Request) -> str:
+    """
+    Best supported type in the Accept header (q-values respected)
+    """
+    best, best_q = JSON, 0.0
+    for part in request.headers.get("accept", "").split(","):
+        pieces = part.split(";")
+        media_type = _media_type(pieces[0])
+        q = 1.0
+        for param in pieces[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in SUPPORTED and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def _msgpack_default(value):
+    # NumPy scalars and arrays (numpy itself may not be imported yet)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Can't serialize {type(value).__name__}")
+
+
+def _arrow_columns(rows: Union[List[Dict], Dict[str, List]]) -> Dict[str, List]:
+    if isinstance(rows, dict):
+        return rows
+    if not rows:
+        return {}
+    return {name: [row.get(name) for row in rows] for name in rows[0]}
+
+
+def respond(request: Request, content: Dict, rows: Optional[Union[List[Dict], Dict[str, List]]] = None,
+            status_code: int = 200) -> Response:
+    """
+    Encode a response in the format the client asked for
+    content is the JSON/msgpack body. For Arrow, rows is what becomes the
+    table - a list of row dicts or a dict of columns (default: content as
+    a single row)
+    Returned as a Response so FastAPI skips jsonable_encoder
+    """
+    media_type = negotiate(request)
+    if media_type == MSGPACK:
+        import msgpack
+        return Response(msgpack.packb(content, default=_msgpack_default),
+                        status_code=status_code, media_type=MSGPACK)
+    if media_type == ARROW:
+        import pyarrow as pa
+        table = pa.table(_arrow_columns(rows if rows is not None else [content]))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), status_code=status_code, media_type=ARROW)
+    return ORJSONResponse(content, status_code=status_code)